@@ -1,33 +1,422 @@
+"""Summarize SNG games from bot logs, including rotated and gzip-compressed files.
+
+Reads the JSONL event stream (events.jsonl) directly and falls back to
+matching `event=` lines in text logs written before the stream existed.
+Each file is scanned in its own worker process. Plain files are read through
+mmap; gzip files are streamed. Results are cached in an on-disk index keyed by
+the byte offset each file was scanned up to. Re-running skips files whose size
+and modification time are unchanged, reads only what was appended to a live
+plain log, and `--game` can seek straight to a game's lines.
+
+Usage:
+    python analyze_logs.py
+    python analyze_logs.py 'events.jsonl*' 'old-logs/bot.log*'
+    python analyze_logs.py --game 1a2b3c4d --lines
+"""
+import os
 import re
-from collections import defaultdict
-
-def analyze_log_file(filename):
-    embed_creations = defaultdict(list)
-    current_operation = None
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            # Track operations
-            if "Updating players for SNG" in line:
-                current_operation = f"update_{line.split('SNG')[1].strip()}"
-            elif "Starting refresh cycle for game" in line:
-                current_operation = f"refresh_{line.split('game')[1].strip()}"
-            
-            # Track embed creations
-            if "Created embed for game" in line:
-                if current_operation:
-                    embed_creations[current_operation].append(line)
-            
-            # End of operation
-            if "Temporary 'Updating SNG status...' message deleted" in line:
-                current_operation = None
-    
-    # Report multiple embed creations
-    for operation, creations in embed_creations.items():
-        if len(creations) > 1:
-            print(f"\nMultiple embeds created during {operation}:")
-            for creation in creations:
-                print(creation.strip())
+import sys
+import glob
+import gzip
+import json
+import mmap
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+INDEX_VERSION = 2
+DEFAULT_INDEX_DIR = '.log_index'
+DEFAULT_PATHS = ['events.jsonl*', 'bot.log*']
+
+# asctime:LEVEL:logger: message
+LINE_PATTERN = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}):\w+:[^:]+: (.*)$')
+EVENT_PATTERN = re.compile(rb'^event=(\w+) ?(.*)$')
+FIELD_PATTERN = re.compile(rb'(\w+)=(\S*)')
+CONNECTED_MARKER = b' has connected to Discord!'
+
+# Events that belong to a single game and are kept per game
+GAME_EVENTS = {
+    'game_created', 'game_started', 'game_ended', 'gui_edits',
+    'delete_failed', 'delete_fallback', 'player_clicks',
+}
+RECONNECT_EVENTS = {'gateway_resumed', 'gateway_ready'}
+
+
+def parse_time(stamp: bytes) -> float:
+    return datetime.strptime(stamp.decode(), '%Y-%m-%d %H:%M:%S,%f').timestamp()
+
+
+def new_game() -> dict:
+    return {
+        'display_id': None, 'channel': None, 'starter': None,
+        'created': None, 'started': None, 'start_reason': None, 'ended': None, 'end_reason': None,
+        'players': 0, 'clicks': 0, 'edits_sent': 0, 'edits_skipped': 0, 'edits_coalesced': 0,
+        'delete_failures': 0, 'fallbacks_50027': 0, 'offsets': [],
+    }
+
+
+def new_partial() -> dict:
+    return {'games': {}, 'disconnects': [], 'reconnects': [], 'lines': 0}
+
+
+def iter_lines(path: str, start: int):
+    """Yield (offset, line) from `start`; plain files are mapped instead of read.
+
+    Seeking in a gzip file means decompressing everything before the offset, so
+    gzip files are always read whole; they are rotated archives and never grow.
+    """
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                yield offset, line
+                offset += len(line)
+        return
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            offset = start
+            while offset < size:
+                end = mapped.find(b'\n', offset)
+                if end == -1:
+                    # Leave a half-written last line for the next run
+                    return
+                yield offset, mapped[offset:end + 1]
+                offset = end + 1
+
+
+def parse_line(line: bytes):
+    """Return (event, timestamp, fields) for an event line, or None for anything else."""
+    if line.startswith(b'{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        event = record.pop('event', None)
+        if event is None:
+            return None
+        when = record.pop('ts', None)
+        record.pop('level', None)
+        return event, when, {key: str(value) for key, value in record.items()}
+
+    match = LINE_PATTERN.match(line.rstrip(b'\r\n'))
+    if not match:
+        return None
+    stamp, message = match.groups()
+    event = EVENT_PATTERN.match(message)
+    if event is None:
+        # Text logs before structured gateway events only had this line
+        if message.endswith(CONNECTED_MARKER):
+            return 'gateway_ready', parse_time(stamp), {}
+        return None
+    name, rest = event.groups()
+    name = name.decode()
+    if name not in GAME_EVENTS and name != 'gateway_disconnect' and name not in RECONNECT_EVENTS:
+        return None
+    fields = {key.decode(): value.decode() for key, value in FIELD_PATTERN.findall(rest)}
+    return name, parse_time(stamp), fields
+
+
+def scan_file(path: str, start: int = 0):
+    """Scan one file from byte `start`; returns (partial summary, offset scanned up to)."""
+    partial = new_partial()
+    games = partial['games']
+    end = start
+    for offset, line in iter_lines(path, start):
+        end = offset + len(line)
+        partial['lines'] += 1
+        parsed = parse_line(line)
+        if parsed is None:
+            continue
+        name, when, fields = parsed
+        if name == 'gateway_disconnect':
+            partial['disconnects'].append(when)
+            continue
+        if name in RECONNECT_EVENTS:
+            partial['reconnects'].append(when)
+            continue
+        if name not in GAME_EVENTS:
+            continue
+
+        sng_id = fields.get('sng')
+        if not sng_id or sng_id == 'None':
+            continue
+        game = games.get(sng_id)
+        if game is None:
+            game = games[sng_id] = new_game()
+        game['offsets'].append(offset)
+
+        if name == 'game_created':
+            game['created'] = when
+            game['display_id'] = fields.get('display_id')
+            game['channel'] = fields.get('channel')
+            game['starter'] = fields.get('starter')
+        elif name == 'game_started':
+            game['started'] = when
+            game['start_reason'] = fields.get('reason')
+            game['players'] = max(game['players'], int(fields.get('players', 0)))
+        elif name == 'game_ended':
+            game['ended'] = when
+            game['end_reason'] = fields.get('reason')
+            game['players'] = max(game['players'], int(fields.get('players', 0)))
+        elif name == 'gui_edits':
+            game['edits_sent'] += int(fields.get('sent', 0))
+            game['edits_skipped'] += int(fields.get('skipped', 0))
+            game['edits_coalesced'] += int(fields.get('coalesced', 0))
+        elif name == 'delete_failed':
+            game['delete_failures'] += 1
+        elif name == 'delete_fallback':
+            game['fallbacks_50027'] += 1
+        elif name == 'player_clicks':
+            game['clicks'] += int(fields.get('clicks', 0))
+    return partial, end
+
+
+def merge_into(total: dict, partial: dict, path: str):
+    """Fold one file's partial summary into the running totals."""
+    total['lines'] += partial['lines']
+    total['disconnects'].extend(partial['disconnects'])
+    total['reconnects'].extend(partial['reconnects'])
+    for sng_id, game in partial['games'].items():
+        merged = total['games'].get(sng_id)
+        if merged is None:
+            merged = total['games'][sng_id] = new_game()
+        for key in ('display_id', 'channel', 'starter', 'start_reason', 'end_reason'):
+            merged[key] = game[key] or merged[key]
+        for key in ('created', 'started'):
+            if game[key] is not None and (merged[key] is None or game[key] < merged[key]):
+                merged[key] = game[key]
+        if game['ended'] is not None and (merged['ended'] is None or game['ended'] > merged['ended']):
+            merged['ended'] = game['ended']
+        merged['players'] = max(merged['players'], game['players'])
+        for key in ('clicks', 'edits_sent', 'edits_skipped', 'edits_coalesced', 'delete_failures', 'fallbacks_50027'):
+            merged[key] += game[key]
+        merged['offsets'].extend((path, offset) for offset in game['offsets'])
+
+
+class LogIndex:
+    """Per-file cache of partial summaries, valid up to the byte offset recorded with them."""
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _entry_path(self, path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    @staticmethod
+    def identity(path: str) -> dict:
+        stat = os.stat(path)
+        return {'inode': stat.st_ino, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def load(self, path: str, identity: dict):
+        """Return (partial, offset, unchanged) for a file whose current identity is `identity`.
+
+        `unchanged` means the file has the size and modification time it had
+        when it was indexed, so it need not be opened at all. Otherwise a plain
+        log that only grew resumes from the offset, and anything else, including
+        every changed gzip file, is rescanned from the start: (None, 0, False).
+        """
+        try:
+            with open(self._entry_path(path), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, 0, False
+        if entry.get('version') != INDEX_VERSION or entry['identity']['inode'] != identity['inode']:
+            return None, 0, False
+        if entry['identity'] == identity:
+            return entry['partial'], entry['offset'], True
+        if path.endswith('.gz') or identity['size'] < entry['offset']:
+            # A rewritten archive, or a log truncated or replaced by rotation
+            return None, 0, False
+        return entry['partial'], entry['offset'], False
+
+    def save(self, path: str, partial: dict, offset: int, identity: dict):
+        """Store a scan result; `identity` must be taken before the scan so later appends are not skipped."""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {'version': INDEX_VERSION, 'path': os.path.abspath(path), 'identity': identity,
+                 'offset': offset, 'partial': partial}
+        tmp_path = self._entry_path(path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._entry_path(path))
+
+
+def combine(cached: dict, fresh: dict) -> dict:
+    """Append a resumed scan to the cached partial for the same file."""
+    if cached is None:
+        return fresh
+    combined = new_partial()
+    merge_into(combined, cached, None)
+    merge_into(combined, fresh, None)
+    for game in combined['games'].values():
+        game['offsets'] = [offset for _, offset in game['offsets']]
+    return combined
+
+
+def analyze(paths, workers=None, index_dir=DEFAULT_INDEX_DIR) -> dict:
+    """Scan `paths` in parallel, reusing the index, and return merged totals."""
+    index = LogIndex(index_dir) if index_dir else None
+    identities = {path: LogIndex.identity(path) for path in paths}
+    resume = {path: index.load(path, identities[path]) if index else (None, 0, False) for path in paths}
+
+    total = new_partial()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            path: pool.submit(scan_file, path, resume[path][1])
+            for path in paths if not resume[path][2]
+        }
+        for path in paths:
+            partial, _, unchanged = resume[path]
+            if not unchanged:
+                fresh, offset = futures[path].result()
+                partial = combine(partial, fresh)
+                if index:
+                    index.save(path, partial, offset, identities[path])
+            merge_into(total, partial, path)
+    return total
+
+
+def disconnect_windows(total: dict):
+    """Pair each disconnect with the next resume or reconnect."""
+    windows = []
+    reconnects = sorted(total['reconnects'])
+    i = 0
+    for down in sorted(total['disconnects']):
+        while i < len(reconnects) and reconnects[i] < down:
+            i += 1
+        up = reconnects[i] if i < len(reconnects) else None
+        if windows and windows[-1][1] == up:
+            continue  # Repeated disconnects before one reconnect form one window
+        windows.append((down, up))
+    return windows
+
+
+def summarize(total: dict):
+    """Per-game rows with derived timings and overlapping disconnect windows."""
+    windows = disconnect_windows(total)
+    rows = []
+    for sng_id, game in total['games'].items():
+        start = game['created']
+        finish = game['ended']
+        overlap = []
+        if start is not None:
+            for down, up in windows:
+                if up is not None and up < start:
+                    continue
+                if finish is not None and down > finish:
+                    continue
+                overlap.append((down, up))
+        rows.append({
+            'sng_id': sng_id,
+            'display_id': game['display_id'] or sng_id[:8],
+            'channel': game['channel'],
+            'created': start,
+            'time_to_fill': game['started'] - start if game['started'] is not None and start is not None else None,
+            'start_reason': game['start_reason'],
+            'duration': finish - start if finish is not None and start is not None else None,
+            'end_reason': game['end_reason'],
+            'players': game['players'],
+            'clicks': game['clicks'],
+            'edits': game['edits_sent'],
+            'edits_skipped': game['edits_skipped'],
+            'edits_coalesced': game['edits_coalesced'],
+            'delete_failures': game['delete_failures'],
+            'fallbacks_50027': game['fallbacks_50027'],
+            'disconnect_windows': len(overlap),
+            'disconnected_seconds': sum(
+                (up if up is not None else (finish or down)) - down for down, up in overlap
+            ),
+            'offsets': game['offsets'],
+        })
+    rows.sort(key=lambda row: row['created'] or 0)
+    return rows, windows
+
+
+def format_seconds(value) -> str:
+    return '-' if value is None else f"{value:.1f}s"
+
+
+def print_report(rows, windows, total):
+    print(f"Scanned {total['lines']} line(s); {len(rows)} game(s); {len(windows)} disconnect window(s)")
+    header = f"{'game':<10}{'created':<21}{'fill':>9}{'start':>8}{'ended':>12}{'edits':>7}{'del-fail':>10}{'50027':>7}{'disc':>6}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        created = datetime.fromtimestamp(row['created']).strftime('%Y-%m-%d %H:%M:%S') if row['created'] else '-'
+        print(
+            f"{row['display_id']:<10}{created:<21}{format_seconds(row['time_to_fill']):>9}"
+            f"{row['start_reason'] or '-':>8}{row['end_reason'] or '-':>12}{row['edits']:>7}"
+            f"{row['delete_failures']:>10}{row['fallbacks_50027']:>7}{row['disconnect_windows']:>6}"
+        )
+    if windows:
+        print("\nDisconnect windows:")
+        for down, up in windows:
+            start = datetime.fromtimestamp(down).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"  {start}  {format_seconds(up - down) if up is not None else 'no reconnect logged'}")
+
+
+def print_game_lines(row):
+    """Print the raw log lines for one game by seeking to its indexed offsets."""
+    by_file = {}
+    for path, offset in row['offsets']:
+        by_file.setdefault(path, []).append(offset)
+    for path, offsets in by_file.items():
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for offset in sorted(offsets):
+                f.seek(offset)
+                print(f.readline().decode('utf-8', 'replace').rstrip())
+
+
+def expand_paths(patterns, required=True):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or ([pattern] if required else [])
+        paths.extend(path for path in matches if path not in paths)
+    if not paths:
+        sys.exit("No log files found")
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        sys.exit(f"Log file(s) not found: {', '.join(missing)}")
+    return paths
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', help="Log files or glob patterns (default: events.jsonl* and bot.log*)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR, help="Directory for the offset index")
+    parser.add_argument('--no-index', action='store_true', help="Scan everything and don't touch the index")
+    parser.add_argument('--game', help="Only report games whose ID or display ID starts with this")
+    parser.add_argument('--lines', action='store_true', help="With --game, also print the game's raw log lines")
+    parser.add_argument('--json', action='store_true', help="Print per-game summaries as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = expand_paths(args.paths) if args.paths else expand_paths(DEFAULT_PATHS, required=False)
+    total = analyze(paths, args.workers, None if args.no_index else args.index_dir)
+    rows, windows = summarize(total)
+    if args.game:
+        rows = [row for row in rows if row['sng_id'].startswith(args.game) or row['display_id'].startswith(args.game)]
+
+    if args.json:
+        for row in rows:
+            row = dict(row)
+            del row['offsets']
+            print(json.dumps(row))
+        return
+    print_report(rows, windows, total)
+    if args.game and args.lines:
+        for row in rows:
+            print(f"\n== {row['sng_id']} ==")
+            print_game_lines(row)
+
 
 if __name__ == "__main__":
-    analyze_log_file("bot.log") 
\ No newline at end of file
+    main()
@@ -0,0 +1,123 @@
+"""Compare resident memory and startup time of the default and lean gateway settings.
+
+Each mode runs in its own process against the fake backend, since the gateway
+settings are read when bot.py is imported. The client logs in and receives a
+guild with --members members (cached only when the settings chunk guilds at
+startup, as Discord's member chunks would be), then --messages channel
+messages from distinct users and --commands /start commands. Startup time runs
+from creating the connection to the last member being cached.
+
+Usage:
+    python bench_gateway.py --members 50000 --messages 5000
+"""
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+
+MODES = {'default': 'false', 'lean': 'true'}
+
+
+def rss_kib() -> int:
+    """Current resident set size, falling back to the peak where /proc is unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+async def measure(args) -> dict:
+    started = time.perf_counter()
+    from simulate_load import load_bot
+    bot = load_bot([100])
+    from fake_discord import FakeDiscord
+    imported = time.perf_counter()
+    baseline = rss_kib()
+
+    fake = FakeDiscord(channel_ids=[100], role_id=bot.ROLE_ID, latency=0.0, route_limits={}, global_limit=None)
+    await fake.start(bot.client)
+    cached = fake.populate_guild(args.members)
+    ready = time.perf_counter()
+    gc.collect()
+    after_startup = rss_kib()
+
+    for i in range(args.messages):
+        fake.post_message(2_000_000 + i, 100, f"message {i}")
+    acks = [fake.invoke_command(3_000_000 + i, 100, 'start') for i in range(args.commands)]
+    await asyncio.wait(acks, timeout=60)
+    await asyncio.sleep(bot.MODERATION_WINDOW + 0.5)
+    gc.collect()
+    after_traffic = rss_kib()
+    state = bot.client._connection
+    report = {
+        'import_seconds': imported - started,
+        'startup_seconds': ready - imported,
+        'members_cached': sum(len(guild._members) for guild in bot.client.guilds),
+        'members_delivered': cached,
+        'messages_cached': len(state._messages or ()),
+        'rss_baseline_kib': baseline,
+        'rss_startup_kib': after_startup,
+        'rss_traffic_kib': after_traffic,
+    }
+    await bot.client.close()
+    return report
+
+
+def run_mode(mode: str, args) -> dict:
+    env = dict(os.environ, LEAN_GATEWAY=MODES[mode], LOG_LEVEL='WARNING', EVENT_LOG_PATH='')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child',
+        '--members', str(args.members), '--messages', str(args.messages), '--commands', str(args.commands),
+    ]
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_report(reports: dict):
+    rows = [
+        ('Startup (s)', 'startup_seconds', '{:.3f}'),
+        ('Members cached', 'members_cached', '{:d}'),
+        ('Messages cached', 'messages_cached', '{:d}'),
+        ('RSS after import (MiB)', 'rss_baseline_kib', None),
+        ('RSS after startup (MiB)', 'rss_startup_kib', None),
+        ('RSS after traffic (MiB)', 'rss_traffic_kib', None),
+    ]
+    print(f"{'':26s}" + ''.join(f"{mode:>12s}" for mode in reports))
+    for label, key, fmt in rows:
+        cells = []
+        for report in reports.values():
+            value = report[key]
+            cells.append(f"{value / 1024:12.1f}" if fmt is None else f"{fmt.format(value):>12s}")
+        print(f"{label:26s}" + ''.join(cells))
+    default, lean = reports.get('default'), reports.get('lean')
+    if default and lean:
+        saved = (default['rss_traffic_kib'] - lean['rss_traffic_kib']) / 1024
+        print(f"Lean mode saves {saved:.1f} MiB of RSS and {default['startup_seconds'] - lean['startup_seconds']:.3f}s of startup")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=50000, help="Guild members beyond the bot")
+    parser.add_argument('--messages', type=int, default=5000, help="Channel messages from distinct users")
+    parser.add_argument('--commands', type=int, default=20, help="/start commands to run")
+    parser.add_argument('--mode', choices=sorted(MODES), action='append', help="Mode to measure (default: both)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.child:
+        print(json.dumps(asyncio.run(measure(arguments))))
+    else:
+        print_report({mode: run_mode(mode, arguments) for mode in arguments.mode or MODES})
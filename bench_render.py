@@ -0,0 +1,82 @@
+"""Micro-benchmark for GUI rendering cost per player click.
+
+Compares building the embed and component payload from scratch on every
+render (what the bot did before renders were cached) with the cached
+renderer, for a click that changes the state and for a repeated render of
+an unchanged state (the edit pipeline and /start both render).
+
+Usage:
+    python bench_render.py --clicks 20000
+"""
+import time
+import asyncio
+import argparse
+
+from simulate_load import load_bot
+
+
+def per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def bench(args) -> dict:
+    bot = load_bot([100])
+    game = bot.Game('00000000-0000-4000-8000-00000000be4c', 'bench', 100)
+    bot.sng_games.add(game)
+    view = bot.SNGView(game.sng_id, game.starter, game.channel_id)
+    game.view = view
+    view.notify_users.update(range(5))
+    bot.client.scheduler.close()
+
+    def click():
+        game.players = game.players % bot.MAX_PLAYERS + 1
+
+    def uncached():
+        # A click followed by a render that rebuilds everything
+        click()
+        embed = view._build_embed()
+        return embed.to_dict(), view.component_view().to_components()
+
+    def cached_changed():
+        click()
+        view.changed()
+        return view.render()
+
+    def cached_unchanged():
+        return view.render()
+
+    results = {
+        'uncached_click': per_call_us(uncached, args.clicks),
+        'cached_click': per_call_us(cached_changed, args.clicks),
+        'cached_rerender': per_call_us(cached_unchanged, args.clicks),
+        'click_only': per_call_us(click, args.clicks),
+    }
+    bot.sng_games.clear()
+    return results
+
+
+def print_report(results: dict, renders_per_click: int):
+    click = results['click_only']
+    uncached = (results['uncached_click'] - click) * renders_per_click
+    cached = results['cached_click'] - click + results['cached_rerender'] * (renders_per_click - 1)
+    print(f"State change only:          {click:8.2f} us")
+    print(f"Full render (no cache):     {results['uncached_click'] - click:8.2f} us")
+    print(f"Cached render, new state:   {results['cached_click'] - click:8.2f} us")
+    print(f"Cached render, same state:  {results['cached_rerender']:8.2f} us")
+    print(f"Render cost per click with {renders_per_click} render(s): "
+          f"{uncached:.2f} us uncached, {cached:.2f} us cached ({uncached / cached if cached else 0:.1f}x)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clicks', type=int, default=20000, help="Iterations per measurement")
+    parser.add_argument('--renders', type=int, default=2, help="Renders of the same state per click")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    print_report(asyncio.run(bench(arguments)), arguments.renders)
@@ -1,80 +1,215 @@
 import os
+import re
+import abc
+import glob
+import gzip
+import json
+import time
+import queue
+import shutil
+import atexit
 import uuid
+import random
+import heapq
+import hashlib
 import asyncio
+import contextlib
+import contextvars
 import logging
+import bisect
+import sqlite3
+import aiohttp
+from aiohttp import web
+import itertools
+from collections import Counter
+from datetime import timedelta
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
 from typing import Optional, List
 
 import discord
 from discord import ButtonStyle, app_commands
 from discord.ext import commands
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context as webhook_adapter
 from dotenv import load_dotenv
 
-# Configure logging first
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s:%(levelname)s:%(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler(filename='bot.log', encoding='utf-8', mode='a'),
-        logging.StreamHandler()
-    ]
+class CompressingFileHandler(BaseRotatingHandler):
+    """Rotate by size or age into timestamped gzip files, keeping the newest `backup_count`."""
+    def __init__(self, filename: str, max_bytes: int = 0, interval: float = 0, backup_count: int = 0, delay: bool = False):
+        super().__init__(filename, 'a', encoding='utf-8', delay=delay)
+        self.configure(max_bytes, interval, backup_count)
+
+    def configure(self, max_bytes: int, interval: float, backup_count: int, filename: Optional[str] = None):
+        """Apply rotation settings; time rotation is aligned to multiples of `interval` seconds."""
+        self.acquire()
+        try:
+            if filename and os.path.abspath(filename) != self.baseFilename:
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+                self.baseFilename = os.path.abspath(filename)
+            self.max_bytes = max_bytes
+            self.interval = interval
+            self.backup_count = backup_count
+            self.rollover_at = (time.time() // interval + 1) * interval if interval else None
+        finally:
+            self.release()
+
+    def shouldRollover(self, record) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes:
+            if self.stream is None:
+                self.stream = self._open()
+            return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename):
+            # Compress on the logging thread; the event loop never waits on it
+            target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}.gz"
+            suffix = 1
+            while os.path.exists(target):
+                target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}.gz"
+                suffix += 1
+            with open(self.baseFilename, 'rb') as src, gzip.open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.baseFilename)
+            if self.backup_count:
+                for old in sorted(glob.glob(glob.escape(self.baseFilename) + '.*.gz'), key=os.path.getmtime)[:-self.backup_count]:
+                    os.remove(old)
+        if self.interval:
+            self.rollover_at = (time.time() // self.interval + 1) * self.interval
+        if not self.delay:
+            self.stream = self._open()
+
+class JsonEventFormatter(logging.Formatter):
+    """One compact JSON object per structured event."""
+    def format(self, record):
+        return json.dumps(
+            {'ts': round(record.created, 3), 'level': record.levelname, 'event': record.event, **record.fields},
+            default=str, separators=(',', ':')
+        )
+
+def _text_log_filter(record) -> bool:
+    """Keep structured events out of bot.log while the JSONL stream is on."""
+    return not (EVENT_LOG_PATH and hasattr(record, 'event'))
+
+def _console_log_filter(record) -> bool:
+    """Show structured events on the console only when they are warnings or worse."""
+    return not (EVENT_LOG_PATH and hasattr(record, 'event') and record.levelno < logging.WARNING)
+
+def _event_log_filter(record) -> bool:
+    return bool(EVENT_LOG_PATH) and hasattr(record, 'event')
+
+# Configure logging first; records are queued and written by a background thread.
+# Rotation and the event stream path are applied once the configuration is read.
+LOG_FORMAT = '%(asctime)s:%(levelname)s:%(name)s: %(message)s'
+EVENT_LOG_PATH = 'events.jsonl'  # Overridden by the EVENT_LOG_PATH setting; empty disables the stream
+_log_file_handler = CompressingFileHandler('bot.log')
+_log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+_log_file_handler.addFilter(_text_log_filter)
+_log_console_handler = logging.StreamHandler()
+_log_console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+_log_console_handler.addFilter(_console_log_filter)
+_event_file_handler = CompressingFileHandler(EVENT_LOG_PATH, delay=True)
+_event_file_handler.setFormatter(JsonEventFormatter())
+_event_file_handler.addFilter(_event_log_filter)
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(
+    _log_queue, _log_file_handler, _log_console_handler, _event_file_handler,
+    respect_handler_level=True
 )
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Output handlers add the prefix
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Verbose per-click tracing; overridden by TRACE_INTERACTIONS once the config is read
+TRACE_INTERACTIONS = False
+
+class EventFields:
+    """Key/value pairs that are only rendered if the record is emitted."""
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: dict):
+        self.fields = fields
+
+    def __str__(self):
+        return ' '.join(f"{key}={value}" for key, value in self.fields.items())
+
+def log_event(level: int, event: str, **fields):
+    """Log a structured key/value event, skipping all work if the level is disabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, "event=%s %s", event, EventFields(fields), extra={'event': event, 'fields': fields})
+
+def trace(event: str, **fields):
+    """Log a hot-path event at DEBUG when TRACE_INTERACTIONS is on."""
+    if TRACE_INTERACTIONS:
+        log_event(logging.DEBUG, event, **fields)
+
 # Debug logging for environment setup
 logger.info("Starting bot initialization...")
 logger.info(f"Current working directory: {os.getcwd()}")
 logger.info(f".env file exists: {os.path.exists('.env')}")
 
+# Values of variables whose names match this are never written to the log
+SECRET_NAME_PATTERN = re.compile(r'TOKEN|SECRET|PASSWORD|KEY', re.IGNORECASE)
+
+def loggable_value(name: str, value):
+    """The value to show in logs for an environment variable."""
+    return '<redacted>' if SECRET_NAME_PATTERN.search(name) and value else value
+
 # Read and set environment variables directly
 env_vars = {}
 try:
     with open('.env', 'r') as f:
         env_contents = f.read()
-        logger.info(f"ENV file contents:\n{env_contents}")
-        
+
         # Parse each line
         for line in env_contents.splitlines():
             if '=' in line:
                 key, value = line.split('=', 1)
                 env_vars[key.strip()] = value.strip()
                 os.environ[key.strip()] = value.strip()
-                logger.info(f"Set environment variable {key.strip()} = {value.strip()}")
+    logger.info(f"Loaded {len(env_vars)} variable(s) from .env: {', '.join(env_vars)}")
 except Exception as e:
     logger.error(f"Error reading .env: {e}")
 
 # Then proceed with the rest of the initialization
 
 def parse_bool(value):
-    """Parse string to bool with explicit logging"""
-    logger.info(f"parse_bool received value: '{value}' (type: {type(value)})")
-    
+    """Parse string to bool with trace logging"""
     if isinstance(value, bool):
-        logger.info(f"Value is already bool: {value}")
+        trace("parse_bool", value=value, result=value)
         return value
         
     if isinstance(value, str):
         # Strip any whitespace and convert to lowercase
         cleaned_value = value.strip().lower()
-        logger.info(f"Cleaned string value: '{cleaned_value}'")
         
         # Check for various true values
         is_true = cleaned_value in ('true', 't', 'yes', 'y', '1', 'on')
-        logger.info(f"String '{cleaned_value}' evaluates to: {is_true}")
+        trace("parse_bool", value=repr(value), result=is_true)
         return is_true
         
-    logger.info(f"Defaulting non-string/non-bool value to False")
+    trace("parse_bool", value=repr(value), result=False)
     return False
 
 # Helper function to retrieve and validate environment variables
 def get_env_variable(var_name: str, cast_type, default=None):
     value = os.getenv(var_name, default)
-    logger.info(f"Reading environment variable {var_name}: '{value}' (type: {type(value)})")
+    logger.info(f"Reading environment variable {var_name}: '{loggable_value(var_name, value)}' (type: {type(value)})")
     if value is None:
         logger.error(f"Environment variable '{var_name}' is not set.")
         raise ValueError(f"Environment variable '{var_name}' is not set.")
     try:
         result = cast_type(value)
-        logger.info(f"Converted {var_name} value '{value}' to: {result}")
+        logger.info(f"Converted {var_name} value '{loggable_value(var_name, value)}' to: {loggable_value(var_name, result)}")
         return result
     except ValueError:
         logger.error(f"Environment variable '{var_name}' must be of type {cast_type.__name__}.")
@@ -84,28 +219,350 @@ def get_env_variable(var_name: str, cast_type, default=None):
 DISCORD_BOT_TOKEN = get_env_variable('DISCORD_BOT_TOKEN', str)
 DESIGNATED_CHANNELS = get_env_variable('DESIGNATED_CHANNELS', lambda x: list(map(int, x.split(','))))
 TEST_MODE = get_env_variable('TEST_MODE', parse_bool, default=False)
-logger.info(f"Raw env value for TEST_MODE: '{os.getenv('TEST_MODE')}'")
-logger.info(f"Final TEST_MODE value: {TEST_MODE} (type: {type(TEST_MODE)})")
+logger.info(f"Final TEST_MODE value: {TEST_MODE}")
 ADMIN_USER_ID = get_env_variable('ADMIN_USER_ID', int)
 PIN_BOT_ID = get_env_variable('PIN_BOT_ID', int)
 ROLE_ID = get_env_variable('ROLE_ID', int)
+LOG_LEVEL = get_env_variable('LOG_LEVEL', str, default='INFO').upper()
+TRACE_INTERACTIONS = get_env_variable('TRACE_INTERACTIONS', parse_bool, default=False)  # Per-click debug tracing
+SYNC_GUILDS = get_env_variable('SYNC_GUILDS', lambda x: [int(i) for i in x.split(',') if i.strip()], default='')
+COMMAND_SYNC_STATE_PATH = get_env_variable('COMMAND_SYNC_STATE_PATH', str, default='.command_sync.json')
+GUI_EDIT_WINDOW = get_env_variable('GUI_EDIT_WINDOW', float, default=0.5)  # Seconds to coalesce GUI edits
+NOTIFY_CONCURRENCY = get_env_variable('NOTIFY_CONCURRENCY', int, default=5)  # Max DMs in flight at once
+GAME_STORE = get_env_variable('GAME_STORE', str, default='sqlite')  # 'sqlite' or 'memory'
+GAME_STORE_PATH = get_env_variable('GAME_STORE_PATH', str, default='sng_games.db')
+GAME_STORE_FLUSH_INTERVAL = get_env_variable('GAME_STORE_FLUSH_INTERVAL', float, default=1.0)  # Seconds between batched writes
+MODERATION_WINDOW = get_env_variable('MODERATION_WINDOW', float, default=1.0)  # Seconds to collect messages before a purge
+MAX_GAMES_PER_CHANNEL = get_env_variable('MAX_GAMES_PER_CHANNEL', int, default=0)  # 0 means no limit
+MODERATION_MAX_DEPTH = get_env_variable('MODERATION_MAX_DEPTH', int, default=500)  # Max queued deletes per channel
+METRICS_PORT = get_env_variable('METRICS_PORT', int, default=0)  # 0 disables the metrics endpoint
+METRICS_HOST = get_env_variable('METRICS_HOST', str, default='127.0.0.1')
+ACTIVITY_SIGNAL = get_env_variable('ACTIVITY_SIGNAL', str, default='message').lower()  # 'message', 'typing' or 'none'
+ACTIVITY_WINDOW = get_env_variable('ACTIVITY_WINDOW', float, default=15.0)  # Min seconds between signals per channel
+RATE_LIMIT_RESERVE = get_env_variable('RATE_LIMIT_RESERVE', int, default=1)  # Bucket slots low-priority calls leave free
+RETRY_ATTEMPTS = get_env_variable('RETRY_ATTEMPTS', int, default=4)  # Tries per call on 5xx, connection errors and long 429s
+RETRY_BASE_DELAY = get_env_variable('RETRY_BASE_DELAY', float, default=0.5)  # First backoff step in seconds
+RETRY_MAX_DELAY = get_env_variable('RETRY_MAX_DELAY', float, default=10.0)  # Backoff cap; longer retry_after waits give up
+CIRCUIT_FAILURES = get_env_variable('CIRCUIT_FAILURES', int, default=5)  # Consecutive failures that open a route's breaker
+CIRCUIT_COOLDOWN = get_env_variable('CIRCUIT_COOLDOWN', float, default=30.0)  # Seconds before an open breaker lets a probe through
+LOG_MAX_BYTES = get_env_variable('LOG_MAX_BYTES', int, default=10 * 1024 * 1024)  # 0 disables size-based rotation
+LOG_ROTATE_HOURS = get_env_variable('LOG_ROTATE_HOURS', float, default=24.0)  # 0 disables time-based rotation
+LOG_BACKUP_COUNT = get_env_variable('LOG_BACKUP_COUNT', int, default=30)  # Compressed files kept per log; 0 keeps all
+EVENT_LOG_PATH = get_env_variable('EVENT_LOG_PATH', str, default='events.jsonl')  # Empty keeps events in bot.log
+QUEUE_GAME_SIZE = get_env_variable('QUEUE_GAME_SIZE', int, default=8)  # Queued players that start a game at once
+QUEUE_TIMEOUT = get_env_variable('QUEUE_TIMEOUT', float, default=120.0)  # Seconds before a smaller queued game starts
+LEAN_GATEWAY = get_env_variable('LEAN_GATEWAY', parse_bool, default=False)  # Skip member caching and chunking
+TRAFFIC_RECORD_PATH = get_env_variable('TRAFFIC_RECORD_PATH', str, default='')  # Empty disables traffic recording
+LEAN_MAX_MESSAGES = get_env_variable('LEAN_MAX_MESSAGES', int, default=100)  # Message cache size in lean mode
+_log_file_handler.configure(LOG_MAX_BYTES, LOG_ROTATE_HOURS * 3600, LOG_BACKUP_COUNT)
+_event_file_handler.configure(LOG_MAX_BYTES, LOG_ROTATE_HOURS * 3600, LOG_BACKUP_COUNT, filename=EVENT_LOG_PATH or None)
+logging.getLogger().setLevel(LOG_LEVEL)
+if TRACE_INTERACTIONS:
+    logger.setLevel(logging.DEBUG)
 
 # Set up intents
-intents = discord.Intents.default()
-intents.members = True  # Required for role checks
-intents.message_content = True  # Required to read message content
+if LEAN_GATEWAY:
+    # Guilds for channels and roles, guild messages for moderation; interactions need no intent
+    intents = discord.Intents(guilds=True, guild_messages=True, message_content=True)
+else:
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True  # Required to read message content
+
+def gateway_options() -> dict:
+    """Client cache and chunking settings for the selected gateway mode."""
+    if not LEAN_GATEWAY:
+        return {}
+    return {
+        'chunk_guilds_at_startup': False,
+        'member_cache_flags': discord.MemberCacheFlags.none(),
+        'max_messages': LEAN_MAX_MESSAGES or None,  # 0 turns the message cache off
+    }
+
+# Latency and REST instrumentation shown by /botstats
+class LatencyHistogram:
+    """Fixed log-scale buckets; recording a sample never grows memory."""
+    BOUNDS = tuple(0.0005 * 1.25 ** i for i in range(60))  # 0.5 ms up to ~2 min
+    __slots__ = ('counts', 'count', 'total')
 
-# First define the button classes
-class PlayerButton(discord.ui.Button):
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile sample."""
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.BOUNDS[min(i, len(self.BOUNDS) - 1)]
+        return self.BOUNDS[-1]
+
+class Span:
+    """Context manager that times one stage into BotStats."""
+    __slots__ = ('stats', 'name', 'started')
+
+    def __init__(self, stats, name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.name, time.perf_counter() - self.started)
+        return False
+
+ROUTE_ID_PATTERN = re.compile(r'/\d{15,21}')
+ROUTE_TOKEN_PATTERN = re.compile(r'^/(webhooks|interactions)/(?:\{id\}|\d+)/[^/]+')
+
+def route_template(path: str) -> str:
+    """Collapse IDs and tokens in a REST path so calls group by route."""
+    path = path.split('?', 1)[0]
+    if path.startswith('/api/v'):
+        path = path.split('/', 3)[3] if path.count('/') >= 3 else ''
+        path = '/' + path
+    path = ROUTE_ID_PATTERN.sub('/{id}', path)
+    return ROUTE_TOKEN_PATTERN.sub(r'/\1/{id}/{token}', path)
+
+# When RequestScheduler handed the current call to HTTPClient; the first request
+# start after it shows how long discord.py held the call for its bucket
+_send_started = contextvars.ContextVar('send_started', default=None)
+RATELIMIT_WAIT_SOURCES = ('retry_after', 'queue', 'bucket')
+
+class BotStats:
+    """In-memory latency histograms per stage plus REST and rate limit counters."""
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.spans = {}  # stage -> LatencyHistogram
+        self.rest_calls = Counter()  # "METHOD /route" -> count
+        self.rate_limited = Counter()  # "METHOD /route" -> 429 count
+        self.ratelimit_wait = Counter()  # RATELIMIT_WAIT_SOURCES entry -> seconds
+        self.retries = Counter()  # "METHOD /route" -> retries after outage-type failures
+        self.shed = Counter()  # "METHOD /route" -> calls refused while Discord was degraded
+        self.games_created = 0
+        self.games_ended = Counter()  # end reason -> count
+        self.loop_lag = 0.0  # Most recent event loop lag sample in seconds
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        histogram = self.spans.get(name)
+        if histogram is None:
+            histogram = self.spans[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_request(self, method: str, path: str, status: int, seconds: float, retry_after: Optional[float] = None):
+        """Count one REST response; 429s also add their retry delay."""
+        route = f"{method} {route_template(path)}"
+        self.rest_calls[route] += 1
+        self.record('rest', seconds)
+        if status == 429:
+            self.rate_limited[route] += 1
+            self.ratelimit_wait['retry_after'] += retry_after or 0.0
+
+    def request_started(self):
+        """Add the time discord.py held the current call for its bucket before sending it."""
+        handed_over = _send_started.get()
+        if handed_over is not None:
+            # Later tries of the same call wait out a 5xx or 429, which is not bucket time
+            _send_started.set(None)
+            self.ratelimit_wait['bucket'] += time.perf_counter() - handed_over
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """aiohttp hooks that feed every REST and webhook request into the counters."""
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.started = time.perf_counter()
+            self.request_started()
+
+        async def on_request_end(session, context, params):
+            retry_after = None
+            if params.response.status == 429:
+                try:
+                    retry_after = float(params.response.headers.get('Retry-After', 0))
+                except ValueError:
+                    retry_after = None
+            self.record_request(
+                params.method, params.url.path, params.response.status,
+                time.perf_counter() - context.started, retry_after
+            )
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def report(self) -> str:
+        """Plain-text summary for /botstats."""
+        uptime = time.monotonic() - self.started_at
+        lines = [f"Uptime: {uptime / 3600:.1f}h", "", f"{'stage':<20}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)"]
+        for name in sorted(self.spans):
+            histogram = self.spans[name]
+            lines.append(
+                f"{name:<20}{histogram.count:>8}"
+                f"{histogram.percentile(50) * 1000:>9.1f}"
+                f"{histogram.percentile(95) * 1000:>9.1f}"
+                f"{histogram.percentile(99) * 1000:>9.1f}"
+            )
+        total_429 = sum(self.rate_limited.values())
+        lines += ["", f"REST calls: {sum(self.rest_calls.values())}  429s: {total_429}"]
+        lines.append("Rate limit wait: " + ", ".join(
+            f"{source} {self.ratelimit_wait[source]:.1f}s" for source in RATELIMIT_WAIT_SOURCES
+        ))
+        for route, count in self.rest_calls.most_common(10):
+            limited = self.rate_limited.get(route, 0)
+            lines.append(f"{count:>7}  {route}" + (f"  [{limited} x 429]" if limited else ""))
+        if self.retries or self.shed:
+            lines += ["", f"Retries: {sum(self.retries.values())}  Shed: {sum(self.shed.values())}"]
+            for route in sorted(set(self.retries) | set(self.shed)):
+                lines.append(f"{self.retries.get(route, 0):>7}{self.shed.get(route, 0):>7}  {route}")
+        return '\n'.join(lines)
+
+class MetricsExporter:
+    """Serves BotStats and game counts in Prometheus text format on a local port."""
+    LAG_INTERVAL = 1.0  # Seconds between event loop lag samples
+
+    def __init__(self, client, host: str, port: int):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.lag_task = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        self.lag_task = asyncio.create_task(self._sample_loop_lag())
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self.lag_task:
+            self.lag_task.cancel()
+            self.lag_task = None
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def _sample_loop_lag(self):
+        """Measure how late a fixed sleep wakes up; a busy loop wakes up late."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.LAG_INTERVAL)
+            self.client.stats.loop_lag = max(0.0, time.perf_counter() - started - self.LAG_INTERVAL)
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+    @staticmethod
+    def _label(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def render(self) -> str:
+        stats = self.client.stats
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{self._label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        by_state = sng_games.count_by_state()
+        metric('sng_active_games', 'gauge', "Games currently open or running.",
+               [({'state': state}, by_state.get(state, 0)) for state in ('open', 'started')])
+        metric('sng_games_created_total', 'counter', "Games created with /start.", [({}, stats.games_created)])
+        metric('sng_games_ended_total', 'counter', "Games ended, by reason (manual, auto_end, inactivity).",
+               [({'reason': reason}, count) for reason, count in sorted(stats.games_ended.items())])
+        metric('sng_gateway_disconnects_total', 'counter', "Gateway disconnects since startup.",
+               [({}, self.client.disconnect_count)])
+        latency = self.client.latency
+        if latency == latency and latency != float('inf'):  # NaN or inf before the first heartbeat
+            metric('sng_gateway_latency_seconds', 'gauge', "Gateway heartbeat latency.", [({}, f"{latency:.6f}")])
+        metric('sng_event_loop_lag_seconds', 'gauge', "How late the event loop woke from a timed sleep.",
+               [({}, f"{stats.loop_lag:.6f}")])
+        metric('sng_rest_requests_total', 'counter', "REST requests by route.",
+               [({'route': route}, count) for route, count in sorted(stats.rest_calls.items())])
+        metric('sng_rest_rate_limited_total', 'counter', "REST responses with status 429 by route.",
+               [({'route': route}, count) for route, count in sorted(stats.rate_limited.items())])
+        metric('sng_rest_ratelimit_wait_seconds_total', 'counter',
+               "Seconds calls waited on rate limits: retry_after of 429s, the request queue, or discord.py's bucket.",
+               [({'source': source}, f"{stats.ratelimit_wait[source]:.3f}") for source in RATELIMIT_WAIT_SOURCES])
+        metric('sng_rest_retries_total', 'counter', "Calls retried after a 5xx, connection error or long 429, by route.",
+               [({'route': route}, count) for route, count in sorted(stats.retries.items())])
+        metric('sng_rest_shed_total', 'counter', "Calls refused while Discord was degraded, by route.",
+               [({'route': route}, count) for route, count in sorted(stats.shed.items())])
+        metric('sng_circuit_open', 'gauge', "1 while a route's circuit breaker is open or half-open.",
+               [({'route': route}, int(breaker.opened_at is not None))
+                for route, breaker in sorted(self.client.retry_policy.breakers.items())])
+        samples = []
+        for stage in sorted(stats.spans):
+            histogram = stats.spans[stage]
+            for quantile in (0.5, 0.95, 0.99):
+                samples.append(({'stage': stage, 'quantile': quantile}, f"{histogram.percentile(quantile * 100):.6f}"))
+        metric('sng_stage_latency_seconds', 'summary', "Interaction stage latency.", samples)
+        for stage in sorted(stats.spans):
+            histogram = stats.spans[stage]
+            lines.append(f'sng_stage_latency_seconds_sum{{stage="{self._label(stage)}"}} {histogram.total:.6f}')
+            lines.append(f'sng_stage_latency_seconds_count{{stage="{self._label(stage)}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+# First define the button classes. Buttons are dynamic items: discord.py matches
+# a click's custom_id against each template and builds the item from it, so no
+# view is registered per game and buttons keep working across restarts.
+SNG_ID_PATTERN = r'(?P<sng_id>[0-9a-f-]+)'
+
+def active_view(sng_id: str) -> Optional['SNGView']:
+    """The view of an active game, or None once it has ended."""
+    game = sng_games.get(sng_id)
+    return game.view if game else None
+
+class RecordedClick:
+    """Mixin for the game buttons that records each click for replay before its callback runs."""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if client.recorder:
+            client.recorder.interaction(interaction)
+        return True
+
+async def reply_game_ended(interaction: discord.Interaction, sng_id: str):
+    """Answer a click on a game that is no longer active."""
+    trace("stale_click", sng=sng_id, user=interaction.user.id)
+    await interaction.response.send_message("This game has already ended. Please start a new game.", ephemeral=True)
+
+class PlayerButton(RecordedClick, discord.ui.DynamicItem[discord.ui.Button], template=rf'player_{SNG_ID_PATTERN}_(?P<slot>\d+)'):
     def __init__(self, sng_id, slot):
-        super().__init__(style=ButtonStyle.grey, label=f"Player {slot}", custom_id=f"player_{sng_id}_{slot}")
+        super().__init__(discord.ui.Button(style=ButtonStyle.grey, label=f"Player {slot}", custom_id=f"player_{sng_id}_{slot}"))
         self.sng_id = sng_id
         self.slot = slot
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['sng_id'], int(match['slot']))
+
     async def callback(self, interaction: discord.Interaction):
-        logger.info(f"PlayerButton clicked by {interaction.user} for SNG {self.view.sng_id}, slot {self.slot}")
+        trace("player_click", sng=self.sng_id, slot=self.slot, user=interaction.user.id)
+        view = active_view(self.sng_id)
         try:
-            await self.view.update_players(interaction, self.slot)
+            if view is None:
+                await reply_game_ended(interaction, self.sng_id)
+                return
+            with client.stats.span('player_click'):
+                await view.update_players(interaction, self.slot)
         except Exception as e:
             await interaction.response.send_message(
                 "An unexpected error occurred while updating players.",
@@ -113,14 +570,24 @@ class PlayerButton(discord.ui.Button):
             )
             logger.error(f"Error in PlayerButton callback: {e}", exc_info=True)
 
-class StartSNGButton(discord.ui.Button):
+class StartSNGButton(RecordedClick, discord.ui.DynamicItem[discord.ui.Button], template=rf'start_sng_{SNG_ID_PATTERN}'):
     def __init__(self, sng_id):
-        super().__init__(label="Start SNG", style=ButtonStyle.blurple, custom_id=f"start_sng_{sng_id}")
+        super().__init__(discord.ui.Button(label="Start SNG", style=ButtonStyle.blurple, custom_id=f"start_sng_{sng_id}"))
+        self.sng_id = sng_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['sng_id'])
 
     async def callback(self, interaction: discord.Interaction):
-        logger.info(f"StartSNGButton clicked by {interaction.user} for SNG {self.view.sng_id}")
+        trace("start_click", sng=self.sng_id, user=interaction.user.id)
+        view = active_view(self.sng_id)
         try:
-            await self.view.start_sng(interaction)
+            if view is None:
+                await reply_game_ended(interaction, self.sng_id)
+                return
+            with client.stats.span('start_click'):
+                await view.start_sng(interaction)
         except Exception as e:
             await interaction.response.send_message(
                 "An unexpected error occurred while starting the SNG.",
@@ -128,25 +595,45 @@ class StartSNGButton(discord.ui.Button):
             )
             logger.error(f"Error in StartSNGButton callback: {e}", exc_info=True)
 
-class EndSNGButton(discord.ui.Button):
+class EndSNGButton(RecordedClick, discord.ui.DynamicItem[discord.ui.Button], template=rf'end_sng_{SNG_ID_PATTERN}'):
     def __init__(self, sng_id):
-        super().__init__(label="End SNG", style=ButtonStyle.red, custom_id=f"end_sng_{sng_id}")
+        super().__init__(discord.ui.Button(label="End SNG", style=ButtonStyle.red, custom_id=f"end_sng_{sng_id}"))
+        self.sng_id = sng_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['sng_id'])
 
     async def callback(self, interaction: discord.Interaction):
-        logger.info(f"EndSNGButton clicked by {interaction.user} for SNG {self.view.sng_id}")
+        trace("end_click", sng=self.sng_id, user=interaction.user.id)
+        view = active_view(self.sng_id)
         try:
-            await self.view.end_sng(interaction)
+            if view is None:
+                await interaction.response.send_message("This game has already ended.", ephemeral=True)
+                return
+            with client.stats.span('end_click'):
+                await view.end_sng(interaction)
         except Exception as e:
             logger.error(f"Error in EndSNGButton callback: {e}", exc_info=True)
 
-class NotifyMeButton(discord.ui.Button):
+class NotifyMeButton(RecordedClick, discord.ui.DynamicItem[discord.ui.Button], template=rf'notify_me_{SNG_ID_PATTERN}'):
     def __init__(self, sng_id):
-        super().__init__(label="Notify Me", style=ButtonStyle.blurple, custom_id=f"notify_me_{sng_id}")
+        super().__init__(discord.ui.Button(label="Notify Me", style=ButtonStyle.blurple, custom_id=f"notify_me_{sng_id}"))
+        self.sng_id = sng_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['sng_id'])
 
     async def callback(self, interaction: discord.Interaction):
-        logger.info(f"NotifyMeButton clicked by {interaction.user} for SNG {self.view.sng_id}")
+        trace("notify_click", sng=self.sng_id, user=interaction.user.id)
+        view = active_view(self.sng_id)
         try:
-            await self.view.toggle_notification(interaction)
+            if view is None:
+                await reply_game_ended(interaction, self.sng_id)
+                return
+            with client.stats.span('notify_click'):
+                await view.toggle_notification(interaction)
         except Exception as e:
             await interaction.response.send_message(
                 "An error occurred while toggling notifications.",
@@ -154,11 +641,1200 @@ class NotifyMeButton(discord.ui.Button):
             )
             logger.error(f"Error in NotifyMeButton callback: {e}", exc_info=True)
 
+GAME_BUTTONS = (PlayerButton, StartSNGButton, EndSNGButton, NotifyMeButton)
+
+# Outbound REST scheduling. Interaction responses and followups use the
+# interaction webhook endpoints and never wait here; everything sent through
+# client.http is queued per rate-limit bucket and released in priority order.
+REQUEST_PRIORITIES = {'gui_edit': 0, 'message': 1, 'activity': 2, 'delete': 3, 'dm': 4}
+LOW_PRIORITY = REQUEST_PRIORITIES['delete']  # Calls at or below this never use a bucket's reserved slots
+_request_priority = contextvars.ContextVar('request_priority', default=REQUEST_PRIORITIES['message'])
+
+@contextlib.contextmanager
+def request_priority(name: str):
+    """Send REST calls made inside the block (and tasks started in it) at the given priority."""
+    token = _request_priority.set(REQUEST_PRIORITIES[name])
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+# Retry policy shared by every outbound call, REST and webhook alike
+SHED_PRIORITY = REQUEST_PRIORITIES['activity']  # Calls at or below this are shed while any breaker is open
+SERVER_ERROR_STATUSES = frozenset({500, 502, 503, 504, 524})
+# HTTPClient.request already retries these itself before raising; only 503 is raised straight away
+HTTP_RETRIED_STATUSES = frozenset({500, 502, 504, 524})
+
+class CircuitOpenError(discord.DiscordException):
+    """Raised instead of sending a call while Discord is degraded."""
+    def __init__(self, route: str, shed: bool = False):
+        self.route = route
+        self.shed = shed
+        reason = "shed non-essential call" if shed else "circuit open for"
+        super().__init__(f"Discord is degraded: {reason} {route}")
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one route: closed, open, then half-open for a single probe."""
+    def __init__(self, threshold: int = CIRCUIT_FAILURES, cooldown: float = CIRCUIT_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in the half-open state only the first one may."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self) -> bool:
+        """Record an answer from Discord, returning True if that closed the breaker."""
+        was_open = self.opened_at is not None
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        return was_open
+
+    def failure(self) -> bool:
+        """Record a failed call, returning True if that (re)opened the breaker."""
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self.probing = False
+            return True
+        return False
+
+class RetryPolicy:
+    """Jittered exponential backoff and per-route circuit breakers for all Discord calls.
+
+    Only outage-type failures are retried: 5xx responses, connection errors and
+    rate limits too long for discord.py to sleep through. Every other answer
+    from Discord, including 403 and 404, counts as the route being healthy.
+    """
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base: float = RETRY_BASE_DELAY,
+                 cap: float = RETRY_MAX_DELAY, stats=None):
+        self.attempts = max(1, attempts)
+        self.base = base
+        self.cap = cap
+        self.stats = stats
+        self.breakers = {}  # "METHOD /route" -> CircuitBreaker
+        self.random = random.Random()
+
+    def backoff(self, attempt: int, retry_after: float = 0.0) -> float:
+        """Full-jitter delay before retrying after `attempt` tries, never shorter than retry_after."""
+        return max(retry_after, self.random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1))))
+
+    def degraded(self) -> bool:
+        return any(breaker.opened_at is not None for breaker in self.breakers.values())
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Seconds Discord asked us to wait (0 if it did not say) for an outage-type error, else None."""
+        if isinstance(error, discord.RateLimited):
+            return error.retry_after
+        if isinstance(error, discord.HTTPException):
+            if error.status not in SERVER_ERROR_STATUSES and error.status != 429:
+                return None
+            try:
+                return float(error.response.headers.get('Retry-After', 0))
+            except (AttributeError, TypeError, ValueError):
+                return 0.0
+        if isinstance(error, (OSError, aiohttp.ClientError, asyncio.TimeoutError)):
+            return 0.0
+        return None
+
+    async def call(self, route, send, priority: int, retried: frozenset = frozenset()):
+        """Run `send()` for `route` under the policy, retrying outage-type failures.
+
+        Statuses in `retried` were already retried by the transport, so they
+        count against the breaker but are not retried again.
+        """
+        key = f"{route.method} {route.path}"
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker()
+        # An interaction token has to be answered within seconds; a late retry is no use
+        attempts = 1 if route.path.startswith('/interactions/') else self.attempts
+        attempt = 0
+        while True:
+            attempt += 1
+            if priority >= SHED_PRIORITY and self.degraded():
+                self._count('shed', key)
+                raise CircuitOpenError(key, shed=True)
+            if not breaker.allow():
+                self._count('shed', key)
+                raise CircuitOpenError(key)
+            probe = breaker.probing
+            try:
+                result = await send()
+            except Exception as e:
+                retry_after = self.retry_after(e)
+                if retry_after is None:
+                    if breaker.success():
+                        log_event(logging.INFO, "circuit_closed", route=key)
+                    raise
+                # A rate limit is Discord pacing a healthy route, not an outage
+                rate_limited = isinstance(e, discord.RateLimited) or getattr(e, 'status', None) == 429
+                if not rate_limited and breaker.failure():
+                    log_event(logging.WARNING, "circuit_open", route=key, failures=breaker.failures, error=str(e))
+                if attempt >= attempts or retry_after > self.cap or getattr(e, 'status', None) in retried:
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                self._count('retries', key)
+                logger.warning(f"{key} failed ({e}), retry {attempt} of {attempts - 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                if probe and breaker.probing:
+                    breaker.probing = False  # The probe was cancelled; let the next call probe
+            if breaker.success():
+                log_event(logging.INFO, "circuit_closed", route=key)
+            return result
+
+    def _count(self, name: str, key: str):
+        if self.stats:
+            getattr(self.stats, name)[key] += 1
+
+    def report(self) -> List[str]:
+        """Breakers that are not closed, for /botstats."""
+        return [
+            f"{breaker.state:>9}  {key}  ({breaker.failures} failures)"
+            for key, breaker in sorted(self.breakers.items()) if breaker.opened_at is not None
+        ]
+
+class RetryingWebhookAdapter(AsyncWebhookAdapter):
+    """Webhook adapter that sends the requests of another adapter through a RetryPolicy.
+
+    Interaction responses, followups and their edits go through discord.py's
+    webhook adapter instead of client.http. It is looked up in a context
+    variable, so installing this one only affects tasks started from the
+    context that installed it, not every Webhook in the process.
+    """
+    def __init__(self, inner: AsyncWebhookAdapter, policy: RetryPolicy):
+        super().__init__()
+        self.inner = inner
+        self.policy = policy
+
+    async def request(self, route, *args, **kwargs):
+        # The inner adapter retries every 5xx itself
+        return await self.policy.call(route, lambda: self.inner.request(route, *args, **kwargs), _request_priority.get(),
+                                      SERVER_ERROR_STATUSES)
+
+    @classmethod
+    def install(cls, policy: RetryPolicy) -> 'RetryingWebhookAdapter':
+        """Wrap the current adapter once; installing again, e.g. on a second setup_hook, changes nothing."""
+        current = webhook_adapter.get()
+        if isinstance(current, cls):
+            if current.policy is policy:
+                return current
+            current = current.inner  # Replace another policy rather than stacking both retry loops
+        adapter = cls(current, policy)
+        webhook_adapter.set(adapter)
+        return adapter
+
+class RequestScheduler:
+    """Priority queue per rate-limit bucket in front of HTTPClient.request.
+
+    Uses discord.py's own bucket state to release only as many calls as the
+    bucket can take right now, and keeps `reserve` slots of every bucket free
+    for higher-priority calls so deletes and DMs never push a click back.
+    That state is private to discord.py, so with a version that lays it out
+    differently calls go straight through under the retry policy alone.
+    """
+    RATELIMIT_FIELDS = ('limit', 'remaining', 'outgoing', 'is_expired')
+
+    def __init__(self, http, reserve: int = RATE_LIMIT_RESERVE, stats=None, policy: Optional[RetryPolicy] = None):
+        self.http = http
+        self.reserve = reserve
+        self.stats = stats
+        self.policy = policy or RetryPolicy(stats=stats)
+        self.enabled = self.supports(http)
+        if not self.enabled:
+            logger.warning(
+                f"discord.py {discord.__version__} does not expose the rate-limit state the request "
+                "scheduler reads; sending calls without priority queueing"
+            )
+        self._send = http.request
+        self._queues = {}  # bucket key -> heap of (priority, seq, route, kwargs, future)
+        self._inflight = Counter()  # bucket key -> calls released but not finished
+        self._timers = {}  # bucket key -> TimerHandle for the next retry
+        self._seq = itertools.count()
+        http.request = self.request
+
+    @classmethod
+    def supports(cls, http) -> bool:
+        """Whether `http` keeps its buckets the way discord.py 2.4 does (see requirements.txt)."""
+        ratelimit = getattr(discord.http, 'Ratelimit', None)
+        return (
+            isinstance(getattr(http, '_bucket_hashes', None), dict)
+            and isinstance(getattr(http, '_buckets', None), dict)
+            and ratelimit is not None
+            and all(hasattr(ratelimit, name) for name in cls.RATELIMIT_FIELDS)
+            and all(hasattr(discord.http.Route, name) for name in ('key', 'major_parameters'))
+        )
+
+    def bucket_key(self, route) -> str:
+        """The key HTTPClient files this route's Ratelimit under."""
+        bucket_hash = self.http._bucket_hashes.get(route.key)
+        return f"{bucket_hash or route.key}:{route.major_parameters}"
+
+    async def request(self, route, **kwargs):
+        if not self.enabled:
+            return await self.policy.call(route, lambda: self._send_now(route, kwargs), _request_priority.get(),
+                                          HTTP_RETRIED_STATUSES)
+        # Retries queue again behind the bucket instead of holding a slot while they back off
+        return await self.policy.call(route, lambda: self._request_once(route, kwargs), _request_priority.get(),
+                                      HTTP_RETRIED_STATUSES)
+
+    async def _request_once(self, route, kwargs: dict):
+        key = self.bucket_key(route)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues.setdefault(key, []), (_request_priority.get(), next(self._seq), route, kwargs, future))
+        queued_at = time.perf_counter()
+        self._pump(key)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Released just as the caller gave up; hand the slot on
+                self._finished(key)
+            raise
+        if self.stats:
+            waited = time.perf_counter() - queued_at
+            self.stats.record('rest_queue', waited)
+            self.stats.ratelimit_wait['queue'] += waited
+        try:
+            return await self._send_now(route, kwargs)
+        finally:
+            self._finished(key)
+
+    async def _send_now(self, route, kwargs: dict):
+        token = _send_started.set(time.perf_counter())
+        try:
+            return await self._send(route, **kwargs)
+        finally:
+            _send_started.reset(token)
+
+    def _finished(self, key: str):
+        self._inflight[key] -= 1
+        if not self._inflight[key]:
+            del self._inflight[key]
+        self._pump(key)
+
+    def _capacity(self, key: str, priority: int) -> bool:
+        ratelimit = self.http._buckets.get(key)
+        inflight = self._inflight.get(key, 0)
+        if ratelimit is None:
+            # Bucket not seen yet: probe with one call to learn its limits
+            return inflight == 0
+        available = ratelimit.limit if ratelimit.is_expired() else ratelimit.remaining
+        # Calls we released that have not reached the Ratelimit yet
+        available -= max(0, inflight - ratelimit.outgoing)
+        reserve = min(self.reserve, ratelimit.limit - 1) if priority >= LOW_PRIORITY else 0
+        return available > reserve
+
+    def _pump(self, key: str):
+        """Release queued calls for one bucket while it has room for them."""
+        queue = self._queues.get(key)
+        while queue:
+            priority, _, _, _, future = queue[0]
+            if future.done():
+                heapq.heappop(queue)
+                continue
+            if not self._capacity(key, priority):
+                break
+            heapq.heappop(queue)
+            self._inflight[key] += 1
+            future.set_result(None)
+        if not queue:
+            self._queues.pop(key, None)
+            return
+        if not self._inflight.get(key) and key not in self._timers:
+            # Nothing in flight will wake us; try again when the bucket resets
+            ratelimit = self.http._buckets.get(key)
+            loop = asyncio.get_running_loop()
+            delay = max(0.05, ratelimit.expires - loop.time()) if ratelimit and ratelimit.expires else 0.05
+            self._timers[key] = loop.call_later(delay, self._retry, key)
+
+    def _retry(self, key: str):
+        self._timers.pop(key, None)
+        self._pump(key)
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+# Edit pipeline used by SNGView to keep GUI message edits to a minimum
+class MessageEditPipeline:
+    """Coalesce and diff edits to a game's GUI message."""
+    def __init__(self, view, window: float = GUI_EDIT_WINDOW):
+        self.view = view
+        self.window = window
+        self.last_payload = None
+        self.last_version = None
+        self.edits_sent = 0
+        self.edits_skipped = 0
+        self.edits_coalesced = 0
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def seed(self):
+        """Record the payload that was sent with the original message."""
+        _, embed_dict, components = self.view.render()
+        self.last_payload = (embed_dict, components)
+        self.last_version = self.view.state_version
+
+    def request(self):
+        """Schedule an edit, merging it with any edit already waiting."""
+        if self._pending and not self._pending.done():
+            self.edits_coalesced += 1
+            return self._pending
+        self._pending = asyncio.create_task(self._flush_later())
+        return self._pending
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self) -> bool:
+        """Edit the message now if the visible payload changed."""
+        pending = self._pending
+        if pending and pending is not asyncio.current_task() and not pending.done():
+            pending.cancel()
+            self.edits_coalesced += 1
+        self._pending = None
+
+        async with self._lock:
+            if self.view.message is None:
+                logger.warning(f"No GUI message to edit for SNG {self.view.sng_id}")
+                return False
+            version = self.view.state_version
+            if version == self.last_version:
+                self.edits_skipped += 1
+                return False
+            embed, embed_dict, components = self.view.render()
+            payload = (embed_dict, components)
+            if payload == self.last_payload:
+                # Changed and changed back, e.g. a double toggle of Notify Me
+                self.last_version = version
+                self.edits_skipped += 1
+                return False
+            try:
+                with client.stats.span('gui_edit'), request_priority('gui_edit'):
+                    await self.view.message.edit(embed=embed, view=self.view.component_view())
+            except CircuitOpenError as e:
+                logger.warning(f"Skipped GUI edit for SNG {self.view.sng_id}: {e}")
+                return False
+            except Exception as e:
+                logger.error(f"Failed to edit GUI message for SNG {self.view.sng_id}: {e}", exc_info=True)
+                return False
+            self.last_payload = payload
+            self.last_version = version
+            self.edits_sent += 1
+            return True
+
+    def close(self):
+        """Drop any pending edit and log the pipeline counters."""
+        if self._pending and not self._pending.done():
+            self._pending.cancel()
+        self._pending = None
+        log_event(
+            logging.INFO, "gui_edits", sng=self.view.sng_id, sent=self.edits_sent,
+            skipped=self.edits_skipped, coalesced=self.edits_coalesced
+        )
+
+# Notification fan-out used when a game starts
+class NotificationDispatcher:
+    """Send DMs concurrently with a cap on requests in flight."""
+    def __init__(self, client, concurrency: int = NOTIFY_CONCURRENCY):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self._tasks = set()
+
+    def dispatch(self, user_ids, content: str) -> asyncio.Task:
+        """Start sending in the background and return the task with per-user results."""
+        task = asyncio.create_task(self._send_all(list(user_ids), content))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _send_all(self, user_ids: List[int], content: str) -> dict:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(user_id):
+            async with semaphore:
+                with client.stats.span('dm'):
+                    return user_id, await self._send(user_id, content)
+
+        with client.stats.span('notifications'):
+            results = dict(await asyncio.gather(*(send_one(user_id) for user_id in user_ids)))
+        summary = {}
+        for result in results.values():
+            summary[result] = summary.get(result, 0) + 1
+        log_event(logging.INFO, "notifications", users=len(results), **summary)
+        return results
+
+    async def _send(self, user_id: int, content: str) -> str:
+        try:
+            # Prefer the cached user to save a REST round-trip
+            with request_priority('dm'):
+                user = self.client.get_user(user_id)
+                if user is None:
+                    # Opening the DM channel needs only the ID, which saves a user lookup
+                    user = await self.client.create_dm(discord.Object(id=user_id))
+                await user.send(content)
+            trace("notification_sent", user=user_id)
+            return 'sent'
+        except CircuitOpenError:
+            return 'shed'
+        except discord.Forbidden as e:
+            logger.warning(f"User {user_id} does not accept DMs: {e}")
+            return 'forbidden'
+        except discord.NotFound:
+            logger.warning(f"User {user_id} not found while sending notification")
+            return 'not_found'
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to send DM to user {user_id}. Error: {e}")
+            return 'failed'
+        except Exception as e:
+            logger.error(f"Error while trying to notify user {user_id}: {e}", exc_info=True)
+            return 'error'
+
+# Clocks and the deadline scheduler that drives game timeouts
+class MonotonicClock:
+    """Real-time clock used by the deadline scheduler."""
+    def now(self) -> float:
+        return time.monotonic()
+
+    async def wait(self, timeout: Optional[float], wakeup: asyncio.Event):
+        """Wait until `timeout` clock seconds pass or `wakeup` is set."""
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+class ScaledClock(MonotonicClock):
+    """Clock that runs `speed` times faster than real time, for testing timeouts."""
+    def __init__(self, speed: float):
+        self.speed = speed
+        self._origin = time.monotonic()
+
+    def now(self) -> float:
+        return self._origin + (time.monotonic() - self._origin) * self.speed
+
+    async def wait(self, timeout: Optional[float], wakeup: asyncio.Event):
+        await super().wait(None if timeout is None else timeout / self.speed, wakeup)
+
+class VirtualClock(MonotonicClock):
+    """Real time plus an offset that a replay advances to skip idle stretches."""
+    def __init__(self):
+        self.offset = 0.0
+        self._waiters = set()  # wakeup events of schedulers waiting on this clock
+
+    def now(self) -> float:
+        return time.monotonic() + self.offset
+
+    def advance(self, seconds: float):
+        """Jump ahead, waking every waiter so deadlines that are now due fire."""
+        self.offset += seconds
+        for wakeup in self._waiters:
+            wakeup.set()
+
+    async def wait(self, timeout: Optional[float], wakeup: asyncio.Event):
+        # A timer instead of asyncio.wait_for, which runs the wait in a task of its own
+        timer = None if timeout is None else asyncio.get_running_loop().call_later(timeout, wakeup.set)
+        self._waiters.add(wakeup)
+        try:
+            await wakeup.wait()
+        finally:
+            self._waiters.discard(wakeup)
+            if timer:
+                timer.cancel()
+
+class DeadlineScheduler:
+    """Single heap of deadlines served by one task instead of a sleeping task per game."""
+    def __init__(self, clock: Optional[MonotonicClock] = None):
+        self.clock = clock or MonotonicClock()
+        self._heap = []  # (deadline, seq, key); stale entries are skipped lazily
+        self._entries = {}  # key -> (deadline, seq, callback)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, key, delay: float, callback):
+        """Run coroutine function `callback` after `delay` seconds, replacing any deadline for `key`."""
+        deadline = self.clock.now() + delay
+        seq = next(self._seq)
+        self._entries[key] = (deadline, seq, callback)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        self._ensure_running()
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key) -> bool:
+        """Cancel the deadline for `key`, returning whether one was pending."""
+        return self._entries.pop(key, None) is not None
+
+    def next_deadline(self) -> Optional[float]:
+        """Clock time of the earliest pending deadline, or None if nothing is scheduled."""
+        return min((deadline for deadline, _, _ in self._entries.values()), default=None)
+
+    def remaining(self, key) -> Optional[float]:
+        """Seconds left before `key` fires, or None if nothing is scheduled."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return max(0.0, entry[0] - self.clock.now())
+
+    def close(self):
+        if self._runner and not self._runner.done():
+            self._runner.cancel()
+        self._runner = None
+        self._entries.clear()
+        self._heap.clear()
+
+    def _ensure_running(self):
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = self.clock.now()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if entry is None or entry[1] != seq:
+                    continue  # Cancelled or rescheduled
+                del self._entries[key]
+                self._fire(key, entry[2])
+
+            # Rescheduling leaves stale heap entries behind; compact when they pile up
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [(d, seq, key) for key, (d, seq, _) in self._entries.items()]
+                heapq.heapify(self._heap)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            await self.clock.wait(timeout, self._wakeup)
+
+    def _fire(self, key, callback):
+        task = asyncio.create_task(callback())
+        self._tasks.add(task)
+
+        def done(t):
+            self._tasks.discard(t)
+            if not t.cancelled() and t.exception():
+                logger.error(f"Deadline callback for {key} failed: {t.exception()}", exc_info=t.exception())
+        task.add_done_callback(done)
+
+# Game state stores used to restore games after a restart
+class GameStore:
+    """In-memory game store that forgets everything on restart; base for durable backends."""
+    async def open(self):
+        pass
+
+    def save(self, sng_id: str, record: dict):
+        pass
+
+    def delete(self, sng_id: str):
+        pass
+
+    async def load_all(self) -> List[dict]:
+        return []
+
+    def save_subscriptions(self, user_id: int, rules: list):
+        pass
+
+    async def load_subscriptions(self) -> dict:
+        return {}
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+class SQLiteGameStore(GameStore):
+    """SQLite-backed game store that batches writes off the event loop."""
+    def __init__(self, path: str, flush_interval: float = GAME_STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = {}  # sng_id -> latest record, or None for a delete
+        self._pending_subscriptions = {}  # user_id -> latest rules, or None for none
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._db: Optional[sqlite3.Connection] = None  # Opened in setup_hook, not at import
+
+    async def open(self):
+        """Connect and create the tables, off the event loop."""
+        if self._db is None:
+            self._db = await asyncio.to_thread(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "sng_id TEXT PRIMARY KEY, record TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            "user_id INTEGER PRIMARY KEY, rules TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def save(self, sng_id: str, record: dict):
+        self._pending[sng_id] = record
+        self._schedule_flush()
+
+    def delete(self, sng_id: str):
+        self._pending[sng_id] = None
+        self._schedule_flush()
+
+    async def load_all(self) -> List[dict]:
+        async with self._lock:
+            rows = await asyncio.to_thread(lambda: self._db.execute("SELECT record FROM games").fetchall())
+        return [json.loads(row[0]) for row in rows]
+
+    def save_subscriptions(self, user_id: int, rules: list):
+        self._pending_subscriptions[user_id] = rules or None
+        self._schedule_flush()
+
+    async def load_subscriptions(self) -> dict:
+        async with self._lock:
+            rows = await asyncio.to_thread(lambda: self._db.execute("SELECT user_id, rules FROM subscriptions").fetchall())
+        return {user_id: json.loads(rules) for user_id, rules in rows}
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Write all pending changes in a single transaction."""
+        if self._db is None or (not self._pending and not self._pending_subscriptions):
+            return  # Changes made before open() stay pending until the first flush after it
+        batch, self._pending = self._pending, {}
+        subscriptions, self._pending_subscriptions = self._pending_subscriptions, {}
+        now = time.time()
+        upserts = [(sng_id, json.dumps(record), now) for sng_id, record in batch.items() if record is not None]
+        deletes = [(sng_id,) for sng_id, record in batch.items() if record is None]
+        rule_upserts = [(user_id, json.dumps(rules), now) for user_id, rules in subscriptions.items() if rules]
+        rule_deletes = [(user_id,) for user_id, rules in subscriptions.items() if not rules]
+
+        def write():
+            with self._db:
+                if upserts:
+                    self._db.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?)", upserts)
+                if deletes:
+                    self._db.executemany("DELETE FROM games WHERE sng_id = ?", deletes)
+                if rule_upserts:
+                    self._db.executemany("INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?)", rule_upserts)
+                if rule_deletes:
+                    self._db.executemany("DELETE FROM subscriptions WHERE user_id = ?", rule_deletes)
+
+        async with self._lock:
+            try:
+                await asyncio.to_thread(write)
+                logger.info(
+                    f"Game store flushed {len(upserts)} update(s), {len(deletes)} delete(s) "
+                    f"and {len(subscriptions)} subscription change(s)"
+                )
+            except Exception as e:
+                logger.error(f"Failed to flush game store: {e}", exc_info=True)
+                # Keep the batch unless newer changes have replaced it
+                for sng_id, record in batch.items():
+                    self._pending.setdefault(sng_id, record)
+                for user_id, rules in subscriptions.items():
+                    self._pending_subscriptions.setdefault(user_id, rules)
+
+    async def close(self):
+        if self._flush_task and not self._flush_task.done():
+            if self._lock.locked():
+                # Cancelling would not stop a write already running in its thread
+                await self._flush_task
+            else:
+                self._flush_task.cancel()
+        await self.flush()
+        if self._db is not None:
+            async with self._lock:  # Wait out any read still running in its thread
+                self._db.close()
+                self._db = None
+
+def create_game_store() -> GameStore:
+    """Build the game store selected by GAME_STORE."""
+    if GAME_STORE == 'sqlite':
+        logger.info(f"Using SQLite game store at {GAME_STORE_PATH}")
+        return SQLiteGameStore(GAME_STORE_PATH)
+    if GAME_STORE != 'memory':
+        logger.warning(f"Unknown GAME_STORE '{GAME_STORE}', falling back to memory")
+    return GameStore()
+
+# Moderation queue used by on_message to purge designated channels in bulk
+BULK_DELETE_MAX_AGE = timedelta(days=14, minutes=-5)  # Discord rejects bulk deletes of older messages
+BULK_DELETE_LIMIT = 100
+DELETE_RETRY_ATTEMPTS = 5  # Tries at deleting a game's leftover messages before giving up on them
+
+class ModerationQueue:
+    """Collect unauthorized messages in one channel and hand them to the cleaner in batches."""
+    def __init__(self, channel, cleaner: 'MessageCleaner', window: float = MODERATION_WINDOW,
+                 max_depth: int = MODERATION_MAX_DEPTH):
+        self.channel = channel
+        self.cleaner = cleaner
+        self.window = window
+        self.max_depth = max_depth
+        self.dropped = 0
+        self._messages = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, message: discord.Message) -> bool:
+        """Queue a message for deletion, returning False if the queue is full."""
+        if len(self._messages) >= self.max_depth:
+            self.dropped += 1
+            logger.warning(
+                f"Moderation queue full for channel {self.channel.id}, dropped delete "
+                f"of message {message.id} ({self.dropped} dropped so far)"
+            )
+            return False
+        self._messages.append(message)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return True
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self):
+        """Delete everything queued through the shared cleaner, in bulk where Discord allows it."""
+        batch, self._messages = self._messages, []
+        if not batch:
+            return
+        if not await self.cleaner.delete(self.channel.id, batch):
+            logger.warning(f"Some of {len(batch)} queued delete(s) in channel {self.channel.id} failed")
+
+# Cleanup engine shared by game teardown and channel moderation
+class MessageCleaner:
+    """Delete messages concurrently, in bulk when Discord allows it."""
+    def __init__(self, client):
+        self.client = client
+
+    async def delete(self, channel_id: int, messages, sng_id: Optional[str] = None,
+                     retry: bool = False, attempt: int = 1) -> bool:
+        """Delete `messages` from one channel; messages that are already gone count as deleted.
+
+        With `retry`, messages that could not be deleted are tried again later
+        instead of being left in the channel.
+        """
+        unique = {msg.id: msg for msg in messages if msg is not None}
+        if not unique:
+            return True
+        with request_priority('delete'):
+            try:
+                failed = await self._delete_all(channel_id, unique, sng_id)
+            except CircuitOpenError as e:
+                # Shed before the bulk delete; the singles handle this themselves
+                logger.warning(f"Skipped deleting {len(unique)} message(s) in channel {channel_id}: {e}")
+                log_event(logging.WARNING, "delete_failed", sng=sng_id, count=len(unique), code='shed')
+                failed = list(unique.values())
+        if failed and retry:
+            self.retry_later(channel_id, failed, sng_id, attempt)
+        return not failed
+
+    def retry_later(self, channel_id: int, messages: list, sng_id: Optional[str], attempt: int):
+        """Schedule another try at `messages`, backing off from the circuit cooldown."""
+        if attempt >= DELETE_RETRY_ATTEMPTS:
+            logger.error(f"Giving up on deleting {len(messages)} message(s) in channel {channel_id}")
+            log_event(logging.WARNING, "delete_abandoned", sng=sng_id, count=len(messages), attempts=attempt)
+            return
+        delay = CIRCUIT_COOLDOWN * 2 ** (attempt - 1)
+        log_event(logging.INFO, "delete_retry", sng=sng_id, count=len(messages), attempt=attempt, delay=delay)
+        self.client.scheduler.schedule(
+            ('cleanup', channel_id, sng_id), delay,
+            lambda: self.delete(channel_id, messages, sng_id, retry=True, attempt=attempt + 1)
+        )
+
+    async def _delete_all(self, channel_id: int, unique: dict, sng_id: Optional[str]) -> list:
+        """Delete the messages in `unique`, returning the ones that are still there."""
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        fresh = [message_id for message_id in unique if discord.utils.snowflake_time(message_id) > cutoff]
+        singles = [message_id for message_id in unique if message_id not in fresh]
+        for i in range(0, len(fresh), BULK_DELETE_LIMIT):
+            chunk = fresh[i:i + BULK_DELETE_LIMIT]
+            if len(chunk) == 1:
+                singles.extend(chunk)
+                continue
+            try:
+                # The bulk endpoint goes through the channel, so expired webhook tokens don't matter
+                await self.client.http.delete_messages(channel_id, chunk)
+                logger.info(f"Bulk deleted {len(chunk)} message(s) in channel {channel_id}")
+            except discord.HTTPException as e:
+                logger.warning(f"Bulk delete failed in channel {channel_id}, deleting one by one: {e}")
+                singles.extend(chunk)
+
+        results = await asyncio.gather(*(
+            self._delete_one(channel_id, unique[message_id], sng_id) for message_id in singles
+        ))
+        return [unique[message_id] for message_id, deleted in zip(singles, results) if not deleted]
+
+    async def _delete_one(self, channel_id: int, message, sng_id: Optional[str] = None) -> bool:
+        try:
+            await message.delete()
+            return True
+        except discord.NotFound:
+            return True
+        except CircuitOpenError:
+            log_event(logging.WARNING, "delete_failed", sng=sng_id, message=message.id, code='shed')
+            return False
+        except discord.Forbidden as e:
+            logger.warning(f"Missing permissions to delete message {message.id}: {e}")
+            log_event(logging.WARNING, "delete_failed", sng=sng_id, message=message.id, code=e.code)
+            return False
+        except discord.HTTPException as e:
+            if e.code != 50027:  # Invalid Webhook Token
+                logger.error(f"Error deleting message {message.id}: {e}")
+                log_event(logging.WARNING, "delete_failed", sng=sng_id, message=message.id, code=e.code)
+                return False
+        except Exception as e:
+            logger.error(f"Error deleting message {message.id}: {e}", exc_info=True)
+            log_event(logging.WARNING, "delete_failed", sng=sng_id, message=message.id, code=None)
+            return False
+
+        # Followup messages outlive their webhook token; delete them through the channel instead
+        log_event(logging.INFO, "delete_fallback", sng=sng_id, message=message.id, code=50027)
+        try:
+            await self.client.get_partial_messageable(channel_id).get_partial_message(message.id).delete()
+            return True
+        except discord.NotFound:
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete message {message.id} through channel: {e}")
+            log_event(logging.WARNING, "delete_failed", sng=sng_id, message=message.id, code=None)
+            return False
+
+# Activity signals that make a designated channel show recent activity
+class ActivitySignal:
+    """Disabled activity signal; base for the coalescing strategies."""
+    def signal(self, channel):
+        pass
+
+class CoalescedActivitySignal(ActivitySignal, abc.ABC):
+    """Send at most one signal per channel per `window`, however many games and clicks ask for one."""
+    def __init__(self, client, window: float = ACTIVITY_WINDOW):
+        self.client = client
+        self.window = window
+        self.sent = 0
+        self.coalesced = 0
+        self._last_sent = {}  # channel_id -> scheduler clock time of the last signal
+
+    def signal(self, channel):
+        """Signal now if the channel's window has passed, otherwise once at the end of it."""
+        key = ('activity', channel.id)
+        if self.client.scheduler.remaining(key) is not None:
+            self.coalesced += 1
+            return
+        last = self._last_sent.get(channel.id)
+        delay = 0.0 if last is None else max(0.0, last + self.window - self.client.scheduler.clock.now())
+        self.client.scheduler.schedule(key, delay, lambda: self._fire(channel))
+
+    async def _fire(self, channel):
+        self._last_sent[channel.id] = self.client.scheduler.clock.now()
+        self.sent += 1
+        with self.client.stats.span('activity_signal'), request_priority('activity'):
+            await self.send(channel)
+
+    @abc.abstractmethod
+    async def send(self, channel):
+        """Make the channel show activity once."""
+
+class MessageActivitySignal(CoalescedActivitySignal):
+    """Send a status message and delete it straight away, which marks the channel unread."""
+    def __init__(self, client, window: float = ACTIVITY_WINDOW):
+        super().__init__(client, window)
+        self._leftovers = {}  # channel_id -> messages whose delete failed, retried next time
+
+    async def send(self, channel):
+        try:
+            temp_message = await channel.send("Updating SNG status...")
+        except CircuitOpenError:
+            return
+        except Exception as e:
+            logger.error(f"Failed to send activity indicator message: {e}", exc_info=True)
+            return
+        messages = self._leftovers.pop(channel.id, []) + [temp_message]
+        if await self.client.cleaner.delete(channel.id, messages):
+            logger.info("Sent and deleted temporary status message to show activity")
+        else:
+            self._leftovers[channel.id] = messages
+            logger.warning(f"Failed to delete activity indicator message in channel {channel.id}, will retry")
+
+class TypingActivitySignal(CoalescedActivitySignal):
+    """Show the bot as typing: one REST call and no message to clean up."""
+    async def send(self, channel):
+        try:
+            await channel.typing()
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to send typing indicator: {e}", exc_info=True)
+
+def create_activity_signal(client) -> ActivitySignal:
+    """Build the activity signal selected by ACTIVITY_SIGNAL."""
+    if ACTIVITY_SIGNAL == 'none':
+        return ActivitySignal()
+    if ACTIVITY_SIGNAL == 'typing':
+        return TypingActivitySignal(client)
+    if ACTIVITY_SIGNAL != 'message':
+        logger.warning(f"Unknown ACTIVITY_SIGNAL '{ACTIVITY_SIGNAL}', falling back to message")
+    return MessageActivitySignal(client)
+
+# Game model and registry
+class Game:
+    """State of a single SNG game."""
+    __slots__ = ('sng_id', 'display_id', 'starter', 'channel_id', 'players', 'started', 'view')
+
+    def __init__(self, sng_id: str, starter: str, channel_id: int, players: int = 1, started: bool = False):
+        self.sng_id = sng_id
+        self.display_id = sng_id[:8]
+        self.starter = starter
+        self.channel_id = channel_id
+        self.players = players
+        self.started = started
+        self.view: Optional['SNGView'] = None
+
+    @property
+    def state(self) -> str:
+        return 'started' if self.started else 'open'
+
+    def __repr__(self):
+        return f"<Game {self.display_id} players={self.players} state={self.state} channel={self.channel_id}>"
+
+def discard_from_index(index: dict, key, value):
+    """Remove `value` from the set `index[key]`, dropping the key once its set is empty."""
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del index[key]
+
+class GameRegistry:
+    """Active games keyed by ID, with indexes by channel, display ID, starter and state."""
+    def __init__(self):
+        self._games = {}
+        self._by_channel = {}
+        self._by_display_id = {}
+        self._by_starter = {}
+        self._by_state = {'open': set(), 'started': set()}
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, sng_id):
+        return sng_id in self._games
+
+    def __iter__(self):
+        return iter(self._games.values())
+
+    def get(self, sng_id: str) -> Optional[Game]:
+        return self._games.get(sng_id)
+
+    def add(self, game: Game):
+        if game.sng_id in self._games:
+            self.remove(game.sng_id)
+        self._games[game.sng_id] = game
+        self._by_channel.setdefault(game.channel_id, set()).add(game.sng_id)
+        self._by_display_id[game.display_id] = game.sng_id
+        self._by_starter.setdefault(game.starter, set()).add(game.sng_id)
+        self._by_state[game.state].add(game.sng_id)
+
+    def remove(self, sng_id: str) -> Optional[Game]:
+        game = self._games.pop(sng_id, None)
+        if game is None:
+            return None
+        discard_from_index(self._by_channel, game.channel_id, sng_id)
+        discard_from_index(self._by_starter, game.starter, sng_id)
+        self._by_display_id.pop(game.display_id, None)
+        self._by_state[game.state].discard(sng_id)
+        return game
+
+    def mark_started(self, game: Game):
+        """Flip a game to started, keeping the state index in sync."""
+        self._by_state[game.state].discard(game.sng_id)
+        game.started = True
+        self._by_state[game.state].add(game.sng_id)
+
+    def by_display_id(self, display_id: str) -> Optional[Game]:
+        sng_id = self._by_display_id.get(display_id)
+        return self._games.get(sng_id) if sng_id else None
+
+    def in_channel(self, channel_id: int) -> List[Game]:
+        return [self._games[sng_id] for sng_id in self._by_channel.get(channel_id, ())]
+
+    def count_in_channel(self, channel_id: int) -> int:
+        return len(self._by_channel.get(channel_id, ()))
+
+    def by_starter(self, starter: str) -> List[Game]:
+        return [self._games[sng_id] for sng_id in self._by_starter.get(starter, ())]
+
+    def with_state(self, state: str) -> List[Game]:
+        return [self._games[sng_id] for sng_id in self._by_state.get(state, ())]
+
+    def count_by_state(self) -> dict:
+        return {state: len(ids) for state, ids in self._by_state.items()}
+
+    def clear(self):
+        self.__init__()
+
+# Standing notification rules that outlive individual games
+class SubscriptionIndex:
+    """Users' notification rules, indexed by channel, player-count threshold and starter.
+
+    Lookups only touch the sets for the values an event carries, so matching
+    costs time in proportion to the subscribers that match.
+    """
+    KINDS = ('channel', 'players', 'starter')
+
+    def __init__(self, store: GameStore):
+        self.store = store
+        self._rules = {}  # user_id -> {(kind, value)}
+        self._index = {kind: {} for kind in self.KINDS}  # kind -> value -> {user_id}
+
+    def __len__(self):
+        return sum(len(rules) for rules in self._rules.values())
+
+    def load(self, records: dict):
+        """Restore rules loaded from the game store."""
+        for user_id, rules in records.items():
+            for kind, value in rules:
+                self._add(int(user_id), kind, value)
+
+    def subscribe(self, user_id: int, kind: str, value) -> bool:
+        """Add a rule; False if the user already had it."""
+        if (kind, value) in self._rules.get(user_id, ()):
+            return False
+        self._add(user_id, kind, value)
+        self._save(user_id)
+        return True
+
+    def unsubscribe(self, user_id: int, kind: Optional[str] = None, value=None) -> int:
+        """Remove the given rule, or every rule of the user when no kind is given; returns how many went."""
+        rules = self._rules.get(user_id, set())
+        removed = [rule for rule in rules if kind is None or rule == (kind, value)]
+        for rule_kind, rule_value in removed:
+            rules.discard((rule_kind, rule_value))
+            discard_from_index(self._index[rule_kind], rule_value, user_id)
+        if not rules:
+            self._rules.pop(user_id, None)
+        if removed:
+            self._save(user_id)
+        return len(removed)
+
+    def rules_for(self, user_id: int) -> list:
+        return sorted(self._rules.get(user_id, ()), key=lambda rule: (self.KINDS.index(rule[0]), str(rule[1])))
+
+    def matching(self, kind: str, values) -> set:
+        """Users with a `kind` rule for any of `values`."""
+        index = self._index[kind]
+        users = set()
+        for value in values:
+            users |= index.get(value, set())
+        return users
+
+    def for_new_game(self, game: 'Game') -> set:
+        """Users to tell about a game that was just created."""
+        return self.matching('channel', (game.channel_id,)) | self.matching('starter', (game.starter,))
+
+    def for_players(self, previous: int, players: int) -> set:
+        """Users whose player-count threshold lies in (previous, players]."""
+        return self.matching('players', range(previous + 1, players + 1))
+
+    def _add(self, user_id: int, kind: str, value):
+        self._rules.setdefault(user_id, set()).add((kind, value))
+        self._index[kind].setdefault(value, set()).add(user_id)
+
+    def _save(self, user_id: int):
+        self.store.save_subscriptions(user_id, [list(rule) for rule in self.rules_for(user_id)])
+
+# Per-game inbox that serializes state transitions
+class GameInbox:
+    """Single consumer for one game's transitions, so their awaits never interleave.
+
+    Player clicks that queue up while another transition runs are applied
+    together as one transition with one render. Transitions must not post to
+    their own game's inbox, since they would wait on themselves.
+    """
+    def __init__(self, view):
+        self.view = view
+        self.transitions = 0
+        self.merged = 0
+        self._items = []  # (kind, interaction, arg, future)
+        self._consumer: Optional[asyncio.Task] = None
+
+    def post(self, kind: str, interaction: Optional[discord.Interaction] = None, arg=None) -> asyncio.Future:
+        """Queue a 'player', 'start' or 'end' transition; the future resolves with its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._items.append((kind, interaction, arg, future))
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        while self._items:
+            kind = self._items[0][0]
+            if kind == 'player':
+                # Take the whole run of queued player clicks
+                count = next((i for i, item in enumerate(self._items) if item[0] != 'player'), len(self._items))
+                batch, self._items = self._items[:count], self._items[count:]
+                self.merged += len(batch) - 1
+                work = self.view.apply_player_clicks([(interaction, slot) for _, interaction, slot, _ in batch])
+            else:
+                batch, self._items = self._items[:1], self._items[1:]
+                _, interaction, arg, _ = batch[0]
+                work = self.view.apply_start(interaction) if kind == 'start' else self.view.apply_end(interaction, arg)
+            self.transitions += 1
+            try:
+                result = await work
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_result(result)
+
 # Then define the SNGView class
-class SNGView(discord.ui.View):
+class SNGView:
+    """Controller for one game's GUI message, timers and inbox.
+
+    It holds no discord.ui items: the buttons are built from the game record
+    each time the message is sent or edited, then dropped.
+    """
+    __slots__ = (
+        'sng_id', 'starter', 'channel_id', 'message', 'ping_message_id', 'start_message', 'notify_users',
+        'players_announced', 'last_activity', 'game_messages', 'state_version', '_rendered', 'editor', 'inbox'
+    )
+
     def __init__(self, sng_id, starter, channel_id):
-        # Set timeout to None for persistence
-        super().__init__(timeout=None)
         self.sng_id = sng_id
         self.starter = starter
         self.channel_id = channel_id
@@ -166,452 +1842,719 @@ class SNGView(discord.ui.View):
         self.ping_message_id: Optional[int] = None
         self.start_message: Optional[discord.Message] = None
         self.notify_users = set()
+        self.players_announced = 1  # Highest player count already sent to threshold subscribers
         self.last_activity = discord.utils.utcnow()
-        self.end_task: Optional[asyncio.Task] = None
         self.game_messages = []
-        
-        # Start inactivity timer
-        self.inactivity_task = asyncio.create_task(self.start_inactivity_timer())
-
-        # Add Player Buttons with custom_ids
-        for i in range(1, MAX_PLAYERS + 1):
-            button = PlayerButton(sng_id, i)
-            button.custom_id = f"player_{sng_id}_{i}"
-            if i == 1:
-                button.style = ButtonStyle.green
-            self.add_item(button)
-
-        # Add Control Buttons with custom_ids
-        start_button = StartSNGButton(sng_id)
-        start_button.custom_id = f"start_sng_{sng_id}"
-        self.add_item(start_button)
-        
-        end_button = EndSNGButton(sng_id)
-        end_button.custom_id = f"end_sng_{sng_id}"
-        self.add_item(end_button)
-        
-        notify_button = NotifyMeButton(sng_id)
-        notify_button.custom_id = f"notify_me_{sng_id}"
-        self.add_item(notify_button)
-
-    def create_embed(self):
+        self.state_version = 0  # Bumped by changed() on every visible state change
+        self._rendered = None  # (state_version, embed, embed dict, components)
+        self.editor = MessageEditPipeline(self)
+        self.inbox = GameInbox(self)
+
+    @classmethod
+    def from_record(cls, record: dict, channel: discord.PartialMessageable) -> 'SNGView':
+        """Rebuild a view from a stored record without any API requests."""
+        sng_id = record['sng_id']
+        game = Game(sng_id, record['starter'], record['channel_id'], record['players'], record['started'])
+        sng_games.add(game)
+        view = cls(sng_id, record['starter'], record['channel_id'])
+        game.view = view
+        view.notify_users = set(record['notify_users'])
+        view.players_announced = game.players
+        if record['gui_message_id']:
+            view.message = channel.get_partial_message(record['gui_message_id'])
+        view.game_messages = [channel.get_partial_message(message_id) for message_id in record['game_message_ids']]
+        view.changed()
+
+        # Re-arm deadlines from their wall-clock expiry
+        now = time.time()
+        callbacks = {'inactivity': view.inactivity_timeout, 'auto_end': view.auto_end_sng}
+        for kind, expires_at in record['deadlines'].items():
+            client.scheduler.schedule((sng_id, kind), max(0.0, expires_at - now), callbacks[kind])
+        return view
+
+    def to_record(self) -> dict:
+        """Snapshot the game for the game store."""
+        game = sng_games.get(self.sng_id)
+        now = time.time()
+        deadlines = {}
+        for kind in ('inactivity', 'auto_end'):
+            remaining = client.scheduler.remaining((self.sng_id, kind))
+            if remaining is not None:
+                deadlines[kind] = now + remaining
+        return {
+            'sng_id': self.sng_id,
+            'display_id': game.display_id,
+            'starter': self.starter,
+            'channel_id': self.channel_id,
+            'players': game.players,
+            'started': game.started,
+            'gui_message_id': self.message.id if self.message else None,
+            'game_message_ids': sorted({msg.id for msg in self.game_messages}),
+            'notify_users': sorted(self.notify_users),
+            'deadlines': deadlines,
+        }
+
+    def persist(self):
+        """Queue the current game state for the game store."""
         if self.sng_id in sng_games:
-            game = sng_games[self.sng_id]
-            embed = discord.Embed(title=f"5M Sit-and-Go Status (ID: {game['display_id']})", color=discord.Color.blue())
-            embed.add_field(name="Players", value=f"{game['players']}/{MAX_PLAYERS}", inline=True)
-            embed.add_field(name="Status", value="In Progress" if game['started'] else "Not Started", inline=True)
+            client.store.save(self.sng_id, self.to_record())
+
+    def component_view(self) -> discord.ui.View:
+        """A throwaway view with the buttons styled from the game record, for one send or edit."""
+        game = sng_games.get(self.sng_id)
+        players = game.players if game else 0
+        locked = game is None or game.started  # Only End SNG stays usable once the game is under way
+        view = discord.ui.View(timeout=None)
+        for slot in range(1, MAX_PLAYERS + 1):
+            button = PlayerButton(self.sng_id, slot)
+            button.item.style = ButtonStyle.green if slot <= players else ButtonStyle.grey
+            button.item.disabled = locked
+            view.add_item(button)
+        for button in (StartSNGButton(self.sng_id), EndSNGButton(self.sng_id), NotifyMeButton(self.sng_id)):
+            button.item.disabled = locked and not isinstance(button, EndSNGButton)
+            view.add_item(button)
+        # Stopping it keeps discord.py from registering it in the view store;
+        # clicks are routed through the dynamic items instead
+        view.stop()
+        return view
+
+    def changed(self):
+        """Mark the visible state as changed so the next render rebuilds the payload."""
+        self.state_version += 1
+
+    def render(self):
+        """Return (embed, embed dict, components) for the current state, built once per state version."""
+        if self._rendered is None or self._rendered[0] != self.state_version:
+            embed = self._build_embed()
+            self._rendered = (self.state_version, embed, embed.to_dict(), self.component_view().to_components())
+        return self._rendered[1:]
+
+    def create_embed(self) -> discord.Embed:
+        """The GUI embed for the current state; shared by /start and the edit pipeline."""
+        return self.render()[0]
+
+    def _build_embed(self) -> discord.Embed:
+        game = sng_games.get(self.sng_id)
+        if game:
+            embed = discord.Embed(title=f"5M Sit-and-Go Status (ID: {game.display_id})", color=discord.Color.blue())
+            embed.add_field(name="Players", value=f"{game.players}/{MAX_PLAYERS}", inline=True)
+            embed.add_field(name="Status", value="In Progress" if game.started else "Not Started", inline=True)
             embed.add_field(name="Notifications", value=f"{len(self.notify_users)} user(s)", inline=True)
             embed.set_footer(text=f"Started by {self.starter}")
-            logger.info(f"Created embed for game {game['display_id']}. Notify users: {self.notify_users}")
+            trace("embed_created", sng=self.sng_id, players=game.players, notify=len(self.notify_users))
         else:
             embed = discord.Embed(title="5M Sit-and-Go Ended", color=discord.Color.red())
             embed.add_field(name="Status", value="This SNG has ended or timed out", inline=False)
-            logger.info(f"Created 'ended' embed for game {self.sng_id}")
+            trace("embed_created", sng=self.sng_id, ended=True)
         return embed
 
     async def update_players(self, interaction: discord.Interaction, slot: int):
-        """Update the number of players in the game."""
-        logger.info(f"Updating players for SNG {self.sng_id}")
-        self.last_activity = discord.utils.utcnow()
+        """Acknowledge a player click and queue it on the game's inbox."""
+        trace("update_players", sng=self.sng_id, slot=slot)
+        self.touch()
         
         try:
-            await interaction.response.defer()
-            
-            if self.sng_id not in sng_games:
-                await interaction.followup.send(
-                    "This game has already ended. Please start a new game.", 
-                    ephemeral=True
-                )
-                return
-
-            game = sng_games[self.sng_id]
-            if game['started']:
+            with client.stats.span('defer'):
+                await interaction.response.defer()
+            await self.inbox.post('player', interaction, slot)
+        except Exception as e:
+            logger.error(f"Error in update_players: {e}", exc_info=True)
+            try:
                 await interaction.followup.send(
-                    "Cannot modify players after SNG has started.",
+                    "An error occurred while updating the game. Please try ending this game and starting a new one.", 
                     ephemeral=True
                 )
-                return
-
-            game['players'] = slot
-
-            # Update button styles
-            for child in self.children:
-                if isinstance(child, PlayerButton):
-                    child.style = ButtonStyle.green if child.slot <= slot else ButtonStyle.grey
-
-            # Update GUI message
-            await self.message.edit(embed=self.create_embed(), view=self)
-            await self.ping_channel(interaction)
-
-            # Handle max players case
-            if game['players'] == MAX_PLAYERS:
-                game['started'] = True
-                for child in self.children:
-                    if not isinstance(child, EndSNGButton):
-                        child.disabled = True
-
-                await self.message.edit(view=self, embed=self.create_embed())
+            except:
+                pass
 
-                self.start_message = await interaction.followup.send(
-                    f"SNG {game['display_id']} has automatically started with {MAX_PLAYERS} players!"
-                )
+    async def apply_player_clicks(self, clicks):
+        """Apply queued (interaction, slot) clicks in order as one transition with one render."""
+        game = sng_games.get(self.sng_id)
+        replies = []
+        filled_by = None
+        changed = False
+        for interaction, slot in clicks:
+            if game is None:
+                replies.append((interaction, "This game has already ended. Please start a new game."))
+            elif game.started:
+                replies.append((interaction, "Cannot modify players after SNG has started."))
+            else:
+                game.players = slot
+                changed = True
+                if slot == MAX_PLAYERS:
+                    sng_games.mark_started(game)
+                    filled_by = interaction
+        # One record per transition rather than per click; analyze_logs.py counts clicks from it
+        log_event(logging.INFO, "player_clicks", sng=self.sng_id, clicks=len(clicks), players=game.players if game else None)
+
+        if changed:
+            self.changed()
+            if not filled_by:
+                self.announce_players(game)
+            channel = clicks[-1][0].channel
+            if filled_by:
+                log_event(logging.INFO, "game_started", sng=self.sng_id, players=game.players, reason="full")
+
+                # The table is full, so show the final state right away
+                await self.editor.flush()
+                client.activity_signal.signal(channel)
+
+                with client.stats.span('followup'):
+                    self.start_message = await filled_by.followup.send(
+                        f"SNG {game.display_id} has automatically started with {MAX_PLAYERS} players!"
+                    )
                 self.game_messages.append(self.start_message)
 
-                logger.info(f"TEST_MODE is set to: {TEST_MODE}")
-                await self.send_notifications(client, game['display_id'])
+                # Threshold subscribers and the lobby's notify list share one batch, so nobody gets two DMs
+                self.notify_subscribers(
+                    self.threshold_subscribers(game) | self.notify_users,
+                    f"SNG {game.display_id} in <#{self.channel_id}> is full and has started with {MAX_PLAYERS} players!",
+                    "full"
+                )
 
-                if self.inactivity_task and not self.inactivity_task.done():
-                    self.inactivity_task.cancel()
+                if client.scheduler.cancel((self.sng_id, 'inactivity')):
                     logger.info(f"Inactivity timer cancelled for SNG {self.sng_id}")
 
-                if self.end_task and not self.end_task.done():
-                    self.end_task.cancel()
-                self.end_task = asyncio.create_task(self.auto_end_sng())
-                logger.info(f"Auto-end task started for SNG {self.sng_id}")
+                client.scheduler.schedule((self.sng_id, 'auto_end'), AUTO_END_DELAY, self.auto_end_sng)
+                logger.info(f"Auto-end timer started for SNG {self.sng_id}")
+                self.persist()
+            else:
+                self.persist()
 
-        except Exception as e:
-            logger.error(f"Error in update_players: {e}", exc_info=True)
-            try:
-                await interaction.followup.send(
-                    "An error occurred while updating the game. Please try ending this game and starting a new one.", 
-                    ephemeral=True
-                )
-            except:
-                pass
+                # Update GUI message, merging bursts of clicks into one edit
+                self.editor.request()
+                client.activity_signal.signal(channel)
+
+        if replies:
+            await asyncio.gather(
+                *(interaction.followup.send(text, ephemeral=True) for interaction, text in replies),
+                return_exceptions=True
+            )
 
     async def start_sng(self, interaction: discord.Interaction):
-        logger.info(f"Starting SNG {self.sng_id}")
+        logger.info("Starting SNG %s", self.sng_id)
         self.last_activity = discord.utils.utcnow()
         if interaction.channel_id != self.channel_id:
             return
         try:
-            await interaction.response.defer()
-            game = sng_games[self.sng_id]
-            if game['players'] >= 2 and not game['started']:
-                game['started'] = True
-                
-                # Disable all buttons except End SNG
-                for child in self.children:
-                    if not isinstance(child, EndSNGButton):
-                        child.disabled = True
-
-                if self.message:
-                    await self.message.edit(view=self, embed=self.create_embed())
-                else:
-                    logger.warning(f"self.message is None for SNG {self.sng_id}")
-
-                # Send start message and track it
+            with client.stats.span('defer'):
+                await interaction.response.defer()
+            await self.inbox.post('start', interaction)
+        except Exception as e:
+            await interaction.followup.send(f"An error occurred: {str(e)}", ephemeral=True)
+            logger.error(f"Error in start_sng: {e}", exc_info=True)
+
+    async def apply_start(self, interaction: discord.Interaction):
+        """Start the game manually if it has enough players and has not started yet."""
+        game = sng_games.get(self.sng_id)
+        if game and game.players >= 2 and not game.started:
+            sng_games.mark_started(game)
+            log_event(logging.INFO, "game_started", sng=self.sng_id, players=game.players, reason="manual")
+            
+            # The next render disables all buttons except End SNG
+            self.changed()
+
+            await self.editor.flush()
+
+            # Send start message and track it
+            with client.stats.span('followup'):
                 self.start_message = await interaction.followup.send(
-                    f"SNG {game['display_id']} has been manually started with {game['players']} players!"
+                    f"SNG {game.display_id} has been manually started with {game.players} players!"
                 )
-                self.game_messages.append(self.start_message)
+            self.game_messages.append(self.start_message)
 
-                logger.info(f"TEST_MODE is set to: {TEST_MODE}")
+            # Notify users who requested notifications
+            self.send_notifications(client, game.display_id)
 
-                # Notify users who requested notifications
-                await self.send_notifications(client, game['display_id'])
+            # Start auto-end timer
+            client.scheduler.schedule((self.sng_id, 'auto_end'), AUTO_END_DELAY, self.auto_end_sng)
 
-                # Start auto-end task
-                if self.end_task and not self.end_task.done():
-                    self.end_task.cancel()
-                self.end_task = asyncio.create_task(self.auto_end_sng())
+            # Cancel the inactivity timer as the game has started
+            if client.scheduler.cancel((self.sng_id, 'inactivity')):
+                logger.info(f"Inactivity timer cancelled for SNG {self.sng_id}")
+            self.persist()
+        else:
+            await interaction.followup.send("Cannot start SNG. Make sure there are at least 2 players.", ephemeral=True)
 
-                # Cancel the inactivity timer as the game has started
-                if self.inactivity_task and not self.inactivity_task.done():
-                    self.inactivity_task.cancel()
-                    logger.info(f"Inactivity timer cancelled for SNG {self.sng_id}")
-            else:
-                await interaction.followup.send("Cannot start SNG. Make sure there are at least 2 players.", ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f"An error occurred: {str(e)}", ephemeral=True)
-            logger.error(f"Error in start_sng: {e}", exc_info=True)
+    async def end_sng(self, interaction: Optional[discord.Interaction] = None, reason: str = "manual") -> bool:
+        """End the game; shared by the End button, the auto-end timer and the inactivity timer."""
+        if interaction:
+            try:
+                if not interaction.response.is_done():
+                    await interaction.response.defer(ephemeral=True)
+            except discord.NotFound:
+                logger.info(f"Interaction expired while ending game {self.sng_id}")
+                interaction = None
+        return await self.inbox.post('end', interaction, reason)
+
+    async def apply_end(self, interaction: Optional[discord.Interaction], reason: str) -> bool:
+        """Tear the game down and delete its messages."""
+        logger.info("Ending SNG %s (reason: %s)", self.sng_id, reason)
 
-    async def _end_game(self, auto_ended: bool = False, interaction: Optional[discord.Interaction] = None) -> bool:
-        """Core game ending logic used by all end-game scenarios."""
-        logger.info(f"Ending SNG {self.sng_id} (auto_ended: {auto_ended})")
-        
-        # First, check if the game exists
         game_info = sng_games.get(self.sng_id)
         if not game_info:
             logger.warning(f"Attempted to end SNG {self.sng_id}, but it was not found in active games.")
             if interaction:
                 try:
-                    if not interaction.response.is_done():
-                        await interaction.response.send_message("This game has already ended.", ephemeral=True)
+                    await interaction.followup.send("This game has already ended.", ephemeral=True)
                 except discord.NotFound:
                     logger.info(f"Interaction expired while ending game {self.sng_id}")
                 except Exception as e:
                     logger.error(f"Error responding to end game interaction: {e}")
             return False
 
-        # Delete messages and clean up
-        try:
-            deletion_successful = await self._cleanup_messages()
-            if deletion_successful:
-                await self._cleanup_game_state(game_info, interaction)
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Error during game cleanup: {e}", exc_info=True)
-            return False
-
-    async def _cleanup_messages(self) -> bool:
-        """Handle message deletion with proper logging."""
-        deletion_successful = True
-        
-        for msg in self.game_messages:
-            if not await self.delete_with_retry(msg, "game message"):
-                deletion_successful = False
-                
-        if not await self.delete_with_retry(self.message, "GUI message"):
-            deletion_successful = False
-            
-        return deletion_successful
-
-    async def _cleanup_game_state(self, game_info: dict, interaction: Optional[discord.Interaction]):
-        """Clean up game state and handle interaction response."""
-        del sng_games[self.sng_id]
-        logger.info(f"SNG {self.sng_id} removed from active games")
-        
-        # Cancel tasks - should include refresh_task
-        for task in [self.end_task, self.inactivity_task]:  # Changed
-            if task and not task.done():
-                task.cancel()
-                
-        # Handle interaction response
-        if interaction:
-            try:
-                if not interaction.response.is_done():
-                    await interaction.response.defer(ephemeral=True)
-                await interaction.followup.send(
-                    f"SNG {game_info['display_id']} has been ended.",
-                    ephemeral=True
-                )
-            except discord.NotFound:
-                logger.info(f"Interaction expired during cleanup for {self.sng_id}")
-            except Exception as e:
-                logger.error(f"Error sending cleanup confirmation: {e}")
-
-    async def end_sng(self, interaction: Optional[discord.Interaction] = None, auto_ended: bool = False):
-        """End game via manual button press or other direct call."""
-        logger.info(f"Ending SNG {self.sng_id}")
-        
-        # Remove the view from storage
-        client.remove_view(self.sng_id)
-        
-        # Cancel inactivity task
-        if self.inactivity_task and not self.inactivity_task.done():
-            self.inactivity_task.cancel()
-            logger.info(f"Inactivity task cancelled for SNG {self.sng_id}")
-        
-        # Cancel end task if it exists
-        if self.end_task and not self.end_task.done():
-            self.end_task.cancel()
-                
-        # Delete messages with better error handling
-        messages_to_delete = set(self.game_messages)  # Use set to avoid duplicates
+        # Tear down state first so a concurrent end request sees the game as gone
+        sng_games.remove(self.sng_id)
+        self.changed()
+        client.stats.games_ended[reason] += 1
+        client.store.delete(self.sng_id)
+        self.cancel_timers()
+        self.editor.close()
+        logger.info("SNG %s removed from active games", self.sng_id)
+
+        # Delete every tracked message in one pass
+        messages = list(self.game_messages)
         if self.message:
-            messages_to_delete.add(self.message)
-            
-        for msg in messages_to_delete:
-            try:
-                await msg.delete()
-            except discord.NotFound:
-                logger.info(f"Message already deleted for SNG {self.sng_id}")
-            except discord.HTTPException as e:
-                if e.code == 50027:  # Invalid Webhook Token
-                    try:
-                        channel = client.get_channel(self.channel_id)
-                        if channel:
-                            try:
-                                message = await channel.fetch_message(msg.id)
-                                await message.delete()
-                            except discord.NotFound:
-                                pass
-                            except Exception as e:
-                                logger.error(f"Failed to delete through channel: {e}")
-                    except Exception as e:
-                        logger.error(f"Failed to get channel: {e}")
-                else:
-                    logger.error(f"Error deleting message: {e}")
-                
-        # Clear message lists
+            messages.append(self.message)
         self.game_messages.clear()
         self.message = None
-        
-        # Remove from active games
-        if self.sng_id in sng_games:
-            del sng_games[self.sng_id]
-            logger.info(f"SNG {self.sng_id} removed from active games")
-            
-        # Send confirmation if interaction exists
+        with client.stats.span('cleanup'):
+            deletion_successful = await client.cleaner.delete(self.channel_id, messages, self.sng_id, retry=True)
+        if not deletion_successful:
+            logger.warning(f"Some messages for SNG {self.sng_id} could not be deleted, will retry")
+        log_event(
+            logging.INFO, "game_ended", sng=self.sng_id, reason=reason, players=game_info.players,
+            clean=deletion_successful, clicks_merged=self.inbox.merged
+        )
+
         if interaction:
             try:
-                if not interaction.response.is_done():
-                    await interaction.response.defer(ephemeral=True)
                 await interaction.followup.send(
-                    f"SNG has been ended.",
+                    f"SNG {game_info.display_id} has been ended.",
                     ephemeral=True
                 )
             except discord.NotFound:
                 logger.info(f"Interaction expired during cleanup for {self.sng_id}")
+            except Exception as e:
+                logger.error(f"Error sending cleanup confirmation: {e}")
+        return deletion_successful
 
     async def auto_end_sng(self):
-        """Auto-end the SNG after timer expires."""
-        logger.info(f"Auto-end task started for SNG {self.sng_id}")
+        """Auto-end the SNG once its auto-end deadline passes."""
+        logger.info(f"Auto-end timer expired for SNG {self.sng_id}")
         try:
-            await asyncio.sleep(180)  # Wait for 3 minutes
-            logger.info(f"Auto-end task waking up to end SNG {self.sng_id}")
             if self.sng_id in sng_games:
-                await self._end_game(auto_ended=True)
-        except asyncio.CancelledError:
-            logger.info(f"Auto-end task cancelled for SNG {self.sng_id}")
+                await self.end_sng(reason="auto_end")
         except Exception as e:
             logger.error(f"Error in auto_end_sng: {e}", exc_info=True)
 
-    async def ping_channel(self, interaction: discord.Interaction):
-        """Send and delete a message to show channel activity."""
+    async def inactivity_timeout(self):
+        """End the SNG if it never started before the inactivity deadline."""
+        logger.info(f"Inactivity timer expired for SNG {self.sng_id}")
         try:
-            temp_message = await interaction.channel.send("Updating SNG status...")
-            self.game_messages.append(temp_message)
-            await temp_message.delete()
-            logger.info("Sent and deleted temporary status message to show activity")
+            game = sng_games.get(self.sng_id)
+            if game and not game.started:
+                await self.end_sng(reason="inactivity")
         except Exception as e:
-            logger.error(f"Failed to send activity indicator message: {e}", exc_info=True)
+            logger.error(f"Error in inactivity_timeout: {e}", exc_info=True)
 
-    async def start_inactivity_timer(self):
-        logger.info(f"Inactivity timer started for SNG {self.sng_id}")
-        try:
-            await asyncio.sleep(3600)  # Wait for 1 hour
-            logger.info(f"Inactivity timer expired for SNG {self.sng_id}")
-            if self.sng_id in sng_games and not sng_games[self.sng_id]['started']:
-                await self.end_sng(auto_ended=True)
-        except asyncio.CancelledError:
-            logger.info(f"Inactivity timer cancelled for SNG {self.sng_id}")
-        except Exception as e:
-            logger.error(f"Error in start_inactivity_timer: {e}", exc_info=True)
+    def touch(self):
+        """Record activity and push back the inactivity deadline."""
+        self.last_activity = discord.utils.utcnow()
+        if client.scheduler.remaining((self.sng_id, 'inactivity')) is not None:
+            client.scheduler.schedule((self.sng_id, 'inactivity'), INACTIVITY_TIMEOUT, self.inactivity_timeout)
+
+    def cancel_timers(self):
+        """Cancel the inactivity and auto-end deadlines for this game."""
+        for kind in ('inactivity', 'auto_end'):
+            if client.scheduler.cancel((self.sng_id, kind)):
+                logger.info(f"{kind.capitalize()} timer cancelled for SNG {self.sng_id}")
 
     async def toggle_notification(self, interaction: discord.Interaction):
-        logger.info(f"Toggling notification for user {interaction.user.id} on SNG {self.sng_id}")
-        self.last_activity = discord.utils.utcnow()
+        self.touch()
         try:
             user_id = interaction.user.id
-            if user_id in self.notify_users:
+            subscribed = user_id not in self.notify_users
+            trace("toggle_notification", sng=self.sng_id, user=user_id, subscribed=subscribed)
+            if not subscribed:
                 self.notify_users.remove(user_id)
+                self.changed()
                 await interaction.response.send_message("You will no longer be notified when this game is created.", ephemeral=True)
-                logger.info(f"User {user_id} removed from notification list for SNG {self.sng_id}")
             else:
                 self.notify_users.add(user_id)
+                self.changed()
                 await interaction.response.send_message("You will be notified when this game is created.", ephemeral=True)
-                logger.info(f"User {user_id} added to notification list for SNG {self.sng_id}")
+
+            self.persist()
 
             # Update the embed to reflect the new notification count
-            await self.message.edit(embed=self.create_embed(), view=self)
+            self.editor.request()
         except Exception as e:
             await interaction.response.send_message("An error occurred while toggling notifications.", ephemeral=True)
             logger.error(f"Error in toggle_notification: {e}", exc_info=True)
 
-    async def send_notifications(self, client, game_id):
-        for user_id in self.notify_users:
-            try:
-                user = await client.fetch_user(user_id)
-                await user.send(f"The SNG game {game_id} has been created!")
-                logger.info(f"Notification sent to user {user.id} for game {game_id}")
-            except discord.HTTPException as e:
-                logger.warning(f"Failed to send DM to user {user_id}. Error: {e}")
-            except Exception as e:
-                logger.error(f"Error while trying to notify user {user_id}: {e}", exc_info=True)
+    def send_notifications(self, client, game_id) -> asyncio.Task:
+        """Fan out start notifications without blocking the caller."""
+        return client.notifier.dispatch(self.notify_users, f"The SNG game {game_id} has been created!")
+
+    def notify_subscribers(self, user_ids, content: str, trigger: str) -> Optional[asyncio.Task]:
+        """Send one event's subscription DMs as a single batch."""
+        if not user_ids:
+            return None
+        log_event(logging.INFO, "subscribers_notified", sng=self.sng_id, trigger=trigger, users=len(user_ids))
+        return client.notifier.dispatch(user_ids, content)
+
+    def threshold_subscribers(self, game: Game) -> set:
+        """Subscribers to every player count this game reached for the first time, marking them announced."""
+        if game.players <= self.players_announced:
+            return set()
+        user_ids = client.subscriptions.for_players(self.players_announced, game.players)
+        self.players_announced = game.players
+        return user_ids
+
+    def announce_players(self, game: Game):
+        """Tell threshold subscribers about every player count this game reached for the first time."""
+        user_ids = self.threshold_subscribers(game)
+        self.notify_subscribers(
+            user_ids, f"SNG {game.display_id} in <#{self.channel_id}> has {game.players}/{MAX_PLAYERS} players!", "players"
+        )
 
-    async def safe_delete_message(self, message: Optional[discord.Message], context: str = "message") -> bool:
-        """Safely delete a message with error handling."""
-        if message is None:
+
+# Server-side lobby queue
+class Matchmaker:
+    """Waiting pools per channel that are turned into started games in batches.
+
+    A game is launched as soon as a pool holds `size` players, or `timeout`
+    seconds after it reached two. Joining only answers the interaction, so a
+    whole game costs one channel message however many players queued.
+    """
+    MIN_PLAYERS = 2
+
+    def __init__(self, client, size: int = QUEUE_GAME_SIZE, timeout: float = QUEUE_TIMEOUT):
+        self.client = client
+        self.size = size
+        self.timeout = timeout
+        self.pools = {}  # channel_id -> {user_id: None}, in join order
+        self._channels = {}  # channel_id -> channel to post games in
+        self._queued_in = {}  # user_id -> channel_id
+        self._launches = set()
+
+    @property
+    def game_size(self) -> int:
+        return max(self.MIN_PLAYERS, min(self.size, MAX_PLAYERS))
+
+    def channel_of(self, user_id: int) -> Optional[int]:
+        return self._queued_in.get(user_id)
+
+    def join(self, channel, user_id: int) -> int:
+        """Add a player to the channel's pool; returns how many are waiting, or 0 once their game is launched."""
+        pool = self.pools.setdefault(channel.id, {})
+        self._channels[channel.id] = channel
+        pool[user_id] = None
+        self._queued_in[user_id] = channel.id
+        trace("queue_join", user=user_id, channel=channel.id, waiting=len(pool))
+        if len(pool) >= self.game_size:
+            self._launch(channel.id, self.game_size)
+        elif len(pool) >= self.MIN_PLAYERS and self.client.scheduler.remaining(('queue', channel.id)) is None:
+            self.client.scheduler.schedule(('queue', channel.id), self.timeout, lambda: self._expire(channel.id))
+        return len(self.pools.get(channel.id, ())) if user_id in self._queued_in else 0
+
+    def leave(self, user_id: int) -> bool:
+        """Take a player out of whichever pool they are in."""
+        channel_id = self._queued_in.pop(user_id, None)
+        if channel_id is None:
             return False
-        
-        try:
-            await message.delete()
-            logger.info(f"Successfully deleted {context} for SNG {self.sng_id}")
-            return True
-        except discord.NotFound:
-            logger.info(f"{context.capitalize()} already deleted for SNG {self.sng_id}")
-            return True
-        except discord.Forbidden:
-            logger.warning(f"Missing permissions to delete {context} for SNG {self.sng_id}")
+        pool = self.pools.get(channel_id, {})
+        pool.pop(user_id, None)
+        if len(pool) < self.MIN_PLAYERS:
+            self.client.scheduler.cancel(('queue', channel_id))
+        if not pool:
+            self.pools.pop(channel_id, None)
+            self._channels.pop(channel_id, None)
+        trace("queue_leave", user=user_id, channel=channel_id, waiting=len(pool))
+        return True
+
+    async def _expire(self, channel_id: int):
+        """Start a smaller game with everyone waiting once the queue timeout passes."""
+        if len(self.pools.get(channel_id, ())) >= self.MIN_PLAYERS:
+            self._launch(channel_id, self.game_size)
+
+    def _launch(self, channel_id: int, count: int) -> bool:
+        """Take up to `count` players off the pool and start their game in the background."""
+        if MAX_GAMES_PER_CHANNEL and sng_games.count_in_channel(channel_id) >= MAX_GAMES_PER_CHANNEL:
+            # Keep everyone waiting and try again after another timeout
+            self.client.scheduler.schedule(('queue', channel_id), self.timeout, lambda: self._expire(channel_id))
             return False
+        pool = self.pools[channel_id]
+        players = list(pool)[:count]
+        for user_id in players:
+            del pool[user_id]
+            self._queued_in.pop(user_id, None)
+        channel = self._channels[channel_id]
+        if not pool:
+            del self.pools[channel_id]
+            del self._channels[channel_id]
+        if len(pool) >= self.MIN_PLAYERS:
+            self.client.scheduler.schedule(('queue', channel_id), self.timeout, lambda: self._expire(channel_id))
+        else:
+            self.client.scheduler.cancel(('queue', channel_id))
+
+        task = asyncio.create_task(self._start_game(channel, players))
+        self._launches.add(task)
+        task.add_done_callback(self._launches.discard)
+        return True
+
+    async def _start_game(self, channel, players: List[int]):
+        """Create a started game for the batch and announce it with a single message."""
+        sng_id = str(uuid.uuid4())
+        game = Game(sng_id, "the queue", channel.id, players=len(players), started=True)
+        sng_games.add(game)
+        if self.client.recorder:
+            self.client.recorder.game_created(sng_id, channel.id)
+        view = SNGView(sng_id, game.starter, channel.id)
+        game.view = view
+        view.players_announced = game.players
+        view.changed()
+
+        mentions = ' '.join(f"<@{user_id}>" for user_id in players)
+        try:
+            with self.client.stats.span('queue_launch'), request_priority('message'):
+                message = await channel.send(
+                    f"SNG {game.display_id} has started with {len(players)} queued players: {mentions}",
+                    embed=view.create_embed(),
+                    view=view.component_view(),
+                    allowed_mentions=discord.AllowedMentions(everyone=False, roles=False, users=True)
+                )
         except Exception as e:
-            logger.error(f"Error deleting {context} for SNG {self.sng_id}: {e}", exc_info=True)
-            return False
+            logger.error(f"Failed to start queued game in channel {channel.id}: {e}", exc_info=True)
+            sng_games.remove(sng_id)
+            # Put the players back at the front of the pool
+            pool = self.pools.setdefault(channel.id, {})
+            self.pools[channel.id] = {**dict.fromkeys(players), **pool}
+            self._channels[channel.id] = channel
+            for user_id in players:
+                self._queued_in[user_id] = channel.id
+            # _launch cancelled the timer if the pool ran low; try this batch again after another timeout
+            if self.client.scheduler.remaining(('queue', channel.id)) is None:
+                self.client.scheduler.schedule(('queue', channel.id), self.timeout, lambda: self._expire(channel.id))
+            return None
+
+        view.message = message
+        view.editor.seed()
+        view.game_messages.append(message)
+        self.client.scheduler.schedule((sng_id, 'auto_end'), AUTO_END_DELAY, view.auto_end_sng)
+        view.persist()
+
+        self.client.stats.games_created += 1
+        log_event(logging.INFO, "game_created", sng=sng_id, display_id=game.display_id, starter=game.starter, channel=channel.id)
+        log_event(logging.INFO, "game_started", sng=sng_id, players=game.players, reason="queue")
+
+        subscribers = self.client.subscriptions.for_new_game(game) | self.client.subscriptions.for_players(1, game.players)
+        subscribers.difference_update(players)
+        view.notify_subscribers(
+            subscribers, f"SNG {game.display_id} has started in <#{channel.id}> with {game.players} queued players!", "queue"
+        )
+        return game
+
+# Traffic recording for replay_traffic.py
+class TrafficRecorder:
+    """Append inbound commands, button clicks and channel messages to a compact JSON Lines file.
+
+    Users, channels and games are numbered in order of first appearance, so a
+    recording holds no Discord IDs, names or message text. Each bot session
+    starts with a `session` line and its own numbering; `t` is seconds since then.
+    """
+    BUTTON_PATTERN = re.compile(rf'(?P<button>player|start_sng|end_sng|notify_me)_{SNG_ID_PATTERN}(?:_(?P<slot>\d+))?')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.monotonic()
+        self._users = {}  # user_id -> number
+        self._channels = {}  # channel_id -> number
+        self._games = {}  # sng_id -> number
+        # Written from the logging queue thread, like the event stream
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._queue = queue.SimpleQueue()
+        self._listener = QueueListener(self._queue, handler)
+        self._logger = logging.getLogger('sng.traffic')
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(QueueHandler(self._queue))
+        self._listener.start()
+        atexit.register(self._listener.stop)
+        self._write('session', wall=round(time.time(), 3))
+        logger.info(f"Recording interaction traffic to {path}")
+
+    def _write(self, event: str, **fields):
+        record = {'t': round(time.monotonic() - self.started, 3), 'e': event, **fields}
+        self._logger.info(json.dumps(record, separators=(',', ':')))
+
+    @staticmethod
+    def _number(mapping: dict, key) -> int:
+        number = mapping.get(key)
+        if number is None:
+            number = mapping[key] = len(mapping)
+        return number
+
+    def game_created(self, sng_id: str, channel_id: int, starter_id: Optional[int] = None):
+        """Number a new game; starter_id is None for games started by the queue."""
+        fields = {'g': self._number(self._games, sng_id), 'c': self._number(self._channels, channel_id)}
+        if starter_id is not None:
+            fields['u'] = self._number(self._users, starter_id)
+        self._write('game', **fields)
+
+    def interaction(self, interaction: discord.Interaction):
+        user = self._number(self._users, interaction.user.id)
+        channel = self._number(self._channels, interaction.channel_id)
+        if interaction.type == discord.InteractionType.application_command:
+            has_role = int(isinstance(interaction.user, discord.Member) and interaction.user.get_role(ROLE_ID) is not None)
+            self._write('command', u=user, c=channel, name=interaction.data.get('name'), r=has_role)
+        elif interaction.type == discord.InteractionType.component:
+            match = self.BUTTON_PATTERN.fullmatch(interaction.data.get('custom_id', ''))
+            if match is None:
+                return
+            fields = {'u': user, 'g': self._number(self._games, match['sng_id']), 'b': match['button']}
+            if match['slot']:
+                fields['slot'] = int(match['slot'])
+            self._write('click', **fields)
+
+    def message(self, message: discord.Message):
+        fields = {'u': self._number(self._users, message.author.id), 'c': self._number(self._channels, message.channel.id)}
+        if message.author.id == ADMIN_USER_ID:
+            fields['a'] = 'admin'
+        elif message.author.id == PIN_BOT_ID:
+            fields['a'] = 'pin'
+        if message.content.startswith('/'):
+            fields['slash'] = 1
+        self._write('message', **fields)
 
-    async def delete_with_retry(self, message, context: str, max_retries: int = 3):
-        """Delete a message with retry mechanism."""
-        for attempt in range(max_retries):
-            try:
-                if message:
-                    await message.delete()
-                    logger.info(f"Successfully deleted {context} for SNG {self.sng_id} (attempt {attempt + 1})")
-                    return True
-            except discord.NotFound:
-                logger.info(f"{context} already deleted for SNG {self.sng_id}")
-                return True
-            except discord.Forbidden as e:
-                logger.warning(f"Missing permissions to delete {context} for SNG {self.sng_id}: {e}")
-                return False
-            except discord.HTTPException as e:
-                if e.code == 50027:  # Invalid Webhook Token
-                    logger.warning(f"Invalid webhook token for {context}, attempting channel fetch")
-                    try:
-                        channel = client.get_channel(self.channel_id)
-                        if channel:
-                            message = await channel.fetch_message(message.id)
-                            await message.delete()
-                            return True
-                    except Exception as channel_e:
-                        logger.error(f"Failed to delete through channel: {channel_e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                    continue
-            except Exception as e:
-                logger.error(f"Error deleting {context} for SNG {self.sng_id}: {e}", exc_info=True)
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                    continue
-        return False
+class SNGCommandTree(app_commands.CommandTree):
+    """Command tree that records each command for replay before running it."""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if self.client.recorder:
+            self.client.recorder.interaction(interaction)
+        return True
 
 # Finally define the CustomClient class that uses SNGView
 class CustomClient(discord.Client):
     """Enhanced Discord client with better connection handling"""
-    def __init__(self):
+    def __init__(self, clock: Optional[MonotonicClock] = None):
+        self.stats = BotStats()  # Latency histograms and REST counters for /botstats
+        self.retry_policy = RetryPolicy(stats=self.stats)  # Backoff and circuit breakers for every outbound call
+        trace = self.stats.trace_config()
+
         # Improved connection settings
         super().__init__(
             intents=intents,
             heartbeat_timeout=150.0,
             guild_ready_timeout=10.0,
-            gateway_queue_size=512
+            gateway_queue_size=512,
+            http_trace=trace,
+            # Longer rate limits raise instead of sleeping inside discord.py (it enforces a 30s floor)
+            max_ratelimit_timeout=max(30.0, RETRY_MAX_DELAY),
+            **gateway_options()
         )
-        self.tree = app_commands.CommandTree(self)
+        self.tree = SNGCommandTree(self)
         self.disconnect_count = 0
-        self.active_views = {}  # Store active views
+        self.notifier = NotificationDispatcher(self)
+        self.scheduler = DeadlineScheduler(clock)  # Inactivity and auto-end deadlines for all games
+        self.store = create_game_store()
+        self.subscriptions = SubscriptionIndex(self.store)  # Standing notification rules across games
+        self.matchmaker = Matchmaker(self)  # /queue pools that are started as games in batches
+        self.moderation_queues = {}  # channel_id -> ModerationQueue
+        self.cleaner = MessageCleaner(self)
+        self.activity_signal = create_activity_signal(self)  # Coalesced "channel has activity" signal
+        self.metrics = MetricsExporter(self, METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+        self.recorder = TrafficRecorder(TRAFFIC_RECORD_PATH) if TRAFFIC_RECORD_PATH else None  # Traffic for replay_traffic.py
+        self.requests: Optional[RequestScheduler] = None  # Created in setup_hook
+        self.add_dynamic_items(*GAME_BUTTONS)  # Route button clicks by custom_id to the game registry
 
     async def setup_hook(self):
-        # Restore active views on startup
-        for sng_id, game in sng_games.items():
-            if not game['started']:
-                view = SNGView(sng_id, game['starter'], game.get('channel_id'))
-                self.add_view(view)
-                self.active_views[sng_id] = view
-                logger.info(f"Restored view for game {sng_id}")
-        await self.tree.sync()
-
-    def store_view(self, sng_id: str, view: SNGView):
-        """Store a view for persistence"""
-        self.active_views[sng_id] = view
-        self.add_view(view)
-        logger.info(f"Stored view for game {sng_id}")
-
-    def remove_view(self, sng_id: str):
-        """Remove a stored view"""
-        if sng_id in self.active_views:
-            del self.active_views[sng_id]
-            logger.info(f"Removed view for game {sng_id}")
+        await self.store.open()
+        self.subscriptions.load(await self.store.load_subscriptions())
+        # Restore in-flight games from the game store in one pass
+        for record in await self.store.load_all():
+            sng_id = record['sng_id']
+            try:
+                channel = self.get_partial_messageable(record['channel_id'])
+                SNGView.from_record(record, channel)
+                logger.info(f"Restored game {sng_id}")
+            except Exception as e:
+                logger.error(f"Failed to restore game {sng_id}: {e}", exc_info=True)
+        # Installed here rather than in __init__ so it wraps whichever HTTP client logged in
+        self.requests = RequestScheduler(self.http, RATE_LIMIT_RESERVE, self.stats, self.retry_policy)
+        RetryingWebhookAdapter.install(self.retry_policy)
+        if self.metrics:
+            try:
+                await self.metrics.start()
+            except OSError as e:
+                logger.error(f"Failed to start metrics endpoint on port {METRICS_PORT}: {e}")
+                self.metrics = None
+        await self.sync_commands()
+
+    def command_fingerprint(self, guild: Optional[discord.abc.Snowflake] = None) -> str:
+        """Hash the command tree schema for a sync scope."""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)),
+            key=lambda command: command['name']
+        )
+        schema = json.dumps({'application_id': self.application_id, 'commands': payload}, sort_keys=True)
+        return hashlib.sha256(schema.encode()).hexdigest()
+
+    async def sync_commands(self):
+        """Sync slash commands only for scopes whose schema changed since the last sync."""
+        try:
+            with open(COMMAND_SYNC_STATE_PATH, 'r') as f:
+                synced = json.load(f)
+        except FileNotFoundError:
+            synced = {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable command sync state: {e}")
+            synced = {}
+
+        if SYNC_GUILDS:
+            # Guild syncs propagate immediately, unlike global ones
+            scopes = {f"guild:{guild_id}": discord.Object(id=guild_id) for guild_id in SYNC_GUILDS}
+            for guild in scopes.values():
+                self.tree.copy_global_to(guild=guild)
+        else:
+            scopes = {'global': None}
+
+        changed = False
+        for scope, guild in scopes.items():
+            fingerprint = self.command_fingerprint(guild)
+            if synced.get(scope) == fingerprint:
+                logger.info(f"Command tree unchanged for {scope}, skipping sync")
+                continue
+            try:
+                commands = await self.tree.sync(guild=guild)
+                synced[scope] = fingerprint
+                changed = True
+                logger.info(f"Synced {len(commands)} command(s) for {scope}")
+            except Exception as e:
+                logger.error(f"Failed to sync commands for {scope}: {e}", exc_info=True)
+
+        if changed:
+            try:
+                with open(COMMAND_SYNC_STATE_PATH, 'w') as f:
+                    json.dump(synced, f, indent=2)
+            except Exception as e:
+                logger.warning(f"Failed to save command sync state: {e}")
+
+    async def close(self):
+        # Make sure pending game state reaches disk before shutting down
+        await self.store.close()
+        if self.metrics:
+            await self.metrics.close()
+        await super().close()
+
+    def moderation_queue(self, channel) -> ModerationQueue:
+        """Get or create the moderation queue for a channel"""
+        queue = self.moderation_queues.get(channel.id)
+        if queue is None:
+            queue = self.moderation_queues[channel.id] = ModerationQueue(channel, self.cleaner)
+        return queue
 
 # Then create the client instance
 client = CustomClient()
@@ -619,7 +2562,19 @@ tree = client.tree
 
 # Constants
 MAX_PLAYERS = 8
-sng_games = {}
+INACTIVITY_TIMEOUT = 3600  # End unstarted games after 1 hour without activity
+AUTO_END_DELAY = 180  # End started games after 3 minutes
+sng_games = GameRegistry()
+
+# Role check that reads the role IDs sent with the interaction, so it works without a member cache
+def has_game_role():
+    async def predicate(interaction: discord.Interaction):
+        if not isinstance(interaction.user, discord.Member):
+            raise app_commands.NoPrivateMessage()
+        if interaction.user.get_role(ROLE_ID) is not None:
+            return True
+        raise app_commands.MissingAnyRole([ROLE_ID])
+    return app_commands.check(predicate)
 
 # Check to ensure commands are used in designated channels
 def in_designated_channel():
@@ -629,58 +2584,55 @@ def in_designated_channel():
 
 # Slash Command to Start SNG
 @tree.command(name="start", description="Start a new 5M Sit-and-Go game")
-@app_commands.checks.has_any_role(ROLE_ID)  # Using ROLE_ID for role checks
+@has_game_role()
 @in_designated_channel()
 async def start_sng(interaction: discord.Interaction):
-    logger.info(f"Starting new SNG with TEST_MODE = {TEST_MODE}")
-    logger.info(f"TEST_MODE type at command start: {type(TEST_MODE)}")
-    logger.info(f"Raw TEST_MODE env value at command start: {os.getenv('TEST_MODE')}")
+    with client.stats.span('start_command'):
+        await create_sng(interaction)
+
+async def create_sng(interaction: discord.Interaction):
+    """Create a game and post its GUI message for the /start command."""
+    trace("start_command", user=interaction.user.id, channel=interaction.channel_id, test_mode=TEST_MODE)
     
     if not interaction.guild:
         await interaction.response.send_message("This command can only be used within a server.", ephemeral=True)
         return
 
+    if MAX_GAMES_PER_CHANNEL and sng_games.count_in_channel(interaction.channel_id) >= MAX_GAMES_PER_CHANNEL:
+        await interaction.response.send_message(
+            f"This channel already has {MAX_GAMES_PER_CHANNEL} active game(s). Please join or end one first.",
+            ephemeral=True
+        )
+        return
+
     sng_id = str(uuid.uuid4())
     display_id = sng_id[:8]
     starter = interaction.user.name
-    sng_games[sng_id] = {
-        'players': 1,
-        'started': False,
-        'starter': starter,
-        'display_id': display_id
-    }
-
-    embed = discord.Embed(title=f"5M Sit-and-Go Status (ID: {display_id})", color=discord.Color.blue())
-    embed.add_field(name="Players", value=f"1/{MAX_PLAYERS}", inline=True)
-    embed.add_field(name="Status", value="Not Started", inline=True)
-    embed.set_footer(text=f"Started by {starter}")
+    game = Game(sng_id, starter, interaction.channel_id)
+    sng_games.add(game)
+    if client.recorder:
+        client.recorder.game_created(sng_id, interaction.channel_id, interaction.user.id)
 
     view = SNGView(sng_id, starter, interaction.channel_id)
-    sng_games[sng_id]['view'] = view
-    sng_games[sng_id]['channel_id'] = interaction.channel_id  # Store channel ID
-    await interaction.response.defer()
-
-    # Make the test mode check more explicit
-    is_test = bool(TEST_MODE)  # Force boolean conversion
-    logger.info(f"Is test mode (after bool conversion): {is_test}")
+    game.view = view
+    with client.stats.span('defer'):
+        await interaction.response.defer()
 
-    if is_test:
-        logger.info("TEST_MODE is True - skipping role ping")
+    if TEST_MODE:
+        trace("role_ping_skipped", sng=sng_id)
         test_message = await interaction.followup.send("Test mode: Role mention skipped")
         view.game_messages.append(test_message)
     else:
-        logger.info("TEST_MODE is False - sending role ping")
         role = interaction.guild.get_role(ROLE_ID)
         if role:
             allowed_mentions = discord.AllowedMentions(roles=[role])
             try:
                 ping_content = f"{role.mention} A new 5M SNG game has been created!"
-                logger.info(f"Sending ping message: {ping_content}")
-                
-                ping_message = await interaction.channel.send(
-                    ping_content,
-                    allowed_mentions=allowed_mentions
-                )
+                with client.stats.span('role_ping'):
+                    ping_message = await interaction.channel.send(
+                        ping_content,
+                        allowed_mentions=allowed_mentions
+                    )
                 logger.info(f"Ping message sent for role {role.name} (ID: {role.id})")
                 view.game_messages.append(ping_message)
             except Exception as e:
@@ -694,17 +2646,142 @@ async def start_sng(interaction: discord.Interaction):
             )
 
     # Send the GUI embed and track it
-    gui_message = await interaction.followup.send(embed=embed, view=view)
+    with client.stats.span('gui_send'):
+        gui_message = await interaction.followup.send(embed=view.create_embed(), view=view.component_view())
     view.message = gui_message
+    view.editor.seed()
     view.game_messages.append(gui_message)
 
-    # Store the view for persistence
-    client.store_view(sng_id, view)
+    # Start the inactivity timer once players can see the game, so it never fires mid-creation
+    client.scheduler.schedule((sng_id, 'inactivity'), INACTIVITY_TIMEOUT, view.inactivity_timeout)
+    logger.info(f"Inactivity timer started for SNG {sng_id}")
+
+    # Tell users subscribed to this channel or starter
+    subscribers = client.subscriptions.for_new_game(game)
+    subscribers.discard(interaction.user.id)
+    view.notify_subscribers(
+        subscribers, f"A new SNG game {display_id} was started by {starter} in <#{interaction.channel_id}>!", "created"
+    )
+
+    # Store the game for persistence
+    view.persist()
 
     # Log relevant information
-    logger.info(f"TEST_MODE is set to: {TEST_MODE}")
-    logger.info(f"SNG started with ID: {sng_id}, Display ID: {display_id}")
-    logger.info(f"Starter: {starter}, Channel ID: {interaction.channel_id}")
+    client.stats.games_created += 1
+    log_event(logging.INFO, "game_created", sng=sng_id, display_id=display_id, starter=starter, channel=interaction.channel_id)
+
+# Queue command: join a pool instead of clicking a lobby slot
+@tree.command(name="queue", description="Join or leave the queue for the next automatically started game")
+@has_game_role()
+@in_designated_channel()
+async def queue_command(interaction: discord.Interaction):
+    matchmaker = client.matchmaker
+    user_id = interaction.user.id
+    if matchmaker.channel_of(user_id) is not None:
+        matchmaker.leave(user_id)
+        await interaction.response.send_message("You left the queue.", ephemeral=True)
+        return
+    waiting = matchmaker.join(interaction.channel, user_id)
+    if waiting:
+        await interaction.response.send_message(
+            f"You joined the queue ({waiting}/{matchmaker.game_size} waiting). A game starts when "
+            f"{matchmaker.game_size} players are queued, or {matchmaker.timeout:.0f}s after the second one joins. "
+            "Use /queue again to leave.",
+            ephemeral=True
+        )
+    else:
+        await interaction.response.send_message("The queue is full, your game is starting!", ephemeral=True)
+
+# Subscription commands for DMs about any game, not just one lobby
+def describe_rule(kind: str, value) -> str:
+    if kind == 'channel':
+        return f"new games in <#{value}>"
+    if kind == 'players':
+        return f"any lobby reaching {value}/{MAX_PLAYERS} players"
+    return f"games started by {value}"
+
+def rules_from_options(channel, players, starter) -> list:
+    rules = []
+    if channel is not None:
+        rules.append(('channel', channel.id))
+    if players is not None:
+        rules.append(('players', players))
+    if starter is not None:
+        rules.append(('starter', starter.name))
+    return rules
+
+def format_rules(user_id: int) -> str:
+    rules = client.subscriptions.rules_for(user_id)
+    if not rules:
+        return "You have no subscriptions."
+    return "Your subscriptions:\n" + "\n".join(f"- {describe_rule(kind, value)}" for kind, value in rules)
+
+@tree.command(name="subscribe", description="Get a DM when games match a rule, across all lobbies")
+@app_commands.describe(
+    channel="DM me when a game is created in this channel",
+    players="DM me when any lobby reaches this many players",
+    starter="DM me when this member starts a game"
+)
+async def subscribe(
+    interaction: discord.Interaction,
+    channel: Optional[discord.TextChannel] = None,
+    players: Optional[app_commands.Range[int, 2, MAX_PLAYERS]] = None,
+    starter: Optional[discord.Member] = None
+):
+    trace("subscribe_command", user=interaction.user.id)
+    rules = rules_from_options(channel, players, starter)
+    if not rules:
+        if interaction.channel_id not in DESIGNATED_CHANNELS:
+            await interaction.response.send_message(
+                "Pick a channel, a player count or a starter to subscribe to.", ephemeral=True
+            )
+            return
+        rules = [('channel', interaction.channel_id)]  # Default to the current game channel
+    if any(kind == 'channel' and value not in DESIGNATED_CHANNELS for kind, value in rules):
+        await interaction.response.send_message("Games are only run in the designated channels.", ephemeral=True)
+        return
+    added = sum(client.subscriptions.subscribe(interaction.user.id, kind, value) for kind, value in rules)
+    logger.info(f"User {interaction.user.id} added {added} subscription(s)")
+    await interaction.response.send_message(format_rules(interaction.user.id), ephemeral=True)
+
+@tree.command(name="unsubscribe", description="Stop DMs for a subscription, or for all of them")
+@app_commands.describe(
+    channel="Stop DMs about new games in this channel",
+    players="Stop DMs about lobbies reaching this many players",
+    starter="Stop DMs about games this member starts"
+)
+async def unsubscribe(
+    interaction: discord.Interaction,
+    channel: Optional[discord.TextChannel] = None,
+    players: Optional[app_commands.Range[int, 2, MAX_PLAYERS]] = None,
+    starter: Optional[discord.Member] = None
+):
+    trace("unsubscribe_command", user=interaction.user.id)
+    rules = rules_from_options(channel, players, starter)
+    if rules:
+        removed = sum(client.subscriptions.unsubscribe(interaction.user.id, kind, value) for kind, value in rules)
+    else:
+        removed = client.subscriptions.unsubscribe(interaction.user.id)
+    logger.info(f"User {interaction.user.id} removed {removed} subscription(s)")
+    await interaction.response.send_message(format_rules(interaction.user.id), ephemeral=True)
+
+@tree.command(name="subscriptions", description="List your game subscriptions")
+async def subscriptions(interaction: discord.Interaction):
+    await interaction.response.send_message(format_rules(interaction.user.id), ephemeral=True)
+
+# Admin command showing latency and REST statistics since startup
+@tree.command(name="botstats", description="Show bot latency and REST statistics (admin only)")
+async def botstats(interaction: discord.Interaction):
+    if interaction.user.id != ADMIN_USER_ID:
+        await interaction.response.send_message("Only the bot admin can use this command.", ephemeral=True)
+        return
+    report = client.stats.report()
+    circuits = client.retry_policy.report()
+    if circuits:
+        report += "\n\nCircuit breakers:\n" + '\n'.join(circuits)
+    if len(report) > 1900:
+        report = report[:1900] + "\n..."
+    await interaction.response.send_message(f"```\n{report}\n```", ephemeral=True)
 
 # **New Test Command to Ping the Role**
 '''
@@ -712,7 +2789,7 @@ Test ping function commented out after confirming role pinging works correctly i
 Uncomment if further testing is needed in the future.
 
 @tree.command(name="test_ping", description="Test pinging the @5m-sngs role")
-@app_commands.checks.has_any_role(ROLE_ID)  # Restricting to roles that can ping
+@has_game_role()  # Restricting to roles that can ping
 @in_designated_channel()
 async def test_ping(interaction: discord.Interaction):
     if not interaction.guild:
@@ -753,37 +2830,30 @@ async def test_ping(interaction: discord.Interaction):
 # Event Handlers
 @client.event
 async def on_ready():
+    # Commands are synced once in setup_hook; on_ready also fires after reconnects
     logger.info(f'{client.user} has connected to Discord!')
-    try:
-        synced = await tree.sync()
-        logger.info(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        logger.error(f"Failed to sync commands: {e}", exc_info=True)
+    log_event(logging.INFO, "gateway_ready", guilds=len(client.guilds))
 
 @client.event
 async def on_disconnect():
     client.disconnect_count += 1
-    logger.warning(
-        f"\nDisconnection #{client.disconnect_count}"
-        f"\nTime: {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
-        f"\nActive Games: {len(sng_games)}"
+    by_state = sng_games.count_by_state()
+    log_event(
+        logging.WARNING, "gateway_disconnect", count=client.disconnect_count,
+        open=by_state.get('open', 0), started=by_state.get('started', 0)
     )
     # Log details of active games
-    for game_id, game in sng_games.items():
+    for game in sng_games:
         logger.warning(
-            f"- Game {game['display_id']}: "
-            f"{game['players']} players, "
-            f"{'Started' if game['started'] else 'Not Started'}, "
-            f"Started by {game['starter']}"
+            f"- Game {game.display_id}: "
+            f"{game.players} players, "
+            f"{'Started' if game.started else 'Not Started'}, "
+            f"Started by {game.starter}"
         )
 
 @client.event
 async def on_resume():
-    logger.info(
-        f"\nConnection Resumed"
-        f"\nTime: {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
-        f"\nChecking {len(sng_games)} active games..."
-    )
+    log_event(logging.INFO, "gateway_resumed", active=len(sng_games))
 
 # Error Handler for Slash Commands
 @tree.error
@@ -800,6 +2870,9 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
 @client.event
 async def on_message(message):
     if message.channel.id in DESIGNATED_CHANNELS:
+        if client.recorder and message.author.id != client.user.id:
+            client.recorder.message(message)
+
         # Allow messages from the admin, pin bot, and this bot itself
         if message.author.id in [ADMIN_USER_ID, PIN_BOT_ID, client.user.id]:
             return
@@ -808,14 +2881,8 @@ async def on_message(message):
         if message.content.startswith('/'):
             return
 
-        # Delete all other messages
-        try:
-            await message.delete()
-            logger.info(f"Deleted message from {message.author} in channel {message.channel.name}")
-        except discord.errors.Forbidden:
-            logger.warning(f"Bot doesn't have permission to delete message from {message.author} in channel {message.channel.name}")
-        except Exception as e:
-            logger.error(f"Error deleting message: {e}", exc_info=True)
+        # Queue all other messages for a batched delete
+        client.moderation_queue(message.channel).enqueue(message)
 
 # Start the Bot
 if __name__ == '__main__':
@@ -0,0 +1,562 @@
+"""In-process stand-in for Discord's HTTP and gateway layers.
+
+Attach a FakeDiscord to the bot's client to run the real SNGView, command
+tree and on_message code without a network connection. REST calls are
+answered from memory with simulated latency and per-route rate limits, and
+gateway events (slash commands, button clicks, channel messages) are fed
+straight into discord.py's connection state.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import itertools
+from collections import Counter, defaultdict
+from typing import Optional
+
+import discord
+from discord.http import HTTPClient, Route
+from discord.webhook import async_ as webhook_async
+
+logger = logging.getLogger(__name__)
+
+# (method, path) -> (requests, per seconds); roughly what Discord enforces per major parameter
+DEFAULT_ROUTE_LIMITS = {
+    ('POST', '/channels/{channel_id}/messages'): (5, 5.0),
+    ('PATCH', '/channels/{channel_id}/messages/{message_id}'): (5, 5.0),
+    ('DELETE', '/channels/{channel_id}/messages/{message_id}'): (5, 1.0),
+    ('POST', '/channels/{channel_id}/messages/bulk-delete'): (1, 1.0),
+    ('POST', '/channels/{channel_id}/typing'): (5, 5.0),
+    ('POST', '/users/@me/channels'): (5, 1.0),
+    ('POST', '/webhooks/{webhook_id}/{webhook_token}'): (5, 2.0),
+    ('PATCH', '/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}'): (5, 2.0),
+    ('DELETE', '/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}'): (5, 2.0),
+}
+GLOBAL_LIMIT = (50, 1.0)
+WEBHOOK_TOKEN_TTL = 900  # Interaction tokens expire after 15 minutes
+
+
+class _FakeResponse:
+    """Just enough of an aiohttp response for discord.HTTPException and Ratelimit.update."""
+    def __init__(self, status: int, reason: str, headers: Optional[dict] = None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+
+def _error(status: int, code: int, message: str) -> discord.HTTPException:
+    response = _FakeResponse(status, message)
+    payload = {'code': code, 'message': message}
+    if status == 404:
+        return discord.NotFound(response, payload)
+    if status == 403:
+        return discord.Forbidden(response, payload)
+    if status >= 500:
+        return discord.DiscordServerError(response, payload)
+    return discord.HTTPException(response, payload)
+
+
+class _Bucket:
+    """Fixed-window rate limit bucket."""
+    __slots__ = ('limit', 'per', 'remaining', 'reset_at')
+
+    def __init__(self, limit: int, per: float):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def acquire(self, now: float) -> float:
+        """Take a slot, returning how long to wait first (0 if allowed now)."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.per
+        if self.remaining > 0:
+            self.remaining -= 1
+            return 0.0
+        return self.reset_at - now
+
+
+class FakeDiscord:
+    """Simulated Discord backend: one guild, one role and any number of text channels."""
+    def __init__(
+        self,
+        *,
+        guild_id: int = 1000,
+        channel_ids=(100,),
+        role_id: int = 3,
+        latency: float = 0.05,
+        jitter: float = 0.2,
+        route_limits: Optional[dict] = None,
+        global_limit=GLOBAL_LIMIT,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.guild_id = guild_id
+        self.channel_ids = list(channel_ids)
+        self.role_id = role_id
+        self.latency = latency
+        self.jitter = jitter
+        self.route_limits = DEFAULT_ROUTE_LIMITS if route_limits is None else route_limits
+        self.global_bucket = _Bucket(*global_limit) if global_limit else None
+        self.error_rate = error_rate  # Share of requests answered with a 503, as during a Discord outage
+        self.random = random.Random(seed)
+        self.clock = time.monotonic  # Token ages and buckets; a replay swaps in its virtual clock
+        self.bot_user = self.user_payload(999, 'sng-bot', bot=True)
+        self.application_id = 999
+
+        self.messages = {}  # message_id -> payload
+        self.webhook_tokens = {}  # interaction token -> (issued at, channel id, message id)
+        self.dm_channels = {}  # dm channel id -> user id
+        self.commands = []
+
+        self.calls = Counter()  # "METHOD path" -> count
+        self.route_time = defaultdict(float)  # "METHOD path" -> seconds spent
+        self.rate_limited = 0  # Simulated 429 responses
+        self.server_errors = 0  # Simulated 503 responses
+        self.ratelimit_wait = 0.0  # Seconds spent waiting on buckets
+        self.interaction_latencies = []  # Seconds from dispatch to first response
+        self._buckets = {}
+        self._dispatched = {}  # interaction_id -> dispatch time
+        self._acked = {}  # interaction_id -> asyncio.Future
+        self._ids = itertools.count(1)
+        self.client: Optional[discord.Client] = None
+
+    # -- identifiers and payloads -------------------------------------------------
+
+    def next_id(self) -> int:
+        """Snowflake with the current timestamp so age checks behave like Discord's."""
+        return discord.utils.time_snowflake(discord.utils.utcnow()) + next(self._ids) % 4096
+
+    def user_payload(self, user_id: int, name: Optional[str] = None, bot: bool = False) -> dict:
+        return {
+            'id': str(user_id),
+            'username': name or f"user{user_id}",
+            'discriminator': '0',
+            'global_name': None,
+            'avatar': None,
+            'bot': bot,
+        }
+
+    def member_payload(self, user_id: int, roles=None) -> dict:
+        return {
+            'user': self.user_payload(user_id),
+            'roles': [str(role) for role in (roles if roles is not None else [self.role_id])],
+            'joined_at': discord.utils.utcnow().isoformat(),
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+            'permissions': str(discord.Permissions.text().value),
+        }
+
+    def guild_payload(self) -> dict:
+        return {
+            'id': str(self.guild_id),
+            'name': 'Fake Guild',
+            'icon': None,
+            'owner_id': '1',
+            'features': [],
+            'roles': [
+                {'id': str(self.guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0,
+                 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False},
+                {'id': str(self.role_id), 'name': '5m-sngs', 'permissions': '0', 'position': 1,
+                 'color': 0, 'hoist': False, 'managed': False, 'mentionable': True},
+            ],
+            'channels': [
+                {'id': str(channel_id), 'type': 0, 'name': f"sng-{channel_id}", 'position': i,
+                 'permission_overwrites': [], 'guild_id': str(self.guild_id)}
+                for i, channel_id in enumerate(self.channel_ids)
+            ],
+            'members': [self.member_payload(int(self.bot_user['id']), roles=[])],
+            'member_count': 1,
+            'emojis': [],
+            'stickers': [],
+        }
+
+    def message_payload(self, channel_id, *, author: dict, content: str = '', embeds=None,
+                        components=None, flags: int = 0, webhook_id=None) -> dict:
+        payload = {
+            'id': str(self.next_id()),
+            'channel_id': str(channel_id),
+            'author': author,
+            'content': content or '',
+            'timestamp': discord.utils.utcnow().isoformat(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': embeds or [],
+            'components': components or [],
+            'pinned': False,
+            'type': 0,
+            'flags': flags,
+        }
+        if int(channel_id) in self.channel_ids:
+            payload['guild_id'] = str(self.guild_id)
+        if webhook_id is not None:
+            payload['webhook_id'] = str(webhook_id)
+        return payload
+
+    # -- wiring ------------------------------------------------------------------
+
+    def attach(self, client: discord.Client):
+        """Swap the client's REST and webhook transports for this backend."""
+        self.client = client
+        http = FakeHTTPClient(self, client.http.loop)
+        client.http = http
+        client._connection.http = http
+        tree = client._connection._command_tree
+        if tree is not None:
+            tree._http = http
+        # Interaction responses and followups go through the webhook adapter, not HTTPClient
+        webhook_async.async_context.set(FakeWebhookAdapter(self))
+
+    async def start(self, client: discord.Client, token: str = 'fake-token'):
+        """Log the client in and deliver the guild as if the gateway had connected."""
+        if self.client is not client:
+            self.attach(client)
+        await client.login(token)
+        state = client._connection
+        state._add_guild_from_data(self.guild_payload())
+        client._ready.set()
+        state.dispatch('ready')
+
+    def populate_guild(self, members: int) -> int:
+        """Deliver `members` more guild members the way the gateway would for the client's settings.
+
+        A client that chunks guilds at startup ends up caching every member, as
+        its member chunk requests would; any other client receives none.
+        """
+        state = self.client._connection
+        guild = state._get_guild(self.guild_id)
+        if guild is None or not state._chunk_guilds:
+            return 0
+        for i in range(members):
+            guild._add_member(discord.Member(data=self.member_payload(1_000_000 + i), guild=guild, state=state))
+        return members
+
+    # -- simulated gateway events -----------------------------------------------
+
+    def _interaction_payload(self, interaction_type: int, user_id: int, channel_id: int, data: dict,
+                             message: Optional[dict] = None, roles=None) -> dict:
+        interaction_id = self.next_id()
+        token = f"token-{interaction_id}"
+        message_id = int(message['id']) if message else None
+        self.webhook_tokens[token] = (self.clock(), channel_id, message_id)
+        payload = {
+            'id': str(interaction_id),
+            'application_id': str(self.application_id),
+            'type': interaction_type,
+            'token': token,
+            'version': 1,
+            'guild_id': str(self.guild_id),
+            'channel_id': str(channel_id),
+            'channel': {'id': str(channel_id), 'type': 0, 'name': f"sng-{channel_id}", 'position': 0,
+                        'permission_overwrites': [], 'guild_id': str(self.guild_id)},
+            'member': self.member_payload(user_id, roles),
+            'data': data,
+            'locale': 'en-US',
+            'guild_locale': 'en-US',
+            'app_permissions': str(discord.Permissions.all().value),
+        }
+        if message is not None:
+            payload['message'] = message
+        return payload
+
+    def _dispatch_interaction(self, payload: dict) -> asyncio.Future:
+        interaction_id = int(payload['id'])
+        future = asyncio.get_running_loop().create_future()
+        self._acked[interaction_id] = future
+        self._dispatched[interaction_id] = time.perf_counter()
+        self.client._connection.parse_interaction_create(payload)
+        return future
+
+    def invoke_command(self, user_id: int, channel_id: int, name: str, roles=None) -> asyncio.Future:
+        """Send a slash command; the returned future resolves when the bot first responds."""
+        command = next((c for c in self.commands if c['name'] == name), None)
+        data = {'id': command['id'] if command else str(self.next_id()), 'name': name, 'type': 1}
+        return self._dispatch_interaction(self._interaction_payload(2, user_id, channel_id, data, roles=roles))
+
+    def click(self, user_id: int, message_id: int, custom_id: str) -> asyncio.Future:
+        """Click a button on a stored message; resolves when the bot first responds."""
+        message = self.messages[int(message_id)]
+        data = {'custom_id': custom_id, 'component_type': 2}
+        payload = self._interaction_payload(3, user_id, int(message['channel_id']), data, message=message)
+        return self._dispatch_interaction(payload)
+
+    def post_message(self, user_id: int, channel_id: int, content: str) -> dict:
+        """Deliver a MESSAGE_CREATE from a user."""
+        payload = self.message_payload(channel_id, author=self.user_payload(user_id), content=content)
+        payload['member'] = {k: v for k, v in self.member_payload(user_id).items() if k != 'user'}
+        self.messages[int(payload['id'])] = payload
+        self.client._connection.parse_message_create(payload)
+        return payload
+
+    def custom_ids(self, message_id: int):
+        """custom_ids of every button on a stored message."""
+        message = self.messages.get(int(message_id), {})
+        return [c['custom_id'] for row in message.get('components', []) for c in row['components'] if 'custom_id' in c]
+
+    def find_messages(self, channel_id: int, predicate=None):
+        return [
+            m for m in self.messages.values()
+            if int(m['channel_id']) == channel_id and (predicate is None or predicate(m))
+        ]
+
+    # -- simulated REST ----------------------------------------------------------
+
+    async def handle(self, route: Route, payload: Optional[dict] = None, params: Optional[dict] = None):
+        """Apply rate limits and latency, then answer the request from memory."""
+        key = f"{route.method} {route.path}"
+        started = time.perf_counter()
+        stats = getattr(self.client, 'stats', None)
+        if stats is not None:
+            stats.request_started()  # As the aiohttp trace hook would when the request goes out
+        await self._acquire(route)
+        await asyncio.sleep(max(0.0, self.latency * (1 + self.random.uniform(-self.jitter, self.jitter))))
+        status = 200
+        try:
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.server_errors += 1
+                raise _error(503, 0, 'Service Unavailable')
+            return self._respond(route, payload or {}, params or {})
+        except discord.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.calls[key] += 1
+            self.route_time[key] += elapsed
+            # Feed the bot's own REST counters the way its aiohttp trace hooks would
+            stats = getattr(self.client, 'stats', None)
+            if stats is not None:
+                stats.record_request(route.method, route.url[len(Route.BASE):], status, elapsed)
+
+    async def _acquire(self, route: Route):
+        limit = self.route_limits.get((route.method, route.path))
+        buckets = []
+        if limit:
+            bucket_key = (route.method, route.path, route.major_parameters)
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = _Bucket(*limit)
+            buckets.append(bucket)
+        if self.global_bucket and not route.path.startswith('/interactions/'):
+            buckets.append(self.global_bucket)
+        for bucket in buckets:
+            while True:
+                wait = bucket.acquire(self.clock())
+                if not wait:
+                    break
+                # discord.py sees a 429 and sleeps for retry_after before retrying
+                self.rate_limited += 1
+                stats = getattr(self.client, 'stats', None)
+                if stats is not None:
+                    stats.record_request(route.method, route.url[len(Route.BASE):], 429, 0.0, wait)
+                waited_from = time.perf_counter()
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self.ratelimit_wait += time.perf_counter() - waited_from
+
+    def ratelimit_headers(self, route: Route) -> dict:
+        """X-RateLimit headers Discord would send for the route's bucket."""
+        limit = self.route_limits.get((route.method, route.path))
+        if not limit:
+            return {}
+        bucket = self._buckets.get((route.method, route.path, route.major_parameters))
+        now = self.clock()
+        if bucket is None or now >= bucket.reset_at:
+            return {'X-Ratelimit-Limit': str(limit[0]), 'X-Ratelimit-Remaining': str(limit[0]),
+                    'X-Ratelimit-Reset-After': str(limit[1])}
+        return {'X-Ratelimit-Limit': str(bucket.limit), 'X-Ratelimit-Remaining': str(bucket.remaining),
+                'X-Ratelimit-Reset-After': f"{bucket.reset_at - now:.3f}"}
+
+    def _params(self, route: Route) -> dict:
+        pattern = re.escape(route.path)
+        pattern = re.sub(r'\\{(\w+)\\}', r'(?P<\1>[^/]+)', pattern)
+        match = re.fullmatch(Route.BASE.replace('.', r'\.') + pattern, route.url.split('?')[0])
+        return match.groupdict() if match else {}
+
+    def _check_token(self, token: str):
+        """Return (channel id, message id) for a live interaction token."""
+        entry = self.webhook_tokens.get(token)
+        if entry is None or self.clock() - entry[0] > WEBHOOK_TOKEN_TTL:
+            raise _error(401, 50027, 'Invalid Webhook Token')
+        return entry[1], entry[2]
+
+    def _respond(self, route: Route, payload: dict, params: dict):
+        method, path = route.method, route.path
+        args = self._params(route)
+
+        if (method, path) == ('GET', '/users/@me'):
+            return self.bot_user
+        if (method, path) == ('GET', '/oauth2/applications/@me'):
+            return {
+                'id': str(self.application_id), 'name': 'sng-bot', 'description': '', 'icon': None,
+                'bot_public': False, 'bot_require_code_grant': False, 'owner': self.user_payload(1),
+                'verify_key': '', 'flags': 0,
+            }
+        if method == 'PUT' and path.startswith('/applications/') and path.endswith('/commands'):
+            self.commands = [
+                dict(command, id=str(self.next_id()), application_id=str(self.application_id), version='1')
+                for command in payload
+            ]
+            return self.commands
+        if (method, path) == ('GET', '/users/{user_id}'):
+            return self.user_payload(int(args['user_id']))
+        if (method, path) == ('POST', '/users/@me/channels'):
+            # Like Discord, a user's DM channel keeps its ID
+            recipient = int(payload['recipient_id'])
+            channel_id = next((c for c, user in self.dm_channels.items() if user == recipient), None)
+            if channel_id is None:
+                channel_id = self.next_id()
+                self.dm_channels[channel_id] = recipient
+            return {'id': str(channel_id), 'type': 1, 'recipients': [self.user_payload(recipient)]}
+
+        if (method, path) == ('POST', '/channels/{channel_id}/messages'):
+            message = self.message_payload(
+                args['channel_id'], author=self.bot_user, content=payload.get('content'),
+                embeds=payload.get('embeds'), components=payload.get('components'),
+            )
+            self.messages[int(message['id'])] = message
+            return message
+        if (method, path) == ('GET', '/channels/{channel_id}/messages/{message_id}'):
+            return self._get_message(args['message_id'])
+        if (method, path) == ('PATCH', '/channels/{channel_id}/messages/{message_id}'):
+            return self._edit_message(args['message_id'], payload)
+        if (method, path) == ('DELETE', '/channels/{channel_id}/messages/{message_id}'):
+            self._get_message(args['message_id'])
+            del self.messages[int(args['message_id'])]
+            return None
+        if (method, path) == ('POST', '/channels/{channel_id}/messages/bulk-delete'):
+            for message_id in payload.get('messages', []):
+                self.messages.pop(int(message_id), None)
+            return None
+        if (method, path) == ('POST', '/channels/{channel_id}/typing'):
+            return None
+
+        if (method, path) == ('POST', '/interactions/{webhook_id}/{webhook_token}/callback'):
+            channel_id, message_id = self._check_token(args['webhook_token'])
+            self._ack(int(args['webhook_id']))
+            data = payload.get('data') or {}
+            if payload.get('type') == 4:  # Channel message with source
+                message = self.message_payload(
+                    channel_id, author=self.bot_user, content=data.get('content'), embeds=data.get('embeds'),
+                    components=data.get('components'), flags=data.get('flags', 0),
+                )
+                self.messages[int(message['id'])] = message
+            elif payload.get('type') == 7 and message_id in self.messages:  # Update message
+                self._edit_message(message_id, data)
+            return None
+        if (method, path) == ('POST', '/webhooks/{webhook_id}/{webhook_token}'):
+            channel_id, _ = self._check_token(args['webhook_token'])
+            message = self.message_payload(
+                channel_id, author=self.bot_user,
+                content=payload.get('content'), embeds=payload.get('embeds'),
+                components=payload.get('components'), flags=payload.get('flags', 0),
+                webhook_id=args['webhook_id'],
+            )
+            self.messages[int(message['id'])] = message
+            return message
+        if (method, path) == ('PATCH', '/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}'):
+            self._check_token(args['webhook_token'])
+            return self._edit_message(args['message_id'], payload)
+        if (method, path) == ('DELETE', '/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}'):
+            self._check_token(args['webhook_token'])
+            self._get_message(args['message_id'])
+            del self.messages[int(args['message_id'])]
+            return None
+
+        logger.warning(f"Fake Discord has no handler for {method} {path}")
+        raise _error(404, 0, f"No fake handler for {method} {path}")
+
+    def _ack(self, interaction_id: int):
+        future = self._acked.pop(interaction_id, None)
+        dispatched = self._dispatched.pop(interaction_id, None)
+        if dispatched is not None:
+            self.interaction_latencies.append(time.perf_counter() - dispatched)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def _get_message(self, message_id) -> dict:
+        message = self.messages.get(int(message_id))
+        if message is None:
+            raise _error(404, 10008, 'Unknown Message')
+        return message
+
+    def _edit_message(self, message_id, payload: dict) -> dict:
+        message = self._get_message(message_id)
+        for field in ('content', 'embeds', 'components'):
+            if field in payload:
+                message[field] = payload[field] or ([] if field != 'content' else '')
+        message['edited_timestamp'] = discord.utils.utcnow().isoformat()
+        return message
+
+    def prune(self, token_age: float = WEBHOOK_TOKEN_TTL):
+        """Forget state a long run no longer needs: old interaction tokens, ephemeral messages and DMs.
+
+        Keeps the backend's own memory flat so soak runs measure the bot.
+        """
+        cutoff = self.clock() - token_age
+        self.webhook_tokens = {
+            token: entry for token, entry in self.webhook_tokens.items() if entry[0] > cutoff
+        }
+        self.messages = {
+            message_id: message for message_id, message in self.messages.items()
+            if not message.get('flags', 0) & 64 and 'guild_id' in message
+        }
+        self.interaction_latencies.clear()
+
+    # -- reporting ---------------------------------------------------------------
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def pending_interactions(self) -> int:
+        return len(self._acked)
+
+
+class FakeHTTPClient(HTTPClient):
+    """HTTPClient whose requests are answered by a FakeDiscord backend."""
+    def __init__(self, backend: FakeDiscord, loop):
+        super().__init__(loop)
+        self.backend = backend
+
+    async def static_login(self, token: str):
+        self.token = token
+        return await self.request(Route('GET', '/users/@me'))
+
+    async def request(self, route: Route, *, files=None, form=None, **kwargs):
+        payload = kwargs.get('json')
+        if payload is None and form:
+            payload = next((json.loads(f['value']) for f in form if f.get('name') == 'payload_json'), None)
+        # Pre-emptive rate limiting through discord.py's own buckets, fed by the fake's headers
+        ratelimit = self.get_ratelimit(f"{route.key}:{route.major_parameters}")
+        async with ratelimit:
+            try:
+                return await self.backend.handle(route, payload, kwargs.get('params'))
+            finally:
+                headers = self.backend.ratelimit_headers(route)
+                if headers:
+                    ratelimit.update(_FakeResponse(200, 'OK', headers))
+
+    async def close(self):
+        pass
+
+
+class FakeWebhookAdapter(webhook_async.AsyncWebhookAdapter):
+    """Webhook adapter that routes interaction responses to a FakeDiscord backend."""
+    def __init__(self, backend: FakeDiscord):
+        super().__init__()
+        self.backend = backend
+
+    async def request(self, route: Route, session=None, *, payload=None, multipart=None, params=None, **kwargs):
+        if payload is None and multipart:
+            payload = next((json.loads(f['value']) for f in multipart if f.get('name') == 'payload_json'), None)
+        return await self.backend.handle(route, payload, params)
@@ -0,0 +1,304 @@
+"""Replay recorded interaction traffic against the bot offline, faster than real time.
+
+Reads a file written with TRAFFIC_RECORD_PATH and feeds its slash commands,
+button clicks, Notify Me toggles and channel messages to the real bot through
+the fake backend at their recorded offsets. The deadline scheduler and the
+fake backend run on a virtual clock: whenever the bot has no work in flight,
+the replay jumps straight to the next event or deadline, so quiet stretches
+and the 3-minute auto-end and 1-hour inactivity timers take no real time,
+while busy stretches play out at real speed against simulated REST latency
+and rate limits. Reports REST calls by route and first-response latency;
+save a report with --json and compare a later commit's run against it with
+--compare.
+
+Usage:
+    python replay_traffic.py traffic.jsonl --json before.json
+    python replay_traffic.py traffic.jsonl --compare before.json
+"""
+import gzip
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+
+from simulate_load import load_bot, percentile, wait_for
+
+POLL_INTERVAL = 0.002  # Real seconds between idle checks
+USER_ID_BASE = 10_000
+CHANNEL_ID_BASE = 100
+
+
+def load_events(path: str) -> list:
+    """Events with absolute offsets; later sessions are appended after the previous one ends."""
+    opener = gzip.open if path.endswith('.gz') else open
+    events = []
+    session, base, last = -1, 0.0, 0.0
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event['e'] == 'session':
+                session += 1
+                base = last
+                continue
+            event['at'] = base + event['t']
+            event['session'] = max(session, 0)
+            last = event['at']
+            events.append(event)
+    return events
+
+
+class Replay:
+    """Feed recorded events to the bot and map recorded games to the ones the replay creates."""
+    def __init__(self, bot, fake, clock, timeout: float):
+        self.bot = bot
+        self.fake = fake
+        self.clock = clock
+        self.timeout = timeout
+        self.origin = clock.now()
+        self.users = {}  # (session, user number) -> fake user ID
+        self.games = {}  # (session, game number) -> future of the replayed Game, or None
+        self.claimed = set()
+        self.acks = []
+        self.counts = Counter()
+        self.skipped_seconds = 0.0
+        self.background = set()
+        self.helpers = set()
+
+    def user_id(self, event) -> int:
+        if event.get('a') == 'admin':
+            return self.bot.ADMIN_USER_ID
+        if event.get('a') == 'pin':
+            return self.bot.PIN_BOT_ID
+        key = (event['session'], event['u'])
+        if key not in self.users:
+            self.users[key] = USER_ID_BASE + len(self.users)
+        return self.users[key]
+
+    @staticmethod
+    def channel_id(event) -> int:
+        return CHANNEL_ID_BASE + event['c']
+
+    def idle(self) -> bool:
+        """True when neither the bot nor the replay has anything left to do at this instant."""
+        runner = self.bot.client.scheduler._runner
+        return all(
+            task.done() or task in self.background or task is runner
+            for task in asyncio.all_tasks()
+        )
+
+    async def advance_to(self, at: float):
+        """Wait until the virtual clock reaches `at`, jumping over idle time but never past a deadline."""
+        while True:
+            remaining = self.origin + at - self.clock.now()
+            if remaining <= 0:
+                return
+            if not self.idle():
+                await asyncio.sleep(min(remaining, POLL_INTERVAL))
+                continue
+            deadline = self.bot.client.scheduler.next_deadline()
+            step = remaining if deadline is None else min(remaining, deadline - self.clock.now())
+            if step > 0:
+                self.clock.advance(step)
+                self.skipped_seconds += step
+            # Let deadlines that are now due fire and start their work before checking again
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def drain(self):
+        """Run the clock on until every game has ended and the bot is idle."""
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            await wait_for(self.idle, self.timeout, POLL_INTERVAL)
+            deadline = self.bot.client.scheduler.next_deadline()
+            if deadline is None or not len(self.bot.sng_games):
+                await asyncio.sleep(self.bot.MODERATION_WINDOW)  # Real-time windows still pending
+                if self.idle():
+                    return
+                continue
+            await self.advance_to(deadline - self.origin)
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.helpers.add(task)
+        task.add_done_callback(self.helpers.discard)
+
+    def dispatch(self, event):
+        kind = event['e']
+        self.counts[kind] += 1
+        if kind == 'command':
+            roles = [self.bot.ROLE_ID] if event.get('r', 1) else []
+            self.acks.append(self.fake.invoke_command(self.user_id(event), self.channel_id(event), event['name'], roles=roles))
+        elif kind == 'message':
+            content = '/command' if event.get('slash') else 'replayed message'
+            self.fake.post_message(self.user_id(event), self.channel_id(event), content)
+        elif kind == 'game':
+            future = self.games.setdefault((event['session'], event['g']), asyncio.get_running_loop().create_future())
+            self.spawn(self.claim(event, future))
+        elif kind == 'click':
+            future = self.games.get((event['session'], event['g']))
+            if future is None:
+                self.counts['click_unknown_game'] += 1  # The game was created before the recording started
+            elif future.done():
+                self.click(event, future.result())
+            else:
+                self.spawn(self.click_later(event, future))
+
+    async def claim(self, event, future):
+        """Find the replayed game that corresponds to a recorded `game` event."""
+        starter = f"user{self.user_id(event)}" if 'u' in event else "the queue"
+        channel_id = self.channel_id(event)
+
+        def find():
+            for game in self.bot.sng_games:
+                if game.starter == starter and game.channel_id == channel_id and game.sng_id not in self.claimed:
+                    return game
+            return None
+
+        game = await wait_for(find, self.timeout, POLL_INTERVAL)
+        if game is None:
+            self.counts['game_not_created'] += 1
+        else:
+            self.claimed.add(game.sng_id)
+        future.set_result(game)
+
+    async def click_later(self, event, future=None, game=None):
+        """Click once the game is mapped and its GUI message has been sent."""
+        if future is not None:
+            game = await future
+        if game is not None:
+            await wait_for(lambda: game.view is None or game.view.message, self.timeout, POLL_INTERVAL)
+        self.click(event, game)
+
+    def click(self, event, game):
+        if game is None or game.view is None:
+            self.counts['click_stale'] += 1
+            return
+        if game.view.message is None:
+            self.spawn(self.click_later(event, game=game))
+            return
+        message_id = game.view.message.id
+        if message_id not in self.fake.messages:
+            self.counts['click_stale'] += 1  # The game already ended here and its GUI is gone
+            return
+        custom_id = f"{event['b']}_{game.sng_id}"
+        if event['b'] == 'player':
+            custom_id += f"_{event['slot']}"
+        self.acks.append(self.fake.click(self.user_id(event), message_id, custom_id))
+
+
+async def replay(args) -> dict:
+    events = load_events(args.recording)
+    channels = max((event['c'] for event in events if 'c' in event), default=0) + 1
+    channel_ids = [CHANNEL_ID_BASE + i for i in range(channels)]
+    bot = load_bot(channel_ids)
+    from fake_discord import FakeDiscord
+
+    clock = bot.VirtualClock()
+    bot.client.scheduler.clock = clock
+    fake = FakeDiscord(channel_ids=channel_ids, role_id=bot.ROLE_ID, latency=args.latency, seed=args.seed)
+    fake.clock = clock.now
+    await fake.start(bot.client)
+    calls_before = fake.total_calls
+    runner = Replay(bot, fake, clock, args.timeout)
+    runner.background = set(asyncio.all_tasks())
+
+    started = time.perf_counter()
+    for event in events:
+        await runner.advance_to(event['at'])
+        runner.dispatch(event)
+    await runner.drain()
+    elapsed = time.perf_counter() - started
+    virtual = clock.now() - runner.origin
+    await bot.client.close()
+
+    latencies = fake.interaction_latencies
+    rest_calls = fake.total_calls - calls_before
+    stats = bot.client.stats
+    return {
+        'recording': args.recording,
+        'events': dict(runner.counts),
+        'games_created': stats.games_created,
+        'games_ended': sum(stats.games_ended.values()),
+        'interactions': len(runner.acks),
+        'unanswered': fake.pending_interactions(),
+        'virtual_seconds': virtual,
+        'elapsed': elapsed,
+        'speedup': virtual / elapsed if elapsed else 0.0,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p95': percentile(latencies, 95),
+        'latency_p99': percentile(latencies, 99),
+        'rest_calls': rest_calls,
+        'rest_calls_per_game': rest_calls / stats.games_created if stats.games_created else 0.0,
+        'rate_limited': fake.rate_limited,
+        'ratelimit_wait': fake.ratelimit_wait,
+        'calls_by_route': dict(fake.calls.most_common()),
+    }
+
+
+SUMMARY_ROWS = [
+    ('Games created', 'games_created', '{:.0f}'),
+    ('Games ended', 'games_ended', '{:.0f}'),
+    ('Interactions', 'interactions', '{:.0f}'),
+    ('Unanswered', 'unanswered', '{:.0f}'),
+    ('First response p50 (ms)', 'latency_p50', '{:.1f}', 1000),
+    ('First response p95 (ms)', 'latency_p95', '{:.1f}', 1000),
+    ('First response p99 (ms)', 'latency_p99', '{:.1f}', 1000),
+    ('REST calls', 'rest_calls', '{:.0f}'),
+    ('REST calls per game', 'rest_calls_per_game', '{:.1f}'),
+    ('Rate limited (429)', 'rate_limited', '{:.0f}'),
+]
+
+
+def print_report(report: dict):
+    events = report['events']
+    replayed = sum(events.get(kind, 0) for kind in ('command', 'click', 'message'))
+    skipped = sum(events.get(kind, 0) for kind in ('click_unknown_game', 'click_stale'))
+    print(f"Replayed:                 {replayed} events ({skipped} clicks skipped, {events.get('game_not_created', 0)} games not created)")
+    print(f"Recorded time:            {report['virtual_seconds']:.1f}s in {report['elapsed']:.2f}s ({report['speedup']:.0f}x)")
+    for label, key, fmt, *scale in SUMMARY_ROWS:
+        print(f"{label + ':':26s}{fmt.format(report[key] * (scale[0] if scale else 1))}")
+    print("Calls by route:")
+    for route, count in report['calls_by_route'].items():
+        print(f"  {count:6d}  {route}")
+
+
+def print_comparison(baseline: dict, report: dict):
+    """Side-by-side table of a saved report and this run."""
+    print(f"{'':28s}{'baseline':>12s}{'this run':>12s}{'change':>10s}")
+    for label, key, fmt, *scale in SUMMARY_ROWS:
+        factor = scale[0] if scale else 1
+        before, after = baseline[key] * factor, report[key] * factor
+        change = f"{(after - before) / before * 100:+.1f}%" if before else '-'
+        print(f"{label:28s}{fmt.format(before):>12s}{fmt.format(after):>12s}{change:>10s}")
+    print("Calls by route:")
+    routes = sorted(set(baseline['calls_by_route']) | set(report['calls_by_route']),
+                    key=lambda route: -report['calls_by_route'].get(route, 0))
+    for route in routes:
+        before, after = baseline['calls_by_route'].get(route, 0), report['calls_by_route'].get(route, 0)
+        print(f"  {before:8d}{after:8d}{after - before:+8d}  {route}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording', help="Traffic file written with TRAFFIC_RECORD_PATH (.gz is fine)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated REST latency in seconds")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Real seconds to wait for a game's GUI or for the bot to settle")
+    parser.add_argument('--json', metavar='PATH', help="Also write the report to this file")
+    parser.add_argument('--compare', metavar='PATH', help="Compare with a report saved by --json")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for simulated latency")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    result = asyncio.run(replay(arguments))
+    if arguments.json:
+        with open(arguments.json, 'w') as out:
+            json.dump(result, out, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as saved:
+            print_comparison(json.load(saved), result)
+    else:
+        print_report(result)
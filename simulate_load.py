@@ -0,0 +1,214 @@
+"""Throughput benchmark for the bot against the in-process fake Discord backend.
+
+Drives N concurrent games, each with M clicking users, through the real
+/start command, PlayerButton clicks, Notify Me, Start and End buttons and the
+on_message purge, then reports interactions per second, time-to-first-response
+percentiles and REST calls per game. With --queue the same players join the
+/queue pool instead and the matchmaker starts their games.
+
+Usage:
+    python simulate_load.py --games 20 --users 12 --channels 2
+    python simulate_load.py --games 20 --users 12 --queue
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+# The bot reads its configuration at import time; supply a harmless default set
+SIMULATION_ENV = {
+    'DISCORD_BOT_TOKEN': 'simulated',
+    'DESIGNATED_CHANNELS': '100',
+    'ADMIN_USER_ID': '1',
+    'PIN_BOT_ID': '2',
+    'ROLE_ID': '3',
+    'TEST_MODE': 'false',
+    'GAME_STORE': 'memory',
+    'LOG_LEVEL': 'WARNING',
+    'QUEUE_TIMEOUT': '1.0',
+    'COMMAND_SYNC_STATE_PATH': os.path.join(tempfile.gettempdir(), 'sng_simulation_command_sync.json'),
+}
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def load_bot(channel_ids):
+    """Import bot.py with simulation defaults for any unset configuration."""
+    for key, value in SIMULATION_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['DESIGNATED_CHANNELS'] = ','.join(str(c) for c in channel_ids)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bot
+    return bot
+
+
+async def wait_for(predicate, timeout: float, interval: float = 0.01):
+    """Poll `predicate` until it returns something truthy or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        await asyncio.sleep(interval)
+    return None
+
+
+async def run_game(bot, fake, game_no: int, channel_id: int, users: int, rng: random.Random, timeout: float):
+    """Play one game from /start to End, returning the interaction futures it produced."""
+    acks = []
+    starter_id = 10_000 + game_no
+    acks.append(fake.invoke_command(starter_id, channel_id, 'start'))
+
+    def gui_ready():
+        for game in bot.sng_games.by_starter(f"user{starter_id}"):
+            if game.view and game.view.message:
+                return game
+        return None
+
+    game = await wait_for(gui_ready, timeout)
+    if game is None:
+        return acks, False
+    message_id = game.view.message.id
+    sng_id = game.sng_id
+
+    # Players pile onto the lobby; some ask for notifications and some chat in the channel
+    player_ids = [20_000 + game_no * 1000 + i for i in range(users)]
+    rng.shuffle(player_ids)
+    clicks = []
+    for slot, user_id in enumerate(player_ids, start=2):
+        if rng.random() < 0.3:
+            clicks.append(fake.click(user_id, message_id, f"notify_me_{sng_id}"))
+        if rng.random() < 0.1:
+            fake.post_message(user_id, channel_id, "anyone up for a game?")
+        clicks.append(fake.click(user_id, message_id, f"player_{sng_id}_{min(slot, bot.MAX_PLAYERS)}"))
+        await asyncio.sleep(rng.uniform(0, 0.02))
+    acks.extend(clicks)
+    await asyncio.wait(clicks, timeout=timeout)
+
+    if sng_id in bot.sng_games and not bot.sng_games.get(sng_id).started:
+        acks.append(fake.click(starter_id, message_id, f"start_sng_{sng_id}"))
+        await asyncio.wait([acks[-1]], timeout=timeout)
+    if sng_id in bot.sng_games:
+        acks.append(fake.click(starter_id, message_id, f"end_sng_{sng_id}"))
+        await asyncio.wait([acks[-1]], timeout=timeout)
+    ended = await wait_for(lambda: sng_id not in bot.sng_games, timeout)
+    return acks, bool(ended)
+
+
+async def run_queue(bot, fake, channel_ids, players: int, rng: random.Random, timeout: float):
+    """Queue `players` users across the channels, then end every game the matchmaker started."""
+    acks = []
+    for i in range(players):
+        acks.append(fake.invoke_command(30_000 + i, channel_ids[i % len(channel_ids)], 'queue'))
+        await asyncio.sleep(rng.uniform(0, 0.005))
+    await asyncio.wait(acks, timeout=timeout)
+
+    # Leftover players get a smaller game once the queue timeout passes
+    matchmaker = bot.client.matchmaker
+    await wait_for(
+        lambda: not matchmaker.pools and all(game.view and game.view.message for game in bot.sng_games),
+        timeout + bot.QUEUE_TIMEOUT
+    )
+    results = []
+    for game in list(bot.sng_games):
+        end = fake.click(30_000, game.view.message.id, f"end_sng_{game.sng_id}")
+        acks.append(end)
+        results.append(([end], game.sng_id))
+    await wait_for(lambda: not len(bot.sng_games), timeout)
+    return acks, [(game_acks, sng_id not in bot.sng_games) for game_acks, sng_id in results]
+
+
+async def simulate(args) -> dict:
+    channel_ids = [100 + i for i in range(args.channels)]
+    bot = load_bot(channel_ids)
+    from fake_discord import FakeDiscord
+
+    fake = FakeDiscord(channel_ids=channel_ids, role_id=bot.ROLE_ID, latency=args.latency, seed=args.seed)
+    await fake.start(bot.client)
+    fake.error_rate = args.error_rate  # Only after login, which has no retries of its own
+    rng = random.Random(args.seed)
+    calls_before = fake.total_calls
+
+    started = time.perf_counter()
+    if args.queue:
+        queue_acks, results = await run_queue(bot, fake, channel_ids, args.games * args.users, rng, args.timeout)
+        interactions = len(queue_acks)
+    else:
+        results = await asyncio.gather(*(
+            run_game(bot, fake, i, channel_ids[i % len(channel_ids)], args.users, rng, args.timeout)
+            for i in range(args.games)
+        ))
+        interactions = sum(len(acks) for acks, _ in results)
+    elapsed = time.perf_counter() - started
+
+    # Let background work (DMs, moderation purges) drain before counting REST calls
+    await asyncio.sleep(max(bot.MODERATION_WINDOW, bot.GUI_EDIT_WINDOW) + args.latency * 4)
+    await bot.client.close()
+
+    latencies = fake.interaction_latencies
+    rest_calls = fake.total_calls - calls_before
+    games = len(results)
+    return {
+        'games': games,
+        'games_ended': sum(1 for _, ended in results if ended),
+        'interactions': interactions,
+        'unanswered': fake.pending_interactions(),
+        'elapsed': elapsed,
+        'interactions_per_second': interactions / elapsed if elapsed else 0.0,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p95': percentile(latencies, 95),
+        'latency_p99': percentile(latencies, 99),
+        'rest_calls': rest_calls,
+        'rest_calls_per_game': rest_calls / games if games else 0.0,
+        'rate_limited': fake.rate_limited,
+        'ratelimit_wait': fake.ratelimit_wait,
+        'server_errors': fake.server_errors,
+        'retries': sum(bot.client.stats.retries.values()),
+        'shed': sum(bot.client.stats.shed.values()),
+        'calls_by_route': dict(fake.calls.most_common()),
+    }
+
+
+def print_report(report: dict):
+    print(f"Games:                 {report['games_ended']}/{report['games']} ended")
+    print(f"Interactions:          {report['interactions']} ({report['unanswered']} unanswered)")
+    print(f"Elapsed:               {report['elapsed']:.2f}s")
+    print(f"Interactions/second:   {report['interactions_per_second']:.1f}")
+    print(
+        f"First response (ms):   p50={report['latency_p50'] * 1000:.1f} "
+        f"p95={report['latency_p95'] * 1000:.1f} p99={report['latency_p99'] * 1000:.1f}"
+    )
+    print(f"REST calls:            {report['rest_calls']} ({report['rest_calls_per_game']:.1f} per game)")
+    print(f"Rate limited (429):    {report['rate_limited']} ({report['ratelimit_wait']:.2f}s waiting)")
+    if report['server_errors']:
+        print(f"Server errors (503):   {report['server_errors']} ({report['retries']} retried, {report['shed']} shed)")
+    print("Calls by route:")
+    for route, count in report['calls_by_route'].items():
+        print(f"  {count:6d}  {route}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=10, help="Concurrent games to run")
+    parser.add_argument('--users', type=int, default=10, help="Clicking users per game")
+    parser.add_argument('--channels', type=int, default=1, help="Designated channels to spread games over")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated REST latency in seconds")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Seconds to wait for each stage of a game")
+    parser.add_argument('--queue', action='store_true', help="Join players through /queue instead of lobby clicks")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of REST calls that fail with a 503")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for a reproducible run")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    print_report(asyncio.run(simulate(parse_args())))
@@ -0,0 +1,218 @@
+"""Soak test: run many game lifecycles against the fake backend and check memory stays bounded.
+
+Plays games through the real /start command, player, Notify Me, Start and End
+buttons, the auto-end path and the inactivity path, with the deadline
+scheduler's clock accelerated so the one-hour and three-minute timers fire in
+well under a second. After every checkpoint the run drains, takes a tracemalloc
+snapshot and checks that the game registry, discord.py's view store, the
+tracked game messages and pending tasks are back to their baseline and that
+traced memory has stopped growing. Exits with status 1 if any bound fails.
+
+Usage:
+    python soak_test.py --games 200000 --concurrency 50 --checkpoint 10000
+"""
+import os
+import gc
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from typing import Optional
+
+from simulate_load import load_bot, wait_for
+
+# Short real-time windows so games finish quickly; deadlines use the scaled clock
+SOAK_ENV = {
+    'GUI_EDIT_WINDOW': '0.01',
+    'MODERATION_WINDOW': '0.01',
+    'GAME_STORE_FLUSH_INTERVAL': '0.05',
+    'LOG_LEVEL': 'WARNING',
+}
+LIFECYCLES = ('full', 'manual', 'inactivity')
+
+
+async def play(bot, fake, starter_id: int, channel_id: int, rng: random.Random, users: int, timeout: float) -> bool:
+    """Play one game to its end by a randomly chosen path; True once it has ended."""
+    kind = rng.choice(LIFECYCLES)
+    await asyncio.wait_for(fake.invoke_command(starter_id, channel_id, 'start'), timeout)
+
+    def gui_ready():
+        for game in bot.sng_games.by_starter(f"user{starter_id}"):
+            if game.view and game.view.message:
+                return game
+        return None
+
+    game = await wait_for(gui_ready, timeout)
+    if game is None:
+        return False
+    message_id, sng_id = game.view.message.id, game.sng_id
+
+    def click(custom_id: str, user_id: Optional[int] = None):
+        if message_id not in fake.messages:
+            return None  # A deadline already ended the game and deleted its GUI
+        return fake.click(user_id or 20_000 + rng.randrange(users), message_id, custom_id)
+
+    async def settle(futures):
+        futures = [future for future in futures if future is not None]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+
+    clicks = []
+    if rng.random() < 0.3:
+        clicks.append(click(f"notify_me_{sng_id}"))
+    if kind == 'full':
+        # Fill the table; the auto-end deadline ends the game
+        clicks.extend(click(f"player_{sng_id}_{slot}") for slot in range(2, bot.MAX_PLAYERS + 1))
+    elif kind == 'manual':
+        clicks.extend(click(f"player_{sng_id}_{slot}") for slot in range(2, rng.randint(3, bot.MAX_PLAYERS)))
+    await settle(clicks)
+    if kind == 'manual':
+        await settle([click(f"start_sng_{sng_id}", starter_id)])
+        await settle([click(f"end_sng_{sng_id}", starter_id)])
+    return bool(await wait_for(lambda: sng_id not in bot.sng_games, timeout))
+
+
+def measure(bot, fake, filters) -> dict:
+    """Collect garbage, then snapshot traced memory and the structures that must stay bounded."""
+    fake.prune(token_age=0)
+    gc.collect()
+    store = bot.client._connection._view_store
+    snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+    return {
+        'snapshot': snapshot,
+        'traced': sum(stat.size for stat in snapshot.statistics('filename')),
+        'games': len(bot.sng_games),
+        'views': len(store._views) + len(store._synced_message_views),
+        'game_messages': sum(len(game.view.game_messages) for game in bot.sng_games if game.view),
+        'tasks': sum(1 for task in asyncio.all_tasks() if not task.done()) - 1,  # Minus this task
+        'deadlines': len(bot.client.scheduler),
+    }
+
+
+def check(sample: dict, baseline: dict, max_growth: int) -> list:
+    """Bounds a drained run must meet; returns a description of each failure."""
+    failures = []
+    for name in ('games', 'views', 'game_messages'):
+        if sample[name]:
+            failures.append(f"{sample[name]} {name} left after all games ended")
+    if sample['tasks'] > baseline['tasks']:
+        failures.append(f"{sample['tasks']} pending tasks, baseline {baseline['tasks']}")
+    if sample['deadlines'] > baseline['deadlines']:
+        failures.append(f"{sample['deadlines']} scheduled deadlines, baseline {baseline['deadlines']}")
+    growth = sample['traced'] - baseline['traced']
+    if growth > max_growth:
+        failures.append(f"traced memory grew {growth / 1024:.1f} KiB since baseline (limit {max_growth / 1024:.0f} KiB)")
+    return failures
+
+
+async def soak(args) -> bool:
+    for key, value in SOAK_ENV.items():
+        os.environ.setdefault(key, value)
+    channel_ids = [100 + i for i in range(args.channels)]
+    bot = load_bot(channel_ids)
+    from fake_discord import FakeDiscord
+    import fake_discord
+
+    bot.client.scheduler.clock = bot.ScaledClock(args.speed)
+    # Discord's rate limits are off by default: at this clock speed they only slow the run down
+    limits = {} if args.rate_limits else {'route_limits': {}, 'global_limit': None}
+    fake = FakeDiscord(channel_ids=channel_ids, role_id=bot.ROLE_ID, latency=args.latency, seed=args.seed, **limits)
+    await fake.start(bot.client)
+    rng = random.Random(args.seed)
+    # Attribute memory to the bot and its libraries, not to the fake backend or this harness
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, fake_discord.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]
+
+    tracemalloc.start(args.frames)
+    # Each game in flight has its own starter, so the GUI lookup by starter is unambiguous
+    starters = asyncio.Queue()
+    for starter_id in range(10_000, 10_000 + args.concurrency):
+        starters.put_nowait(starter_id)
+    played = ended = 0
+    baseline = None
+    failed = False
+    started = time.perf_counter()
+
+    async def run(game_no: int) -> bool:
+        starter_id = await starters.get()
+        try:
+            return await play(bot, fake, starter_id, channel_ids[game_no % len(channel_ids)], rng, args.users, args.timeout)
+        finally:
+            starters.put_nowait(starter_id)
+
+    while played < args.games:
+        batch = min(args.checkpoint, args.games - played)
+        results = await asyncio.gather(*(run(played + i) for i in range(batch)), return_exceptions=True)
+        played += batch
+        ended += sum(1 for result in results if result is True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+
+        # Drain background work (edits, DMs, deletes) before measuring
+        await wait_for(lambda: not len(bot.sng_games), args.timeout)
+        await asyncio.sleep(args.drain)
+        sample = measure(bot, fake, filters)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{played:8d} games  {ended:8d} ended  {played / elapsed:7.1f} games/s  "
+            f"traced={sample['traced'] / 1024:9.1f} KiB  games={sample['games']} views={sample['views']} "
+            f"game_messages={sample['game_messages']} tasks={sample['tasks']} deadlines={sample['deadlines']}",
+            flush=True
+        )
+        for error in errors[:3]:
+            print(f"  game failed: {error!r}")
+
+        if baseline is None:
+            if played >= args.warmup:
+                baseline = sample  # Caches and lazily created structures are warm by now
+            continue
+        failures = check(sample, baseline, args.max_growth * 1024)
+        if errors or ended < played:
+            failures.append(f"{played - ended} of {played} games did not end")
+        if failures:
+            failed = True
+            for failure in failures:
+                print(f"FAIL: {failure}")
+            print("Top allocation growth since baseline:")
+            for stat in sample['snapshot'].compare_to(baseline['snapshot'], 'lineno')[:args.top]:
+                print(f"  {stat}")
+            if not args.keep_going:
+                break
+
+    tracemalloc.stop()
+    await bot.client.close()
+    if baseline is None:
+        print("FAIL: run ended before the warm-up finished; raise --games or lower --warmup")
+        return False
+    if not failed:
+        print(f"PASS: {played} games, memory bounded within {args.max_growth} KiB of the warm baseline")
+    return not failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=20000, help="Game lifecycles to run")
+    parser.add_argument('--concurrency', type=int, default=50, help="Games in flight at once")
+    parser.add_argument('--checkpoint', type=int, default=2000, help="Games between memory checkpoints")
+    parser.add_argument('--warmup', type=int, default=2000, help="Games to run before taking the baseline")
+    parser.add_argument('--max-growth', type=int, default=512, help="Allowed traced memory growth in KiB")
+    parser.add_argument('--speed', type=float, default=3600.0, help="Clock acceleration for game deadlines")
+    parser.add_argument('--channels', type=int, default=2, help="Designated channels to spread games over")
+    parser.add_argument('--users', type=int, default=500, help="Distinct users clicking buttons")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated REST latency in seconds")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for each stage of a game")
+    parser.add_argument('--drain', type=float, default=1.0, help="Seconds to let background work settle at a checkpoint")
+    parser.add_argument('--frames', type=int, default=1, help="Traceback frames tracemalloc keeps per allocation")
+    parser.add_argument('--top', type=int, default=10, help="Allocation sites to show when a bound fails")
+    parser.add_argument('--rate-limits', action='store_true', help="Apply the fake backend's rate limits")
+    parser.add_argument('--keep-going', action='store_true', help="Keep running after a failed checkpoint")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for a reproducible run")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if asyncio.run(soak(parse_args())) else 1)
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# The scripts and bot.py live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def bot(tmp_path_factory):
+    """bot.py imported with the load simulator's settings, from a scratch directory that takes its log files."""
+    os.chdir(tmp_path_factory.mktemp('bot'))
+    from simulate_load import load_bot
+    return load_bot([100])
@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import analyze_logs
+
+
+def event(ts, name, **fields):
+    return json.dumps({'ts': ts, 'level': 'INFO', 'event': name, **fields}) + '\n'
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Run scans on threads and record which files were scanned from which offset."""
+    calls = []
+
+    class RecordingPool(ThreadPoolExecutor):
+        def submit(self, fn, path, start=0):
+            calls.append((os.path.basename(path), start))
+            return super().submit(fn, path, start)
+
+    monkeypatch.setattr(analyze_logs, 'ProcessPoolExecutor', RecordingPool)
+    return calls
+
+
+def test_game_summary(tmp_path):
+    log = tmp_path / 'events.jsonl'
+    log.write_text(
+        event(100.0, 'game_created', sng='g1', display_id='g1', channel=5, starter='alice')
+        + event(130.0, 'game_started', sng='g1', players=4, reason='manual')
+        + event(120.0, 'player_clicks', sng='g1', clicks=3, players=4)
+        + event(125.0, 'player_clicks', sng='g1', clicks=1, players=4)
+        + event(200.0, 'game_ended', sng='g1', players=4, reason='manual')
+    )
+    rows, _ = analyze_logs.summarize(analyze_logs.analyze([str(log)], workers=1, index_dir=None))
+    assert len(rows) == 1
+    row = rows[0]
+    assert row['time_to_fill'] == 30.0
+    assert row['duration'] == 100.0
+    assert (row['start_reason'], row['end_reason'], row['players']) == ('manual', 'manual', 4)
+    assert row['clicks'] == 4
+
+
+def test_live_log_resumes_from_offset(tmp_path, scans):
+    log = tmp_path / 'events.jsonl'
+    index_dir = str(tmp_path / 'index')
+    first = event(100.0, 'game_created', sng='g1', display_id='g1')
+    log.write_text(first)
+    analyze_logs.analyze([str(log)], workers=1, index_dir=index_dir)
+
+    with open(log, 'a') as f:
+        f.write(event(160.0, 'game_ended', sng='g1', players=2, reason='inactivity'))
+    total = analyze_logs.analyze([str(log)], workers=1, index_dir=index_dir)
+
+    assert scans == [('events.jsonl', 0), ('events.jsonl', len(first))]
+    game = total['games']['g1']
+    assert (game['created'], game['ended'], game['end_reason']) == (100.0, 160.0, 'inactivity')
+    assert total['lines'] == 2
+
+
+def test_unchanged_files_are_not_rescanned(tmp_path, scans):
+    archive = tmp_path / 'events.jsonl.20240101-000000.gz'
+    with gzip.open(archive, 'wt') as f:
+        f.write(event(100.0, 'game_created', sng='g1', display_id='g1'))
+    log = tmp_path / 'events.jsonl'
+    log.write_text(event(150.0, 'game_ended', sng='g1', players=2, reason='manual'))
+    paths = [str(archive), str(log)]
+    index_dir = str(tmp_path / 'index')
+
+    analyze_logs.analyze(paths, workers=1, index_dir=index_dir)
+    total = analyze_logs.analyze(paths, workers=1, index_dir=index_dir)
+
+    assert [name for name, _ in scans] == [archive.name, log.name]
+    assert total['games']['g1']['created'] == 100.0
+    assert total['games']['g1']['ended'] == 150.0
+
+
+def test_changed_archive_is_rescanned_from_start(tmp_path, scans):
+    archive = tmp_path / 'events.jsonl.20240101-000000.gz'
+    with gzip.open(archive, 'wt') as f:
+        f.write(event(100.0, 'game_created', sng='g1', display_id='g1'))
+    index_dir = str(tmp_path / 'index')
+    analyze_logs.analyze([str(archive)], workers=1, index_dir=index_dir)
+
+    with gzip.open(archive, 'at') as f:
+        f.write(event(110.0, 'game_started', sng='g1', players=8, reason='full'))
+    total = analyze_logs.analyze([str(archive)], workers=1, index_dir=index_dir)
+
+    assert scans == [(archive.name, 0), (archive.name, 0)]
+    assert total['games']['g1']['started'] == 110.0
+    assert total['lines'] == 2
+
+
+def test_rotated_log_is_rescanned(tmp_path, scans):
+    log = tmp_path / 'events.jsonl'
+    index_dir = str(tmp_path / 'index')
+    log.write_text(event(100.0, 'game_created', sng='g1', display_id='g1') * 3)
+    analyze_logs.analyze([str(log)], workers=1, index_dir=index_dir)
+
+    # Rotation replaces the file with a shorter one
+    os.remove(log)
+    log.write_text(event(200.0, 'game_created', sng='g2', display_id='g2'))
+    total = analyze_logs.analyze([str(log)], workers=1, index_dir=index_dir)
+
+    assert scans[-1] == ('events.jsonl', 0)
+    assert set(total['games']) == {'g2'}
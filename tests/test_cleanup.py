@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+
+class Message:
+    def __init__(self, message_id, failures=0):
+        self.id = message_id
+        self.failures = failures
+        self.deleted = False
+
+    async def delete(self):
+        if self.failures:
+            self.failures -= 1
+            raise discord.HTTPException(SimpleNamespace(status=500, reason='Server Error'), 'test')
+        self.deleted = True
+
+
+async def settle(scheduler):
+    """Let the scheduler fire what is due and wait for the callbacks."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await asyncio.gather(*scheduler._tasks)
+
+
+@pytest.mark.asyncio
+async def test_failed_deletes_are_retried_later(bot):
+    clock = bot.VirtualClock()
+    client = SimpleNamespace(scheduler=bot.DeadlineScheduler(clock))
+    cleaner = bot.MessageCleaner(client)
+    # Snowflakes this small are too old for the bulk endpoint, so each is deleted on its own
+    kept, lost = Message(1, failures=1), Message(2)
+    try:
+        assert not await cleaner.delete(7, [kept, lost], 'g1', retry=True)
+        assert lost.deleted and not kept.deleted
+        key = ('cleanup', 7, 'g1')
+        assert client.scheduler.remaining(key) == pytest.approx(bot.CIRCUIT_COOLDOWN, abs=1)
+
+        clock.advance(bot.CIRCUIT_COOLDOWN)
+        await settle(client.scheduler)
+        assert kept.deleted
+        assert client.scheduler.remaining(key) is None
+    finally:
+        client.scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_deletes_are_abandoned_after_the_last_attempt(bot):
+    client = SimpleNamespace(scheduler=bot.DeadlineScheduler(bot.VirtualClock()))
+    cleaner = bot.MessageCleaner(client)
+    try:
+        message = Message(1, failures=1)
+        assert not await cleaner.delete(7, [message], 'g1', retry=True, attempt=bot.DELETE_RETRY_ATTEMPTS)
+        assert client.scheduler.remaining(('cleanup', 7, 'g1')) is None
+    finally:
+        client.scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_moderation_queue_drops_past_max_depth_and_deletes_old_messages_singly(bot):
+    bulk = []
+
+    async def delete_messages(channel_id, message_ids):
+        bulk.append(list(message_ids))
+
+    client = SimpleNamespace(http=SimpleNamespace(delete_messages=delete_messages))
+    queue = bot.ModerationQueue(SimpleNamespace(id=7), bot.MessageCleaner(client), window=0.01, max_depth=3)
+    now = discord.utils.time_snowflake(discord.utils.utcnow())
+    fresh = [Message(now), Message(now + 1)]
+    old = Message(1)  # Older than BULK_DELETE_MAX_AGE
+    for message in [*fresh, old]:
+        assert queue.enqueue(message)
+    assert not queue.enqueue(Message(now + 2))
+    assert queue.dropped == 1
+
+    await queue._flush_task
+    assert bulk == [[now, now + 1]]
+    assert old.deleted
+    assert not any(message.deleted for message in fresh)
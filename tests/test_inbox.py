@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+
+class StubView:
+    """Records the transitions an inbox hands it."""
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def apply_player_clicks(self, clicks):
+        self.calls.append(('player', [slot for _, slot in clicks]))
+        await self.release.wait()
+        return len(clicks)
+
+    async def apply_start(self, interaction):
+        self.calls.append(('start', interaction))
+        return 'started'
+
+    async def apply_end(self, interaction, reason):
+        self.calls.append(('end', reason))
+        raise RuntimeError("cleanup failed")
+
+
+@pytest.mark.asyncio
+async def test_queued_clicks_merge_into_one_transition(bot):
+    view = StubView()
+    inbox = bot.GameInbox(view)
+    first = inbox.post('player', 'i1', 2)
+    await asyncio.sleep(0)  # The first click's transition is now running
+    queued = [inbox.post('player', f'i{slot}', slot) for slot in (3, 4, 5)]
+    start = inbox.post('start', 'i6')
+    late = inbox.post('player', 'i7', 6)
+
+    view.release.set()
+    assert await first == 1
+    assert await asyncio.gather(*queued) == [3, 3, 3]
+    assert await start == 'started'
+    assert await late == 1
+    # Clicks merge only up to the start, which keeps its place in the order
+    assert view.calls == [('player', [2]), ('player', [3, 4, 5]), ('start', 'i6'), ('player', [6])]
+    assert (inbox.transitions, inbox.merged) == (4, 2)
+
+
+@pytest.mark.asyncio
+async def test_failed_transition_fails_its_future_only(bot):
+    view = StubView()
+    view.release.set()
+    inbox = bot.GameInbox(view)
+    end = inbox.post('end', None, 'manual')
+    click = inbox.post('player', 'i1', 2)
+
+    with pytest.raises(RuntimeError):
+        await end
+    assert await click == 1
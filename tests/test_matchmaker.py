@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+class FailingChannel:
+    id = 5
+
+    async def send(self, *args, **kwargs):
+        raise OSError("connection reset")
+
+
+@pytest.mark.asyncio
+async def test_failed_launch_requeues_players_with_a_timer(bot):
+    client = SimpleNamespace(scheduler=bot.DeadlineScheduler(bot.VirtualClock()), stats=bot.BotStats(), recorder=None)
+    matchmaker = bot.Matchmaker(client, size=2, timeout=30)
+    channel = FailingChannel()
+    try:
+        matchmaker.join(channel, 1)
+        assert matchmaker.join(channel, 2) == 0  # Launched
+        await asyncio.gather(*matchmaker._launches)
+
+        assert list(matchmaker.pools[channel.id]) == [1, 2]
+        assert matchmaker.channel_of(1) == channel.id
+        assert client.scheduler.remaining(('queue', channel.id)) == pytest.approx(30, abs=1)
+        assert bot.sng_games.count_in_channel(channel.id) == 0
+    finally:
+        client.scheduler.close()
+
+
+def test_queue_command_keeps_the_stdlib_name_free(bot):
+    import queue
+    assert bot.queue is queue
+    assert bot.queue_command.name == 'queue'
@@ -0,0 +1,34 @@
+import contextvars
+import time
+from types import SimpleNamespace
+
+
+def render(bot, stats):
+    client = SimpleNamespace(stats=stats, disconnect_count=0, latency=float('nan'),
+                             retry_policy=bot.RetryPolicy(stats=stats))
+    return bot.MetricsExporter(client, '127.0.0.1', 0).render()
+
+
+def test_stage_labels_are_escaped(bot):
+    stats = bot.BotStats()
+    stats.record('odd "stage"', 0.25)
+    text = render(bot, stats)
+    assert 'sng_stage_latency_seconds_sum{stage="odd \\"stage\\""} 0.250000' in text
+    assert 'sng_stage_latency_seconds_count{stage="odd \\"stage\\""} 1' in text
+
+
+def test_ratelimit_wait_by_source(bot):
+    stats = bot.BotStats()
+    stats.record_request('POST', '/channels/1/messages', 429, 0.0, retry_after=2.0)
+
+    def send():
+        bot._send_started.set(time.perf_counter() - 0.5)
+        stats.request_started()
+        stats.request_started()  # A retry of the same call is not bucket time
+
+    contextvars.copy_context().run(send)
+    assert stats.ratelimit_wait['retry_after'] == 2.0
+    assert 0.5 <= stats.ratelimit_wait['bucket'] < 1.0
+    text = render(bot, stats)
+    assert 'sng_rest_ratelimit_wait_seconds_total{source="retry_after"} 2.000' in text
+    assert 'sng_rest_ratelimit_wait_seconds_total{source="queue"} 0.000' in text
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+class Followup:
+    async def send(self, content, **kwargs):
+        return SimpleNamespace(id=99, content=content)
+
+
+@pytest.mark.asyncio
+async def test_full_lobby_sends_one_batch_without_duplicates(bot, monkeypatch):
+    batches = []
+    scheduler = bot.DeadlineScheduler(bot.VirtualClock())
+    subscriptions = bot.SubscriptionIndex(bot.GameStore())
+    monkeypatch.setattr(bot.client.notifier, 'dispatch', lambda user_ids, content: batches.append((set(user_ids), content)))
+    monkeypatch.setattr(bot.client, 'scheduler', scheduler)
+    monkeypatch.setattr(bot.client, 'subscriptions', subscriptions)
+    monkeypatch.setattr(bot.client, 'activity_signal', bot.ActivitySignal())
+
+    game = bot.Game('00000000-0000-4000-8000-0000000000f1', 'alice', 100, players=7)
+    bot.sng_games.add(game)
+    view = bot.SNGView(game.sng_id, game.starter, game.channel_id)
+    game.view = view
+    view.players_announced = 7
+    view.notify_users.update({1, 2})
+    subscriptions.subscribe(2, 'players', bot.MAX_PLAYERS)  # Also on the lobby's notify list
+    subscriptions.subscribe(3, 'players', bot.MAX_PLAYERS)
+    interaction = SimpleNamespace(channel=SimpleNamespace(id=100), followup=Followup())
+    try:
+        await view.apply_player_clicks([(interaction, bot.MAX_PLAYERS)])
+    finally:
+        bot.sng_games.remove(game.sng_id)
+        view.editor.close()
+        scheduler.close()
+
+    assert game.started
+    assert len(batches) == 1
+    assert batches[0][0] == {1, 2, 3}
@@ -0,0 +1,46 @@
+import atexit
+import json
+import logging
+from types import SimpleNamespace
+
+
+def test_recording_is_numbered_and_holds_no_ids(bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'ADMIN_USER_ID', 502938475610293847)
+    path = tmp_path / 'traffic.jsonl'
+    recorder = bot.TrafficRecorder(str(path))
+    player_id, channel_id = 734598120938475611, 918273645546372819
+    sng_id = '0a1b2c3d-0000-4000-8000-00000000beef'
+    command = SimpleNamespace(
+        type=bot.discord.InteractionType.application_command,
+        user=SimpleNamespace(id=player_id), channel_id=channel_id, data={'name': 'start'},
+    )
+    click = SimpleNamespace(
+        type=bot.discord.InteractionType.component,
+        user=SimpleNamespace(id=player_id), channel_id=channel_id, data={'custom_id': f'player_{sng_id}_4'},
+    )
+    admin = SimpleNamespace(
+        author=SimpleNamespace(id=bot.ADMIN_USER_ID), channel=SimpleNamespace(id=channel_id), content='/end',
+    )
+    try:
+        recorder.interaction(command)
+        recorder.game_created(sng_id, channel_id, player_id)
+        recorder.interaction(click)
+        recorder.message(admin)
+    finally:
+        atexit.unregister(recorder._listener.stop)
+        recorder._listener.stop()
+        logging.getLogger('sng.traffic').handlers.clear()
+
+    text = path.read_text()
+    lines = [json.loads(line) for line in text.splitlines()]
+    for line in lines:
+        del line['t']
+    assert lines[0]['e'] == 'session'
+    assert lines[1:] == [
+        {'e': 'command', 'u': 0, 'c': 0, 'name': 'start', 'r': 0},
+        {'e': 'game', 'g': 0, 'c': 0, 'u': 0},
+        {'e': 'click', 'u': 0, 'g': 0, 'b': 'player', 'slot': 4},
+        {'e': 'message', 'u': 1, 'c': 0, 'a': 'admin', 'slash': 1},
+    ]
+    for raw in (player_id, channel_id, bot.ADMIN_USER_ID, sng_id):
+        assert str(raw) not in text
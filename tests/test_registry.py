@@ -0,0 +1,47 @@
+def make_game(bot, number, starter='alice', channel_id=100):
+    return bot.Game(f'{number:08x}-0000-4000-8000-000000000000', starter, channel_id)
+
+
+def test_indexes_follow_adds_and_removes(bot):
+    registry = bot.GameRegistry()
+    first, second, third = make_game(bot, 1), make_game(bot, 2, 'bob'), make_game(bot, 3, channel_id=200)
+    for game in (first, second, third):
+        registry.add(game)
+
+    assert len(registry) == 3 and first.sng_id in registry
+    assert registry.by_display_id(first.display_id) is first
+    assert {game.sng_id for game in registry.in_channel(100)} == {first.sng_id, second.sng_id}
+    assert registry.count_in_channel(200) == 1
+    assert {game.sng_id for game in registry.by_starter('alice')} == {first.sng_id, third.sng_id}
+
+    assert registry.remove(third.sng_id) is third
+    assert registry.remove(third.sng_id) is None
+    assert registry.count_in_channel(200) == 0
+    assert 200 not in registry._by_channel
+    assert registry.by_starter('alice') == [first]
+    assert registry.by_display_id(third.display_id) is None
+
+
+def test_state_index_tracks_started_games(bot):
+    registry = bot.GameRegistry()
+    game = make_game(bot, 1)
+    registry.add(game)
+    assert registry.count_by_state() == {'open': 1, 'started': 0}
+
+    registry.mark_started(game)
+    assert game.started
+    assert registry.with_state('started') == [game]
+    assert registry.count_by_state() == {'open': 0, 'started': 1}
+
+    registry.remove(game.sng_id)
+    assert registry.count_by_state() == {'open': 0, 'started': 0}
+
+
+def test_adding_a_known_id_replaces_the_game(bot):
+    registry = bot.GameRegistry()
+    registry.add(make_game(bot, 1, channel_id=100))
+    replacement = make_game(bot, 1, channel_id=200)
+    registry.add(replacement)
+    assert len(registry) == 1
+    assert registry.get(replacement.sng_id) is replacement
+    assert registry.count_in_channel(100) == 0
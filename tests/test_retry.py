@@ -0,0 +1,146 @@
+import asyncio
+import contextvars
+import json
+from types import SimpleNamespace
+
+import discord
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from discord.http import HTTPClient, Route
+
+
+@pytest_asyncio.fixture
+async def discord_api(monkeypatch):
+    """A local stand-in for the Discord API that answers with queued statuses, then 200."""
+    server = SimpleNamespace(statuses=[], hits=[])
+
+    def respond(data, status=200):
+        # discord.py only decodes bodies whose content type is exactly application/json
+        return web.Response(body=json.dumps(data).encode(), status=status, headers={'Content-Type': 'application/json'})
+
+    async def users_me(request):
+        return respond({'id': '1', 'username': 'bot', 'discriminator': '0', 'avatar': None})
+
+    async def channel(request):
+        server.hits.append(request.path)
+        status = server.statuses.pop(0) if server.statuses else 200
+        return respond({'message': 'test', 'code': 0} if status >= 400 else {'id': '5'}, status)
+
+    app = web.Application()
+    app.router.add_get('/api/v10/users/@me', users_me)
+    app.router.add_get('/api/v10/channels/{id}', channel)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(Route, 'BASE', f'http://127.0.0.1:{port}/api/v10')
+    yield server
+    await runner.cleanup()
+
+
+def server_error(status):
+    return discord.DiscordServerError(SimpleNamespace(status=status, reason='Server Error', headers={}), 'test')
+
+
+@pytest.mark.asyncio
+async def test_503_is_retried_through_the_scheduler(bot, discord_api):
+    stats = bot.BotStats()
+    policy = bot.RetryPolicy(base=0.01, stats=stats)
+    http = HTTPClient(asyncio.get_running_loop())
+    await http.static_login('token')
+    try:
+        assert bot.RequestScheduler(http, stats=stats, policy=policy).enabled
+        discord_api.statuses = [503]
+        assert (await http.request(Route('GET', '/channels/{channel_id}', channel_id=5)))['id'] == '5'
+    finally:
+        await http.close()
+    assert len(discord_api.hits) == 2
+    assert sum(stats.retries.values()) == 1
+    assert policy.breakers['GET /channels/{channel_id}'].failures == 0
+
+
+@pytest.mark.asyncio
+async def test_transport_retried_errors_are_not_retried_again(bot):
+    calls = []
+
+    async def send():
+        calls.append(1)
+        raise server_error(502)
+
+    policy = bot.RetryPolicy(base=0.01)
+    route = Route('GET', '/channels/{channel_id}', channel_id=5)
+    with pytest.raises(discord.DiscordServerError):
+        await policy.call(route, send, 0, bot.HTTP_RETRIED_STATUSES)
+    assert len(calls) == 1
+    assert policy.breakers['GET /channels/{channel_id}'].failures == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_passes_calls_through_without_bucket_state(bot):
+    class BareHTTP:
+        def __init__(self):
+            self.routes = []
+
+        async def request(self, route, **kwargs):
+            self.routes.append(route)
+            return {'id': '5'}
+
+    http = BareHTTP()
+    assert not bot.RequestScheduler(http, policy=bot.RetryPolicy(base=0)).enabled
+    route = Route('GET', '/channels/{channel_id}', channel_id=5)
+    assert await http.request(route) == {'id': '5'}
+    assert http.routes == [route]
+
+
+def test_webhook_adapter_installs_once(bot):
+    def install():
+        policy = bot.RetryPolicy()
+        first = bot.RetryingWebhookAdapter.install(policy)
+        assert bot.RetryingWebhookAdapter.install(policy) is first
+        # A new policy replaces the old one instead of wrapping it
+        second = bot.RetryingWebhookAdapter.install(bot.RetryPolicy())
+        assert second.inner is first.inner
+        assert bot.webhook_adapter.get() is second
+
+    # Install in a copy so the adapter does not leak into other tests
+    contextvars.copy_context().run(install)
+    assert not isinstance(bot.webhook_adapter.get(), bot.RetryingWebhookAdapter)
+
+
+def test_circuit_breaker_states(bot, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(bot.time, 'monotonic', lambda: now[0])
+    breaker = bot.CircuitBreaker(threshold=2, cooldown=10)
+
+    assert not breaker.failure()
+    assert breaker.state == 'closed'
+    assert breaker.failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    now[0] += 10
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one probe at a time
+    # A failed probe opens it again for a full cooldown
+    assert breaker.failure()
+    assert breaker.state == 'open'
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_do_not_open_the_breaker(bot):
+    async def send():
+        raise discord.RateLimited(0.0)
+
+    policy = bot.RetryPolicy(attempts=bot.CIRCUIT_FAILURES + 2, base=0)
+    route = Route('GET', '/channels/{channel_id}', channel_id=5)
+    with pytest.raises(discord.RateLimited):
+        await policy.call(route, send, 0)
+    breaker = policy.breakers['GET /channels/{channel_id}']
+    assert breaker.state == 'closed' and breaker.failures == 0
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture
+async def scheduler(bot):
+    scheduler = bot.DeadlineScheduler(bot.VirtualClock())
+    yield scheduler
+    scheduler.close()
+    await asyncio.sleep(0)  # Let the runner task finish cancelling
+
+
+async def settle(scheduler):
+    """Let the scheduler fire what is due and wait for the callbacks."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await asyncio.gather(*scheduler._tasks)
+
+
+def recorder(fired, name):
+    async def callback():
+        fired.append(name)
+    return callback
+
+
+@pytest.mark.asyncio
+async def test_deadlines_fire_in_order_on_the_virtual_clock(scheduler):
+    fired = []
+    scheduler.schedule('late', 120, recorder(fired, 'late'))
+    scheduler.schedule('early', 60, recorder(fired, 'early'))
+    assert len(scheduler) == 2
+    assert scheduler.remaining('early') == pytest.approx(60, abs=1)
+
+    scheduler.clock.advance(61)
+    await settle(scheduler)
+    assert fired == ['early']
+    assert scheduler.remaining('early') is None
+
+    scheduler.clock.advance(60)
+    await settle(scheduler)
+    assert fired == ['early', 'late']
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_reschedule_and_cancel(scheduler):
+    fired = []
+    scheduler.schedule('game', 60, recorder(fired, 'first'))
+    scheduler.schedule('game', 300, recorder(fired, 'second'))  # Replaces the first deadline
+    scheduler.schedule('other', 30, recorder(fired, 'other'))
+    assert scheduler.cancel('other')
+    assert not scheduler.cancel('other')
+
+    scheduler.clock.advance(120)
+    await settle(scheduler)
+    assert fired == []
+    assert scheduler.next_deadline() == pytest.approx(scheduler.clock.now() + 180, abs=1)
+
+    scheduler.clock.advance(180)
+    await settle(scheduler)
+    assert fired == ['second']
+
+
+@pytest.mark.asyncio
+async def test_activity_signals_coalesce_within_the_window(bot, scheduler):
+    class Signal(bot.CoalescedActivitySignal):
+        async def send(self, channel):
+            sent.append(channel.id)
+
+    sent = []
+    channel = SimpleNamespace(id=100)
+    signal = Signal(SimpleNamespace(scheduler=scheduler, stats=bot.BotStats()), window=30)
+    for _ in range(3):
+        signal.signal(channel)
+    await settle(scheduler)
+    assert sent == [100]
+    assert signal.coalesced == 2
+
+    scheduler.clock.advance(10)
+    signal.signal(channel)  # Held until the window ends
+    await settle(scheduler)
+    assert sent == [100]
+
+    scheduler.clock.advance(21)
+    await settle(scheduler)
+    assert sent == [100, 100]
+    assert signal.sent == 2
+
+    scheduler.clock.advance(31)
+    signal.signal(channel)  # The window has passed, so this one goes out straight away
+    await settle(scheduler)
+    assert sent == [100, 100, 100]
@@ -0,0 +1,35 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_connects_on_open(bot, tmp_path):
+    path = tmp_path / 'games.db'
+    store = bot.SQLiteGameStore(str(path), flush_interval=60)
+    store.save('g1', {'sng_id': 'g1'})
+    assert not path.exists()
+
+    await store.open()
+    await store.close()
+    reopened = bot.SQLiteGameStore(str(path))
+    await reopened.open()
+    try:
+        assert await reopened.load_all() == [{'sng_id': 'g1'}]
+    finally:
+        await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_a_running_write(bot, tmp_path):
+    path = tmp_path / 'games.db'
+    store = bot.SQLiteGameStore(str(path), flush_interval=0)
+    await store.open()
+    store.save('g1', {'sng_id': 'g1'})
+    while not store._lock.locked():
+        await asyncio.sleep(0)
+
+    await store.close()
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT sng_id FROM games").fetchall() == [('g1',)]
@@ -0,0 +1,49 @@
+def make_index(bot):
+    class RecordingStore(bot.GameStore):
+        def __init__(self):
+            self.saved = {}
+
+        def save_subscriptions(self, user_id, rules):
+            self.saved[user_id] = rules
+
+    store = RecordingStore()
+    return bot.SubscriptionIndex(store), store
+
+
+def test_rules_match_by_channel_starter_and_threshold(bot):
+    index, store = make_index(bot)
+    assert index.subscribe(1, 'channel', 100)
+    assert not index.subscribe(1, 'channel', 100)
+    index.subscribe(2, 'starter', 'alice')
+    index.subscribe(3, 'players', 4)
+    index.subscribe(4, 'players', 7)
+
+    game = bot.Game('00000000-0000-4000-8000-000000000002', 'alice', 100)
+    assert index.for_new_game(game) == {1, 2}
+    assert index.for_players(1, 4) == {3}
+    assert index.for_players(4, 6) == set()
+    assert index.for_players(4, 8) == {4}
+    assert store.saved[1] == [['channel', 100]]
+    assert len(index) == 4
+
+
+def test_unsubscribe_drops_empty_index_entries(bot):
+    index, store = make_index(bot)
+    index.subscribe(1, 'channel', 100)
+    index.subscribe(1, 'players', 4)
+    index.subscribe(2, 'channel', 100)
+
+    assert index.unsubscribe(1, 'players', 4) == 1
+    assert 4 not in index._index['players']
+    assert index.unsubscribe(1) == 1
+    assert index._index['channel'] == {100: {2}}
+    assert index.rules_for(1) == []
+    assert store.saved[1] == []
+    assert index.unsubscribe(1) == 0
+
+
+def test_load_restores_rules(bot):
+    index, _ = make_index(bot)
+    index.load({'5': [['channel', 100], ['players', 3]]})
+    assert index.rules_for(5) == [('channel', 100), ('players', 3)]
+    assert index.matching('players', range(2, 4)) == {5}
@@ -0,0 +1,70 @@
+import pytest
+from discord import ButtonStyle
+
+
+@pytest.mark.asyncio
+async def test_buttons_are_built_from_the_game_record(bot):
+    game = bot.Game('00000000-0000-4000-8000-000000000001', 'alice', 100, players=3)
+    bot.sng_games.add(game)
+    try:
+        view = bot.SNGView(game.sng_id, game.starter, game.channel_id)
+        assert not hasattr(view, '__dict__')
+
+        buttons = view.component_view().children
+        assert len(buttons) == bot.MAX_PLAYERS + 3
+        styles = [button.item.style for button in buttons[:bot.MAX_PLAYERS]]
+        assert styles == [ButtonStyle.green] * 3 + [ButtonStyle.grey] * (bot.MAX_PLAYERS - 3)
+        assert not any(button.item.disabled for button in buttons)
+
+        bot.sng_games.mark_started(game)
+        enabled = [button for button in view.component_view().children if not button.item.disabled]
+        assert [type(button) for button in enabled] == [bot.EndSNGButton]
+    finally:
+        bot.sng_games.remove(game.sng_id)
+
+
+class EditedView:
+    """The parts of SNGView that MessageEditPipeline touches."""
+    def __init__(self):
+        self.sng_id = 'edit-test'
+        self.players = 0
+        self.state_version = 0
+        self.edits = []
+        self.message = self
+
+    def set_players(self, players):
+        self.players = players
+        self.state_version += 1
+
+    def render(self):
+        return None, {'players': self.players}, ()
+
+    def component_view(self):
+        return None
+
+    async def edit(self, **kwargs):
+        self.edits.append(self.players)
+
+
+@pytest.mark.asyncio
+async def test_edit_pipeline_coalesces_bursts_and_skips_no_op_edits(bot):
+    view = EditedView()
+    editor = bot.MessageEditPipeline(view, window=0.01)
+    editor.seed()
+    try:
+        for players in range(1, 6):
+            view.set_players(players)
+            pending = editor.request()
+        await pending
+        assert view.edits == [5]
+        assert editor.edits_coalesced == 4
+
+        await editor.request()  # Nothing changed since the last edit
+        view.set_players(6)
+        view.set_players(5)  # Changed and changed back within one window
+        await editor.request()
+        assert view.edits == [5]
+        assert editor.edits_skipped == 2
+        assert editor.edits_sent == 1
+    finally:
+        editor.close()